@@ -1,8 +1,24 @@
 import os
-import subprocess
+import sys
 import argparse
 from urllib.parse import urlparse
 
+import requests
+
+# The pipeline stages live in lib/ as standalone scripts; make them importable.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib"))
+
+from pipeline import iter_page_rows, process_page
+from simple_spider import fetch_page
+from http_cache import HttpCache
+from stage_cache import StageCache
+from output_writers import WRITERS, with_output_compression, write_rows
+from compression import EXTENSIONS, set_compression
+from canonical_urls import job_key
+from parser_backend import BACKENDS, set_backend
+from run_report import RunReport, record_stage, recording
+from fetch_policy import add_policy_arguments, policy_from_args, set_fetch_policy
+
 def ensure_data_folder():
     """Ensure the 'data' folder exists in the current directory."""
     if not os.path.exists("data"):
@@ -23,59 +39,79 @@ def extract_topic_from_url(url: str) -> str:
     """
     return url.rstrip("/").split("/")[-1].capitalize()
 
-def run_workflow(website_url):
-    """Runs the entire workflow and stores intermediate files in the 'data' folder."""
-    ensure_data_folder()
-
-    # Define intermediate file paths
-    spider_output = "data/step1_spider_output.txt"
-    clean_links_output = "data/step2_clean_links_output.txt"
-    extract_h2_output = "data/step3_extract_h2_output.txt"
-    extract_code_output = "data/step4_extract_code_output.txt"
-    clean_tags_output = "data/step5_clean_tags_output.txt"
-    refined_output = "data/step6_final_refine_output.txt"
-
-    # Extract the topic and construct the final CSV name
-    topic = extract_topic_from_url(website_url)
-    final_csv = f"data/final_output_{topic}.csv"
-
+def create_cache(cache_dir, max_mb=512, offline=False):
+    """
+    Returns an HttpCache in 'cache_dir', or None if caching is off.
+    Offline mode always needs a cache, so it falls back to 'data/http_cache'.
+    """
+    if offline and not cache_dir:
+        cache_dir = "data/http_cache"
+    if not cache_dir:
+        return None
+    return HttpCache(cache_dir, max_bytes=max_mb * 1024 * 1024, offline=offline)
+
+def extract_rows(website_url, page_html=None, debug_dir=None, single_parse=False, cache=None, stage_cache=None,
+                 stream=False):
+    """
+    Runs steps 1-7 for 'website_url' without touching any shared file and returns the CSV rows.
+    If 'page_html' is given, it is used instead of downloading 'website_url';
+    otherwise the page is fetched through 'cache' when one is given.
+    'stage_cache' is an optional StageCache that memoizes the processing stages.
+    Intermediate files are written to 'debug_dir' if one is given.
+    With 'stream', a generator is returned that runs steps 3-7 one section at a time
+    as the rows are read (see pipeline.iter_page_rows()).
+    Raises requests.exceptions.RequestException if the page cannot be retrieved.
+    """
     # Category is hardcoded to 'Kubernetes'
     category = "Kubernetes"
     # Extract the base URL (e.g., https://kubernetes.io)
     root_url = extract_base_url(website_url)
 
-    try:
-        # Step 1: Run the simple_spider.py script
-        subprocess.run(["python3", "lib/simple_spider.py", "--url", website_url, "--output", spider_output], check=True)
-
-        # Step 2: Run the clean_html_links.py script
-        subprocess.run(["python3", "lib/clean_html_links.py", "--input", spider_output, "--output", clean_links_output], check=True)
+    if page_html is None:
+        page_html = record_stage("fetch", fetch_page, website_url, cache=cache)
+    if stream:
+        return iter_page_rows(page_html, category, website_url, root_url, debug_dir, stage_cache)
+    return process_page(page_html, category, website_url, root_url, debug_dir, single_parse, stage_cache)
 
-        # Step 3: Run the extract_h2.py script
-        subprocess.run(["python3", "lib/extract_h2.py", "--input", clean_links_output, "--output", extract_h2_output], check=True)
-
-        # Step 4: Run the extract_code_example.py script
-        subprocess.run(["python3", "lib/extract_code_example.py", "--input", extract_h2_output, "--output", extract_code_output], check=True)
-
-        # Step 5: Run the clean_all_tags_and_newline.py script
-        subprocess.run(["python3", "lib/clean_all_tags_and_newline.py", "--input", extract_code_output, "--output", clean_tags_output], check=True)
+def run_workflow(website_url, debug=False, single_parse=False, page_html=None, cache=None, stage_cache=None,
+                 output_format="csv", report=None, profile_dir=None, stream=False):
+    """
+    Runs the entire workflow in-process and saves the final CSV in the 'data' folder
+    ('output_format' "jsonl" or "parquet" writes that format instead). The final output and
+    the intermediate files are compressed if compression.set_compression() was called.
+    Intermediate files are only written to 'data' when 'debug' is set.
+    With 'single_parse', the page is parsed once and every stage works on that one tree.
+    If 'page_html' is given, it is used instead of downloading 'website_url'.
+    'cache' is an optional HttpCache used for the download and 'stage_cache' an optional StageCache.
+    With a 'report' (a RunReport), every stage is measured and added to it; with 'profile_dir',
+    the run is also profiled (see run_report.recording()).
+    With 'stream', rows are written as each section is finished instead of once the whole
+    page is done; steps 3-7 are then measured as part of the 'write' stage.
+    Returns the path of the final output, or None if the workflow failed.
+    """
+    ensure_data_folder()
 
-        # Step 6: Run the final_refine.py script
-        subprocess.run(["python3", "lib/final_refine.py", "--input", clean_tags_output, "--output", refined_output], check=True)
+    # Name the final CSV after the topic plus a hash of the page, so two URLs ending in the
+    # same segment (e.g. .../overview/) do not overwrite each other's output
+    topic = extract_topic_from_url(website_url)
+    final_csv = with_output_compression(f"data/final_output_{job_key(website_url, topic)}.{output_format}")
 
-        # Step 7: Generate the final CSV with to_csv.py
-        subprocess.run([
-            "python3", "lib/to_csv.py",
-            "--input", refined_output,
-            "--output", final_csv,
-            "--category", category,
-            "--reference", website_url,
-            "--root-url", root_url  # Pass root URL for relative links
-        ], check=True)
+    metrics = None
+    try:
+        with recording(website_url, profile_dir=profile_dir) as metrics:
+            # Steps 1-7: fetch, clean, split and convert the page without leaving this process
+            rows = extract_rows(website_url, page_html, "data" if debug else None, single_parse, cache, stage_cache,
+                                stream)
+            record_stage("write", write_rows, rows, final_csv, output_format)
 
         print(f"Workflow complete! Final output saved to {final_csv}")
-    except subprocess.CalledProcessError as e:
+        return final_csv
+    except requests.exceptions.RequestException as e:
         print(f"Error during workflow execution: {e}")
+        return None
+    finally:
+        if report is not None and metrics is not None:
+            report.add(website_url, metrics)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the full workflow for web scraping and processing.")
@@ -85,6 +121,44 @@ if __name__ == "__main__":
         default="https://kubernetes.io/docs/concepts/services-networking/ingress/",
         help="The website URL to scrape (default: Kubernetes Ingress documentation)."
     )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Write the intermediate step files to the 'data' folder."
+    )
+    parser.add_argument(
+        "--single-parse",
+        action="store_true",
+        help="Parse the page once and run every stage on the same tree (much less CPU on long pages)."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Run steps 3-7 one <h2> section at a time and write each row as soon as it is ready."
+    )
+    parser.add_argument("--cache-dir", type=str, default=None, help="Keep downloaded pages in this HTTP cache folder.")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="Size cap of the HTTP cache in MB.")
+    parser.add_argument("--offline", action="store_true", help="Only read pages from the HTTP cache.")
+    parser.add_argument("--stage-cache", type=str, default=None, help="Memoize stage results in this folder.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
+    parser.add_argument("--format", type=str, default="csv", choices=list(WRITERS), help="Output format of the final file.")
+    parser.add_argument("--compress", type=str, default=None, choices=list(EXTENSIONS), help="Compress the final output and step files (e.g. final_output_Ingress.csv.gz).")
+    parser.add_argument("--report", type=str, default=None, help="Write per-stage timings, sizes and memory to this JSON file.")
+    parser.add_argument("--profile", type=str, default=None, help="Save a cProfile/tracemalloc profile of the run to this folder.")
+    add_policy_arguments(parser)
     args = parser.parse_args()
 
-    run_workflow(args.url)
+    set_backend(args.parser)
+    try:
+        set_compression(args.compress)
+    except ImportError as e:
+        parser.error(str(e))
+    set_fetch_policy(policy_from_args(args))
+    cache = create_cache(args.cache_dir, args.cache_max_mb, args.offline)
+    stage_cache = StageCache(args.stage_cache) if args.stage_cache else None
+    report = RunReport() if args.report or args.profile else None
+    run_workflow(args.url, debug=args.debug, single_parse=args.single_parse, cache=cache, stage_cache=stage_cache,
+                 output_format=args.format, report=report, profile_dir=args.profile, stream=args.stream)
+    if args.report:
+        report.write(args.report)
+        print(f"Run report saved to {args.report}")
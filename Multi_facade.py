@@ -1,16 +1,46 @@
 import os
-import subprocess
 import argparse
 import shutil
-import csv
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 
-def ensure_data_folder():
-    """Ensure the 'data/multi_temp_csv' folder exists and clear it at the start of a new run."""
-    temp_folder = "data/multi_temp_csv"
-    if os.path.exists(temp_folder):
+from Facade import create_cache, extract_rows
+from stage_cache import StageCache
+from dedup import DuplicateIndex, source_of
+from link_graph import LinkGraphWriter, link_graph_paths, read_linked_rows
+from change_feed import ChangeFeed, change_feed_path, load_baseline, page_gone
+from output_writers import (
+    WRITERS, format_of, open_row_writer, with_format_extension, with_output_compression
+)
+from compression import (
+    EXTENSIONS, check_available, compression_of, get_compression, open_file, set_compression,
+    strip_compression_extension
+)
+from parser_backend import BACKENDS, get_backend, set_backend
+from fetcher import fetch_pages  # lib/ is on sys.path once Facade is imported
+from crawler import Frontier, crawl, scope_prefixes
+from sitemap import check_shard, select_shard, sitemap_urls
+from run_report import RunReport, recording
+from fetch_policy import add_policy_arguments, policy_from_args, set_fetch_policy
+from checkpoint import CheckpointJournal
+from local_pages import LocalPages
+from canonical_urls import RedirectMap, get_redirect_map, page_key, set_redirect_map, unique_urls
+
+JOBS_FOLDER = "data/multi_jobs"
+
+def ensure_data_folder(folder: str = JOBS_FOLDER, resume: bool = False):
+    """Ensure the 'data/multi_jobs' folder exists and clear it at the start of a new (not resumed) run."""
+    if os.path.exists(folder) and not resume:
         # Clear the folder at the beginning of the run
-        shutil.rmtree(temp_folder)
-    os.makedirs(temp_folder)
+        shutil.rmtree(folder)
+    os.makedirs(folder, exist_ok=True)
+
+def checkpoint_dir_name(final_csv: str) -> str:
+    """
+    The checkpoint folder of a run writing 'final_csv'.
+    Example: 'data/multi_final.csv.gz' -> 'data/multi_final_checkpoint'
+    """
+    return os.path.splitext(strip_compression_extension(final_csv))[0] + "_checkpoint"
 
 def create_default_url_file(input_file: str):
     """Create a default multi_url.txt file if it doesn't exist."""
@@ -24,84 +54,590 @@ def create_default_url_file(input_file: str):
             f.write("\n".join(default_urls))
         print(f"Default URL file created at {input_file}")
 
-def extract_topic_from_url(url: str) -> str:
-    """Extracts the last word of the URL (e.g., 'ingress' or 'gateway') to form the topic."""
-    last_word = url.rstrip("/").split("/")[-1]
-    return last_word.capitalize()
-
-def run_facade_for_url(website_url: str):
-    """Run the Facade.py workflow for a single URL."""
-    # Run Facade.py for the given URL
-    subprocess.run([
-        "python3", "Facade.py",
-        "--url", website_url
-    ], check=True)
-
-    # Identify the expected output file
-    topic = extract_topic_from_url(website_url)
-    generated_csv = f"data/final_output_{topic}.csv"
-
-    if not os.path.exists(generated_csv):
-        raise FileNotFoundError(f"Expected output CSV not found: {generated_csv}")
-
-    # Move the generated CSV to the temp folder
-    temp_csv = f"data/multi_temp_csv/final_output_{topic}.csv"
-    os.rename(generated_csv, temp_csv)
-    return temp_csv
-
-def combine_csvs(output_csvs: list, final_csv: str):
-    """Combine all individual CSVs into one final CSV."""
-    header_written = False
-
-    with open(final_csv, "w", newline="", encoding="utf-8") as outfile:
-        writer = None
-
-        for csv_file in output_csvs:
-            with open(csv_file, "r", encoding="utf-8") as infile:
-                reader = csv.reader(infile)
-                headers = next(reader)
-
-                # Write headers only once
-                if not header_written:
-                    writer = csv.writer(outfile)
-                    writer.writerow(headers)
-                    header_written = True
-
-                # Write the rows
-                for row in reader:
-                    writer.writerow(row)
-
-    print(f"Combined CSV saved to {final_csv}")
-
-def run_multi_facade(input_file: str, final_csv: str):
-    """Run the Facade workflow for multiple URLs and combine the results."""
-    ensure_data_folder()
+def read_urls(input_file: str) -> list:
+    """Reads the list of URLs (one per line) from 'input_file', creating the default file if needed."""
     create_default_url_file(input_file)
+    with open_file(input_file, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def shard_csv_name(final_csv: str, shard: int, shards: int) -> str:
+    """
+    The output CSV of one shard.
+    Example: ('data/multi_final.csv.gz', 2, 8) -> 'data/multi_final_shard2of8.csv.gz'
+    """
+    base, ext = os.path.splitext(strip_compression_extension(final_csv))
+    return f"{base}_shard{shard}of{shards}{ext}{final_csv[len(base + ext):]}"
+
+def init_worker(backend: str, compression: str):
+    """Gives a worker process the parser backend and compression of the main process."""
+    set_backend(backend)
+    set_compression(compression)
+
+def process_url_job(index: int, website_url: str, page_html: str, single_parse: bool, debug: bool,
+                    stage_cache=None, record: bool = False, profile_dir: str = None):
+    """
+    Run the workflow for one URL and return (index, rows, metrics). This also runs in worker
+    processes, so nothing is written to the shared 'data' files; with 'debug', the job's
+    intermediate files go to its own folder under data/multi_jobs/.
+    With 'record', 'metrics' is the PageMetrics of the job's stages (None otherwise), and
+    with 'profile_dir' the job is also profiled into that folder (see run_report.recording()).
+    """
+    debug_dir = None
+    if debug:
+        debug_dir = os.path.join(JOBS_FOLDER, f"job_{index:05d}")
+        os.makedirs(debug_dir, exist_ok=True)
+    if not record and not profile_dir:
+        return index, extract_rows(website_url, page_html, debug_dir, single_parse, stage_cache=stage_cache), None
+    with recording(website_url, index, profile_dir) as metrics:
+        rows = extract_rows(website_url, page_html, debug_dir, single_parse, stage_cache=stage_cache)
+    return index, rows, metrics
+
+class MergedRowWriter:
+    """
+    Appends the rows of each URL to the combined output as soon as they are available, so a
+    CSV or JSONL file can be read while a long batch is still running (a Parquet file is only
+    complete once closed). The format is 'output_format', or taken from the extension of
+    'final_csv' (see output_writers.py). Rows keep the input order of their
+    URLs (a URL that finishes early waits for the ones before it) and get IDs that are
+    unique across the whole file. With a DuplicateIndex, every row is checked for duplicate
+    concepts, and duplicates are left out if 'drop_duplicates' is set.
+    'on_write(index)' is called once the rows of URL number 'index' have been written, and the
+    rows of that URL are left out if 'keep(index)' returns False.
+    With 'link_graph', the 'Link to' URLs are replaced by IDs into a URL table, and the
+    links are written as a separate edge list (see link_graph.link_graph_paths()).
+    With 'diff_against' (the output of an earlier run, which may be 'final_csv' itself), the
+    rows that were added, changed or removed since are written to a change feed (see
+    change_feed.change_feed_path()); if that output does not exist yet, every row is added.
+    With 'baseline_path', the hashes of that output are kept there for a resumed run (see
+    change_feed.load_baseline()); as the resumed run writes every row again, the feed is
+    written again in full as well.
+    """
+
+    def __init__(self, final_csv: str, *, dedup: DuplicateIndex = None, drop_duplicates: bool = False,
+                 output_format: str = None, on_write=None, link_graph: bool = False, diff_against: str = None,
+                 baseline_path: str = None, keep=None):
+        output_dir = os.path.dirname(final_csv)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self.final_csv = final_csv
+        # Read the earlier rows before opening the writer, which may overwrite them
+        self.changes = None
+        if diff_against:
+            previous = load_baseline(diff_against, link_graph, baseline_path)
+            self.changes = ChangeFeed(previous, change_feed_path(final_csv))
+        self._writer = open_row_writer(final_csv, output_format)
+        self._pending = {}
+        self._next_index = 0
+        self._next_id = 1
+        self.dedup = dedup
+        self.drop_duplicates = drop_duplicates
+        self.on_write = on_write
+        self.keep = keep
+        self.link_graph = LinkGraphWriter(*link_graph_paths(final_csv)) if link_graph else None
+
+    def _write(self, index: int, rows: list):
+        if self.keep is not None and not self.keep(index):
+            rows = []
+        kept = []
+        for row in rows:
+            if self.dedup is not None:
+                duplicate = self.dedup.add(row["URL"], row["Content"], source_of(row["URL"]))
+                if duplicate is not None and self.drop_duplicates:
+                    continue
+            kept.append({**row, "ID": self._next_id})
+            self._next_id += 1
+        if self.changes is not None:
+            self.changes.add_rows(kept)
+        if self.link_graph is not None:
+            kept = self.link_graph.add_rows(kept)
+        self._writer.write_rows(kept)
+        if self.on_write is not None:
+            self.on_write(index)
+
+    def add(self, index: int, rows: list):
+        """Record the rows of URL number 'index' (an empty list for a failed URL)."""
+        self._pending[index] = rows
+        while self._next_index in self._pending:
+            self._write(self._next_index, self._pending.pop(self._next_index))
+            self._next_index += 1
+
+    def close(self):
+        """Write any rows still waiting for an earlier URL and close the file."""
+        for index in sorted(self._pending):
+            self._write(index, self._pending[index])
+        self._pending.clear()
+        self._writer.close()
+        if self.link_graph is not None:
+            self.link_graph.close()
+        if self.changes is not None:
+            self.changes.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def add_url_rows(merged: "MergedRowWriter", report: RunReport, index: int, url: str, rows: list,
+                 metrics=None, error: Exception = None, journal: CheckpointJournal = None):
+    """
+    Adds the rows of URL number 'index' to 'merged' and, with a 'report', its stage
+    metrics (or 'error'); the time spent writing the rows is its 'write' stage.
+    With a 'journal', the rows are saved there first (or the URL is recorded as failed).
+    The earlier rows of a failed URL are not reported as removed by the change feed,
+    unless the page is gone (404 or 410).
+    """
+    if error is not None and merged.changes is not None and not page_gone(error):
+        merged.changes.keep_page(url)
+    if journal is not None:
+        if error is not None:
+            journal.record(url, "failed", index=index, error=str(error))
+        elif not journal.is_done(url):
+            journal.save_rows(url, rows, index)
+
+    if report is None:
+        merged.add(index, rows)
+        return
+    report.add(url, metrics, index, error)
+    report.measure(url, "write", partial(merged.add, index), rows)
+
+def journal_merges(journal: CheckpointJournal, url_of):
+    """The MergedRowWriter 'on_write' callback that records URL number 'index' (url_of[index]) as merged."""
+    if journal is None:
+        return None
+
+    def on_write(index: int):
+        # Failed URLs get an empty 'write' too, but stay 'failed'
+        if journal.is_done(url_of[index]):
+            journal.record(url_of[index], "merged", index=index)
+    return on_write
+
+class PageClaims:
+    """
+    Decides which URL of the list keeps the rows of a page when several of them turn out,
+    once downloaded, to be redirected to the same page: the one with the lowest index, so
+    the output does not depend on which download finished first. Downloads finish in any
+    order, so a URL can be processed and later lose its page to an earlier URL; keeps() is
+    asked when the rows are written, in list order, when every earlier URL has claimed.
+    """
+
+    def __init__(self, urls: list):
+        self.urls = urls
+        self.owners = {}
+        self.keys = {}
+
+    def claim(self, index: int, url: str) -> bool:
+        """Records that URL number 'index' ended up at its page; False if an earlier URL has that page."""
+        key = self.keys[index] = page_key(get_redirect_map().resolve(url))
+        owner = self.owners.get(key)
+        if owner is not None and owner < index:
+            return False
+        self.owners[key] = index
+        return True
+
+    def keeps(self, index: int) -> bool:
+        """Whether URL number 'index' keeps its rows (URLs that never claimed a page do)."""
+        key = self.keys.get(index)
+        return key is None or self.owners[key] == index
+
+    def owner_url(self, index: int) -> str:
+        """The URL that has the page of URL number 'index'."""
+        return self.urls[self.owners[self.keys[index]]]
+
+def fetch_pending(urls: list, pending: list, *, fetch_workers: int, per_host_limit: int, cache=None,
+                  report: RunReport = None, journal: CheckpointJournal = None, local_pages: LocalPages = None,
+                  claims: PageClaims = None):
+    """
+    fetch_pages() for the URLs numbered 'pending' in 'urls', yielding (index, url, page_html, error)
+    with the index of the URL in 'urls'. Downloads are recorded in the 'journal' if there is one.
+    With 'local_pages', the pages are read from that mirror/WARC storage by 'fetch_workers'
+    threads instead of downloaded.
+    With 'claims', every downloaded URL claims the page it was redirected to, and a URL whose
+    page an earlier URL of the list already has is yielded with neither a page nor an error,
+    as it will have no rows of its own (see PageClaims).
+    """
+    pending_urls = [urls[index] for index in pending]
+    if local_pages is not None:
+        pages = local_pages.read_pages(pending_urls, fetch_workers, report)
+    else:
+        pages = fetch_pages(pending_urls, fetch_workers, per_host_limit, cache, report)
+    for position, url, page_html, error in pages:
+        if error is None:
+            if claims is not None and not claims.claim(pending[position], url):
+                yield pending[position], url, None, None
+                continue
+            if journal is not None:
+                journal.record(url, "fetched", index=pending[position])
+        yield pending[position], url, page_html, error
+
+def print_changes(merged: MergedRowWriter):
+    """Prints where the change feed of 'merged' was saved and what it holds, if it has one."""
+    if merged.changes is not None:
+        print(f"Changes saved to {merged.changes.path}: {merged.changes.summary()}")
 
-    # Read the list of URLs from the input file
-    with open(input_file, "r", encoding="utf-8") as f:
-        urls = [line.strip() for line in f if line.strip()]
+def combine_csvs(output_csvs: list, final_csv: str, *, dedup: DuplicateIndex = None, drop_duplicates: bool = False,
+                 output_format: str = None, link_graph: bool = False, diff_against: str = None):
+    """
+    Combine all individual CSVs (e.g. the outputs of several shards) into one final CSV.
+    The inputs may be CSV, JSONL or Parquet files and 'final_csv' is written in 'output_format'.
+    IDs are renumbered so they stay unique, and rows are checked for duplicates with 'dedup'.
+    Inputs written with --link-graph have their links expanded from their own URL table first
+    (see link_graph.read_linked_rows()), as each of them numbers its URLs from 1.
+    With 'link_graph', links are written as a URL table and edge list, and with 'diff_against'
+    the changes since that output are written to a change feed (see MergedRowWriter).
+    """
+    with MergedRowWriter(final_csv, dedup=dedup, drop_duplicates=drop_duplicates, output_format=output_format,
+                         link_graph=link_graph, diff_against=diff_against) as merged:
+        for index, csv_file in enumerate(output_csvs):
+            merged.add(index, read_linked_rows(csv_file))
 
-    # Temporary storage for output CSVs from each URL
-    output_csvs = []
+    print(f"Combined output saved to {final_csv}")
+    print_changes(merged)
 
-    for url in urls:
+def run_multi_facade(input_file: str, final_csv: str, *, single_parse: bool = False,
+                     fetch_workers: int = 4, per_host_limit: int = 4, jobs: int = 1, debug: bool = False,
+                     cache=None, stage_cache=None, dedup_report: str = None, drop_duplicates: bool = False,
+                     urls: list = None, output_format: str = None, report: RunReport = None, profile_dir: str = None,
+                     journal: CheckpointJournal = None, link_graph: bool = False, local_pages: LocalPages = None,
+                     diff_against: str = None):
+    """
+    Run the Facade workflow for multiple URLs and combine the results.
+    Pages are downloaded by 'fetch_workers' threads (at most 'per_host_limit' at a time
+    per host) and each one is processed as soon as it arrives, either in this process
+    or, with 'jobs' > 1, in a pool of worker processes. Rows are streamed into 'final_csv'
+    as each URL finishes. 'cache' is an optional HttpCache and 'stage_cache' an optional StageCache.
+    With 'dedup_report', duplicate concepts are listed in that CSV (and left out with 'drop_duplicates').
+    'urls' replaces the list in 'input_file' when given (e.g. the URLs of a sitemap shard).
+    'output_format' is "csv", "jsonl" or "parquet" (default: from the extension of 'final_csv').
+    With a 'report' (a RunReport), the download and every stage of each URL are measured,
+    and with 'profile_dir' every URL is profiled into that folder.
+    With a 'journal' (a CheckpointJournal), the progress of every URL is recorded there, and
+    if it is resuming an earlier run, the URLs that run finished are taken from the journal
+    instead of being fetched and processed again.
+    With 'link_graph', links are written as a URL table and edge list (see MergedRowWriter).
+    With 'local_pages' (a LocalPages), pages are read from local storage instead of downloaded.
+    With 'diff_against', the changes since that earlier output are written to a change feed (see MergedRowWriter).
+    """
+    resume = journal is not None and journal.resumed
+    if debug:
+        ensure_data_folder(resume=resume)
+
+    # Read the list of URLs from the input file and keep one URL per page
+    if urls is None:
+        urls = read_urls(input_file)
+    urls, duplicates = unique_urls(urls, get_redirect_map())
+    if duplicates:
+        print(f"{len(duplicates)} URLs skipped as variants or redirects of other URLs in the list")
+
+    # A URL redirected to the page of an earlier URL is only found out once downloaded
+    claims = PageClaims(urls)
+
+    def keep(index: int) -> bool:
+        if claims.keeps(index):
+            return True
+        print(f"Skipping URL {urls[index]}: after redirects, it is the same page as {claims.owner_url(index)}")
+        if journal is not None:
+            journal.save_rows(urls[index], [], index)
+        return False
+
+    dedup = DuplicateIndex() if dedup_report or drop_duplicates else None
+    with MergedRowWriter(final_csv, dedup=dedup, drop_duplicates=drop_duplicates, output_format=output_format,
+                         on_write=journal_merges(journal, urls), link_graph=link_graph, diff_against=diff_against,
+                         baseline_path=journal.baseline_path if journal is not None else None, keep=keep) as merged:
+        pending = list(range(len(urls)))
+        if resume:
+            pending = []
+            for index, url in enumerate(urls):
+                rows = journal.load_rows(url)
+                if rows is None:
+                    pending.append(index)
+                else:
+                    claims.claim(index, url)
+                    add_url_rows(merged, None, index, url, rows, journal=journal)
+            print(f"Resuming: {len(urls) - len(pending)} of {len(urls)} URLs already done")
+
+        if jobs > 1:
+            run_jobs(urls, merged, jobs=jobs, single_parse=single_parse, fetch_workers=fetch_workers,
+                     per_host_limit=per_host_limit, debug=debug, cache=cache, stage_cache=stage_cache, report=report,
+                     profile_dir=profile_dir, pending=pending, journal=journal, local_pages=local_pages, claims=claims)
+        else:
+            pages = fetch_pending(urls, pending, fetch_workers=fetch_workers, per_host_limit=per_host_limit,
+                                  cache=cache, report=report, journal=journal, local_pages=local_pages, claims=claims)
+            for index, url, page_html, error in pages:
+                if error is not None:
+                    print(f"Error processing URL {url}: {error}")
+                    add_url_rows(merged, report, index, url, [], error=error, journal=journal)
+                    continue
+                if page_html is None:
+                    add_url_rows(merged, report, index, url, [], journal=journal)
+                    continue
+                try:
+                    print(f"Processing URL: {url}")
+                    _, rows, metrics = process_url_job(index, url, page_html, single_parse, debug, stage_cache,
+                                                       report is not None, profile_dir)
+                    add_url_rows(merged, report, index, url, rows, metrics, journal=journal)
+                except Exception as e:
+                    print(f"Error processing URL {url}: {e}")
+                    add_url_rows(merged, report, index, url, [], error=e, journal=journal)
+
+    print(f"Combined output saved to {final_csv}")
+    print_changes(merged)
+    if dedup is not None:
+        if dedup_report:
+            dedup.write_report(dedup_report)
+        print(f"{len(dedup.duplicates)} duplicate concepts found" + (f", listed in {dedup_report}" if dedup_report else ""))
+
+def run_jobs(urls: list, merged: MergedRowWriter, *, jobs: int, single_parse: bool,
+             fetch_workers: int, per_host_limit: int, debug: bool, cache=None, stage_cache=None,
+             report: RunReport = None, profile_dir: str = None, pending: list = None,
+             journal: CheckpointJournal = None, local_pages: LocalPages = None, claims: PageClaims = None):
+    """
+    Process 'urls' (only those numbered 'pending' if given) in a pool of 'jobs' worker
+    processes. Pages are handed to the pool as soon as they are downloaded, and the rows
+    returned by each job go straight to 'merged' (and the 'journal') while the other pages
+    are still downloading. At most two pages per worker wait in the pool; downloads pause
+    while it is full, so pages do not pile up in memory when processing is the slower part.
+    Workers use the same parser backend and compression as this process and send their stage metrics
+    back with the rows when there is a 'report'. 'claims' is passed on to fetch_pending().
+    """
+    if pending is None:
+        pending = list(range(len(urls)))
+
+    futures = {}
+
+    def merge(future):
+        index, url = futures.pop(future)
         try:
-            print(f"Processing URL: {url}")
-            temp_csv = run_facade_for_url(url)
-            output_csvs.append(temp_csv)
-        except FileNotFoundError as e:
-            print(f"Error: {e}")
-        except subprocess.CalledProcessError as e:
+            _, rows, metrics = future.result()
+            add_url_rows(merged, report, index, url, rows, metrics, journal=journal)
+        except Exception as e:
             print(f"Error processing URL {url}: {e}")
+            add_url_rows(merged, report, index, url, [], error=e, journal=journal)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(get_backend(), get_compression())) as pool:
+        pages = fetch_pending(urls, pending, fetch_workers=fetch_workers, per_host_limit=per_host_limit,
+                              cache=cache, report=report, journal=journal, local_pages=local_pages, claims=claims)
+        for index, url, page_html, error in pages:
+            if error is not None:
+                print(f"Error processing URL {url}: {error}")
+                add_url_rows(merged, report, index, url, [], error=error, journal=journal)
+            elif page_html is None:
+                add_url_rows(merged, report, index, url, [], journal=journal)
+            else:
+                print(f"Processing URL: {url}")
+                future = pool.submit(process_url_job, index, url, page_html, single_parse, debug, stage_cache,
+                                     report is not None, profile_dir)
+                futures[future] = (index, url)
+
+            if len(futures) >= 2 * jobs:
+                wait(futures, return_when=FIRST_COMPLETED)
+            for future in [future for future in futures if future.done()]:
+                merge(future)
+
+        for future in as_completed(list(futures)):
+            merge(future)
 
-    # Combine all CSVs into one final CSV
-    combine_csvs(output_csvs, final_csv)
+def run_crawl(input_file: str, final_csv: str, *, scope: str = None, max_depth: int = 2, max_pages: int = 500,
+              respect_robots: bool = True, single_parse: bool = False, fetch_workers: int = 4,
+              per_host_limit: int = 4, jobs: int = 1, debug: bool = False, cache=None, stage_cache=None,
+              dedup_report: str = None, drop_duplicates: bool = False, seeds: list = None,
+              output_format: str = None, report: RunReport = None, profile_dir: str = None,
+              journal: CheckpointJournal = None, link_graph: bool = False, diff_against: str = None):
+    """
+    Crawl from the URLs in 'input_file' instead of processing only those URLs.
+    Every link found in a page's rows that lies under 'scope' (see crawler.scope_prefixes)
+    is queued once, up to 'max_depth' links away from a seed and 'max_pages' pages in total.
+    Rows are written to 'final_csv' in the order pages were discovered.
+    'seeds' replaces the list in 'input_file' when given.
+    When the 'journal' resumes an earlier crawl, the pages it finished are not fetched
+    again, but their saved rows are written and their links followed.
+    The other arguments are the same as for run_multi_facade().
+    """
+    resume = journal is not None and journal.resumed
+    if debug:
+        ensure_data_folder(resume=resume)
+
+    if seeds is None:
+        seeds = read_urls(input_file)
+
+    frontier = Frontier(scope_prefixes(seeds, scope), max_depth, max_pages)
+    process = partial(process_url_job, single_parse=single_parse, debug=debug, stage_cache=stage_cache,
+                      record=report is not None, profile_dir=profile_dir)
+    pool = None
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(get_backend(), get_compression()))
+
+    dedup = DuplicateIndex() if dedup_report or drop_duplicates else None
+    completed = journal.load_rows if resume else None
+    url_of = {}
+    try:
+        with MergedRowWriter(final_csv, dedup=dedup, drop_duplicates=drop_duplicates, output_format=output_format,
+                             on_write=journal_merges(journal, url_of), link_graph=link_graph,
+                             diff_against=diff_against,
+                             baseline_path=journal.baseline_path if journal is not None else None) as merged:
+            pages = crawl(seeds, process, frontier, workers=fetch_workers, per_host=per_host_limit, cache=cache,
+                          respect_robots=respect_robots, pool=pool, report=report, completed=completed)
+            for index, url, rows, error, metrics in pages:
+                url_of[index] = url
+                if error is not None:
+                    print(f"Error processing URL {url}: {error}")
+                else:
+                    print(f"Processed URL: {url} ({len(rows)} rows)")
+                add_url_rows(merged, report, index, url, rows, metrics, error, journal)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"Combined output saved to {final_csv}")
+    print_changes(merged)
+    if dedup is not None:
+        if dedup_report:
+            dedup.write_report(dedup_report)
+        print(f"{len(dedup.duplicates)} duplicate concepts found" + (f", listed in {dedup_report}" if dedup_report else ""))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run Facade.py for multiple URLs and combine results.")
     parser.add_argument("--input", type=str, default="data/multi_url.txt", help="Path to the file containing multiple URLs.")
-    parser.add_argument("--output", type=str, default="data/multi_final.csv", help="Path to the combined output CSV.")
+    parser.add_argument("--output", type=str, default=None, help="Path to the combined output (default: data/multi_final.csv).")
+    parser.add_argument("--format", type=str, default=None, choices=list(WRITERS), help="Output format (default: from the --output extension, else CSV).")
+    parser.add_argument("--single-parse", action="store_true", help="Parse each page once instead of once per stage.")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="Number of pages downloaded concurrently.")
+    parser.add_argument("--per-host-limit", type=int, default=4, help="Maximum concurrent downloads from one host.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes that run the pipeline.")
+    parser.add_argument("--debug", action="store_true", help="Keep each URL's intermediate files in data/multi_jobs/.")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Keep downloaded pages in this HTTP cache folder.")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="Size cap of the HTTP cache in MB.")
+    parser.add_argument("--offline", action="store_true", help="Only read pages from the HTTP cache.")
+    parser.add_argument("--stage-cache", type=str, default=None, help="Memoize stage results in this folder.")
+    parser.add_argument("--dedup-report", type=str, default=None, help="Write duplicate concepts to this CSV report.")
+    parser.add_argument("--drop-duplicates", action="store_true", help="Leave duplicate concepts out of the output.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
+    parser.add_argument("--crawl", action="store_true", help="Use the input URLs as seeds and follow in-scope links.")
+    parser.add_argument("--scope", type=str, default=None, help="Only follow links under this path or URL prefix.")
+    parser.add_argument("--max-depth", type=int, default=2, help="Maximum number of links followed from a seed.")
+    parser.add_argument("--max-pages", type=int, default=500, help="Maximum number of pages crawled.")
+    parser.add_argument("--ignore-robots", action="store_true", help="Do not check robots.txt while crawling.")
+    parser.add_argument("--sitemap", type=str, default=None, help="Take the URLs from this sitemap.xml (path or URL) instead of --input.")
+    parser.add_argument("--include", type=str, action="append", default=[], help="Only keep sitemap URLs under this path (repeatable).")
+    parser.add_argument("--exclude", type=str, action="append", default=[], help="Drop sitemap URLs under this path (repeatable).")
+    parser.add_argument("--mirror", type=str, default=None, help="Process the saved HTML pages of this folder (e.g. the built site) instead of downloading.")
+    parser.add_argument("--base-url", type=str, default="https://kubernetes.io", help="URL of the site saved in --mirror, used to rebuild the page URLs.")
+    parser.add_argument("--warc", type=str, nargs="+", default=[], help="Process the HTML pages of these WARC files (.warc or .warc.gz) instead of downloading.")
+    parser.add_argument("--redirect-map", type=str, default=None, help="Load the redirects of earlier runs from this JSON file and save this run's redirects to it.")
+    parser.add_argument("--shards", type=int, default=1, help="Split the URL list into this many shards.")
+    parser.add_argument("--shard", type=int, default=0, help="The shard processed by this run, from 0 to --shards - 1.")
+    parser.add_argument("--merge", type=str, nargs="+", default=None, help="Only merge these CSV/JSONL/Parquet files (e.g. shard outputs) into --output.")
+    parser.add_argument("--report", type=str, default=None, help="Write per-URL, per-stage timings, sizes and memory to this JSON file.")
+    parser.add_argument("--profile", type=str, default=None, help="Save cProfile/tracemalloc profiles of the slowest pages to this folder.")
+    parser.add_argument("--profile-top", type=int, default=10, help="Number of slowest pages whose profiles are kept.")
+    parser.add_argument("--compress", type=str, default=None, choices=list(EXTENSIONS), help="Compress the combined output (also a given --output, e.g. data/out.csv -> data/out.csv.gz), step files and saved rows.")
+    parser.add_argument("--resume", action="store_true", help="Keep a checkpoint journal, and continue the interrupted run it records (if any).")
+    parser.add_argument("--link-graph", action="store_true", help="Store links as IDs into a URL table, plus an edge list (e.g. data/multi_final_urls.csv and data/multi_final_links.csv).")
+    parser.add_argument("--diff-against", type=str, default=None, help="Write the rows added, changed or removed since this earlier output (e.g. the last --output) to data/multi_final_changes.csv.")
+    parser.add_argument("--checkpoint-dir", type=str, default=None, help="Keep a checkpoint journal in this folder (default with --resume: next to --output, e.g. data/multi_final_checkpoint).")
+    add_policy_arguments(parser)
     args = parser.parse_args()
+    try:
+        check_shard(args.shard, args.shards)
+    except ValueError as e:
+        parser.error(str(e))
+
+    set_backend(args.parser)
+    try:
+        set_compression(args.compress)
+    except ImportError as e:
+        parser.error(str(e))
+    if args.redirect_map:
+        set_redirect_map(RedirectMap(args.redirect_map))
+    set_fetch_policy(policy_from_args(args, args.per_host_limit))
+    cache = create_cache(args.cache_dir, args.cache_max_mb, args.offline)
+    stage_cache = StageCache(args.stage_cache) if args.stage_cache else None
+
+    output = args.output or "data/multi_final.csv"
+    if args.format and not args.output:
+        output = with_format_extension(output, args.format)
+    if not args.output or args.compress:
+        output = with_output_compression(output, args.format)
+    output_format = format_of(output, args.format)
+    try:
+        for path in [output, args.input, args.diff_against, *(args.merge or [])]:
+            if path:
+                check_available(compression_of(path))
+    except ImportError as e:
+        parser.error(f"{path}: {e}")
+    if args.merge:
+        dedup = DuplicateIndex() if args.dedup_report or args.drop_duplicates else None
+        try:
+            combine_csvs(args.merge, output, dedup=dedup, drop_duplicates=args.drop_duplicates,
+                         output_format=output_format, link_graph=args.link_graph, diff_against=args.diff_against)
+        except ValueError as e:
+            parser.error(str(e))
+        if dedup is not None and args.dedup_report:
+            dedup.write_report(args.dedup_report)
+        raise SystemExit(0)
+
+    # Build the URL list from local pages or the sitemap and/or keep only this run's shard
+    urls = None
+    local_pages = None
+    if args.mirror or args.warc:
+        if args.crawl or args.sitemap:
+            parser.error("--mirror/--warc cannot be combined with --crawl or --sitemap")
+        if args.mirror and not os.path.isdir(args.mirror):
+            parser.error(f"--mirror folder not found: {args.mirror}")
+        local_pages = LocalPages(args.mirror, args.base_url, args.warc)
+        urls = select_shard(local_pages.urls, args.shard, args.shards) if args.shards > 1 else local_pages.urls
+        print(f"{len(local_pages.urls)} pages found in " + " and ".join(filter(None, [args.mirror, *args.warc])))
+    elif args.sitemap:
+        urls = sitemap_urls(args.sitemap, args.include, args.exclude, args.shard, args.shards, cache)
+        print(f"{len(urls)} URLs taken from {args.sitemap}")
+    elif args.shards > 1:
+        # Variants of one page must land in the same shard, so drop them before splitting
+        urls = select_shard(unique_urls(read_urls(args.input), get_redirect_map())[0], args.shard, args.shards)
+    if args.shards > 1 and not args.output:
+        output = shard_csv_name(output, args.shard, args.shards)
+
+    report = RunReport() if args.report or args.profile else None
+    # Checkpointing is opt-in: it saves every URL's rows a second time and syncs every status change
+    journal = None
+    if args.resume or args.checkpoint_dir:
+        try:
+            journal = CheckpointJournal(args.checkpoint_dir or checkpoint_dir_name(output), args.resume)
+        except ValueError as e:
+            parser.error(str(e))
+        # An interrupted run without --diff-against saved no baseline, and may have overwritten the output
+        if (args.diff_against and journal.entries and not os.path.exists(journal.baseline_path)
+                and os.path.abspath(args.diff_against) == os.path.abspath(output)):
+            journal.close()
+            parser.error("--diff-against is the output the interrupted run was writing, and that run saved "
+                         "no baseline of it; diff against a copy of the earlier output instead")
+    try:
+        # Options shared by both modes
+        options = dict(
+            single_parse=args.single_parse, fetch_workers=args.fetch_workers, per_host_limit=args.per_host_limit,
+            jobs=args.jobs, debug=args.debug, cache=cache, stage_cache=stage_cache, dedup_report=args.dedup_report,
+            drop_duplicates=args.drop_duplicates, output_format=output_format, report=report,
+            profile_dir=args.profile, journal=journal, link_graph=args.link_graph, diff_against=args.diff_against,
+        )
+        if args.crawl:
+            run_crawl(args.input, output, scope=args.scope, max_depth=args.max_depth, max_pages=args.max_pages,
+                      respect_robots=not args.ignore_robots, seeds=urls, **options)
+        else:
+            run_multi_facade(args.input, output, urls=urls, local_pages=local_pages, **options)
+    finally:
+        if journal is not None:
+            journal.close()
+    if journal is not None:
+        counts = journal.counts()
+        print(f"{counts['merged']} URLs done, {counts['failed']} failed (journal: {journal.path})")
+
+    if args.redirect_map:
+        get_redirect_map().save()
+        print(f"{len(get_redirect_map())} redirects saved to {args.redirect_map}")
 
-    run_multi_facade(args.input, args.output)
+    if args.profile:
+        report.keep_slowest_profiles(args.profile_top)
+        print(f"Profiles of the {args.profile_top} slowest pages kept in {args.profile}")
+    if args.report:
+        report.write(args.report, args.profile_top)
+        print(f"Run report saved to {args.report}")
@@ -0,0 +1,283 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from Facade import create_cache, extract_rows
+from stage_cache import StageCache  # lib/ is on sys.path once Facade is imported
+from simple_spider import fetch_page
+from parser_backend import BACKENDS, get_backend, set_backend
+from fetch_policy import add_policy_arguments, policy_from_args, set_fetch_policy
+from canonical_urls import canonical_url
+
+# A small page run once by every worker at start-up, so the first real request finds
+# the pipeline modules imported and their code paths warm
+WARM_UP_HTML = """<html><body><div class="td-content"><h1>Warm up</h1>
+<h2 id="section">Section</h2><p>Some <a href="/docs/">text</a>.</p>
+<pre><code>kubectl get pods</code></pre></div></body></html>"""
+WARM_UP_URL = "https://kubernetes.io/docs/warm-up/"
+
+def extract_job(url: str, page_html: str, single_parse: bool = False, stage_cache=None) -> list:
+    """Runs steps 1-7 on 'page_html' (the page of 'url'); this runs in the worker processes."""
+    return extract_rows(url, page_html, single_parse=single_parse, stage_cache=stage_cache)
+
+class ResultCache:
+    """
+    In-memory cache of the rows of recent extractions. Holds at most 'max_entries' results,
+    evicting the least recently used one, and a result expires 'ttl' seconds after it was stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The rows stored under 'key', or None if there are none or they expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, rows = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return rows
+
+    def put(self, key, rows: list):
+        """Stores 'rows' under 'key'."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RequestCoalescer:
+    """
+    Runs one job per key at a time: a request for a key whose job is still running waits
+    for that job's result (or error) instead of starting the same work again.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, job):
+        """Returns (job(), False), or (result of the running job for 'key', True) if there is one."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(job())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result(), False
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+class ExtractionService:
+    """
+    Extracts the rows of single pages on request, without writing any file.
+    Pages are downloaded in the calling thread (through 'http_cache', an HttpCache, if given)
+    and processed by a pool of 'jobs' worker processes started and warmed up once, or in
+    the calling thread with 'jobs' = 0. Concurrent requests for the same page share one job,
+    and results are kept in a ResultCache of 'cache_size' entries for 'cache_ttl' seconds.
+    If a worker process dies, the request it was running fails and the pool is started again.
+    """
+
+    def __init__(self, jobs: int = 2, http_cache=None, stage_cache=None, single_parse: bool = False,
+                 cache_size: int = 1024, cache_ttl: float = 300.0):
+        self.http_cache = http_cache
+        self.stage_cache = stage_cache
+        self.single_parse = single_parse
+        self.results = ResultCache(cache_size, cache_ttl)
+        self.coalescer = RequestCoalescer()
+        self.jobs = jobs
+        self._pool_lock = threading.Lock()
+        self.pool = self._start_pool() if jobs > 0 else None
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """A pool of 'jobs' worker processes, each warmed up on WARM_UP_HTML."""
+        pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=set_backend, initargs=(get_backend(),))
+        warm_ups = [pool.submit(extract_job, WARM_UP_URL, WARM_UP_HTML) for _ in range(self.jobs)]
+        for warm_up in warm_ups:
+            warm_up.result()
+        return pool
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Starts a new pool in place of 'broken' (once, however many requests saw it break)."""
+        with self._pool_lock:
+            if self.pool is broken:
+                print("A worker process died; restarting the worker pool")
+                broken.shutdown(wait=False)
+                self.pool = self._start_pool()
+
+    def _extract(self, key, url: str, page_html: str) -> list:
+        if page_html is None:
+            page_html = fetch_page(url, cache=self.http_cache)
+        if self.pool is None:
+            rows = extract_job(url, page_html, self.single_parse, self.stage_cache)
+        else:
+            pool = self.pool
+            try:
+                rows = pool.submit(extract_job, url, page_html, self.single_parse, self.stage_cache).result()
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+                raise
+        self.results.put(key, rows)
+        return rows
+
+    def extract(self, url: str, page_html: str = None, refresh: bool = False) -> dict:
+        """
+        The rows of 'url' as a response dict, processing 'page_html' if given instead of
+        downloading the page. With 'refresh', a cached result is not used. 'url' is
+        canonicalized first, so variants of it (e.g. with a #fragment) share one job and result.
+        Raises requests.exceptions.RequestException if the page cannot be retrieved.
+        """
+        start = time.perf_counter()
+        url = canonical_url(url)
+        key = (url, hashlib.sha1(page_html.encode("utf-8")).hexdigest() if page_html is not None else None)
+        rows = None if refresh else self.results.get(key)
+        cached = rows is not None
+        coalesced = False
+        if not cached:
+            rows, coalesced = self.coalescer.run(key, lambda: self._extract(key, url, page_html))
+        return {"url": url, "rows": rows, "cached": cached, "coalesced": coalesced,
+                "seconds": round(time.perf_counter() - start, 6)}
+
+    def status(self) -> dict:
+        """Counts shown by the /health endpoint."""
+        return {"status": "ok", "cached_results": len(self.results), "in_flight": len(self.coalescer)}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    The HTTP API of the ExtractionService in 'self.server.service':
+        GET  /extract?url=<url>[&refresh=1]          rows of a page, downloaded by the service
+        POST /extract {"url", "html", "refresh"}     rows of 'html' (or of 'url' without it)
+        GET  /health                                 cache and in-flight counts
+    Answers are JSON; a page that cannot be downloaded gives a 502.
+    """
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _extract(self, url: str, page_html: str, refresh: bool):
+        if not url:
+            self._send_json(400, {"error": "'url' is required"})
+            return
+        if page_html is None and urlparse(url).scheme not in ("http", "https"):
+            self._send_json(400, {"error": f"Not an http(s) URL: {url}"})
+            return
+        try:
+            self._send_json(200, self.server.service.extract(url, page_html, refresh))
+        except requests.exceptions.RequestException as e:
+            self._send_json(502, {"url": url, "error": f"Error fetching URL: {e}"})
+        except Exception as e:
+            self._send_json(500, {"url": url, "error": f"Error processing URL: {e}"})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/health":
+            self._send_json(200, self.server.service.status())
+        elif parsed.path == "/extract":
+            query = parse_qs(parsed.query)
+            url = query.get("url", [None])[0]
+            self._extract(url, None, query.get("refresh", ["0"])[0] not in ("", "0", "false"))
+        else:
+            self._send_json(404, {"error": f"Unknown path: {parsed.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/extract":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid JSON body: {e}"})
+            return
+        if not isinstance(request, dict):
+            self._send_json(400, {"error": "The JSON body must be an object"})
+            return
+        for name in ("url", "html"):
+            if not isinstance(request.get(name), (str, type(None))):
+                self._send_json(400, {"error": f"'{name}' must be a string"})
+                return
+        self._extract(request.get("url"), request.get("html"), bool(request.get("refresh")))
+
+def create_server(service: ExtractionService, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """
+    An HTTP server answering every request in its own thread with 'service', listening on
+    'host':'port' (OSError if it cannot). 'service' can be None and set later as 'server.service',
+    so the port is bound before any worker is started.
+    """
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.service = service
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve page extractions over HTTP from warm worker processes.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--jobs", type=int, default=2, help="Number of warm worker processes (0: process requests in the server threads).")
+    parser.add_argument("--result-cache-size", type=int, default=1024, help="Maximum number of results kept in memory.")
+    parser.add_argument("--result-ttl", type=float, default=300.0, help="Seconds a result is served from memory.")
+    parser.add_argument("--single-parse", action="store_true", help="Parse each page once instead of once per stage.")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Keep downloaded pages in this HTTP cache folder.")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="Size cap of the HTTP cache in MB.")
+    parser.add_argument("--offline", action="store_true", help="Only read pages from the HTTP cache.")
+    parser.add_argument("--stage-cache", type=str, default=None, help="Memoize stage results in this folder.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
+    add_policy_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        server = create_server(None, args.host, args.port)
+    except OSError as e:
+        parser.error(f"Cannot listen on {args.host}:{args.port}: {e}")
+
+    set_backend(args.parser)
+    set_fetch_policy(policy_from_args(args))
+    cache = create_cache(args.cache_dir, args.cache_max_mb, args.offline)
+    stage_cache = StageCache(args.stage_cache) if args.stage_cache else None
+    service = server.service = ExtractionService(args.jobs, cache, stage_cache, args.single_parse,
+                                                 args.result_cache_size, args.result_ttl)
+    print(f"Serving extractions on http://{args.host}:{args.port}/extract ({args.jobs} warm workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import json
+import random
+import hashlib
+import argparse
+
+# The pipeline stages live in lib/ as standalone scripts; make them importable.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+from simple_spider import fetch_page
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+MANIFEST = "manifest.json"
+
+# Generated pages, from small to very large: name -> (title, number of <h2> sections)
+GENERATED_PAGES = {
+    "small_configmap": ("ConfigMaps", 4),
+    "medium_ingress": ("Ingress", 30),
+    "large_workloads": ("Workload Management", 250),
+    "xlarge_api_reference": ("Kubernetes API Reference", 1200),
+}
+
+SENTENCES = [
+    "A Pod is the smallest deployable unit of computing that you can create and manage in Kubernetes.",
+    "The control plane manages the worker nodes and the Pods in the cluster.",
+    "Ingress exposes HTTP and HTTPS routes from outside the cluster to services within the cluster.",
+    "Traffic routing is controlled by rules defined on the Ingress resource.",
+    "A Deployment provides declarative updates for Pods and ReplicaSets.",
+    "You describe a desired state in a Deployment, and the Deployment Controller changes the actual state to the desired state at a controlled rate.",
+    "Labels are key/value pairs that are attached to objects such as Pods.",
+    "Each node runs the kubelet, which makes sure that containers are running in a Pod.",
+    "If the ingressClassName is omitted, a default Ingress class should be defined.",
+    "A ConfigMap allows you to decouple environment-specific configuration from your container images.",
+    "Use a Secret for confidential data such as passwords, tokens or keys.",
+    "The scheduler watches for newly created Pods that have no node assigned.",
+    "Services allow your applications to receive traffic, e.g. from other Pods in the cluster.",
+    "Note that the rollout is only triggered when the Pod template is changed.",
+    "See the API reference for the full list of fields.",
+]
+
+TERMS = ["kubectl", "Pod", "spec.replicas", "ingressClassName", "metadata.name", "ReplicaSet", "kube-proxy",
+         "PersistentVolumeClaim", "NodePort", "ClusterIP"]
+
+YAML_LINES = [
+    ("apiVersion", "networking.k8s.io/v1"), ("kind", "Ingress"), ("metadata", ""), ("  name", "minimal-ingress"),
+    ("  annotations", ""), ("    nginx.ingress.kubernetes.io/rewrite-target", "/"), ("spec", ""),
+    ("  ingressClassName", "nginx-example"), ("  rules", ""), ("  - http", ""), ("      paths", ""),
+    ("      - path", "/testpath"), ("        pathType", "Prefix"),
+]
+
+def highlighted_yaml(rng: random.Random) -> str:
+    """A YAML manifest marked up the way the Hugo syntax highlighter on kubernetes.io does it."""
+    lines = []
+    for key, value in YAML_LINES[:rng.randint(5, len(YAML_LINES))]:
+        line = f'<span style="color:#008000;font-weight:bold">{key}</span>:'
+        if value:
+            line += f'<span style="color:#bbb"> </span>{value}'
+        lines.append(f'<span style="display:flex;"><span>{line}\n</span></span>')
+    return ('<div class="highlight"><pre tabindex="0" style="background-color:#f8f8f8;">'
+            '<code class="language-yaml" data-lang="yaml">' + "".join(lines) + "</code></pre></div>")
+
+def paragraph(rng: random.Random, section_ids: list) -> str:
+    """A paragraph with inline code and relative, fragment and absolute links."""
+    parts = []
+    for sentence in rng.sample(SENTENCES, rng.randint(2, 5)):
+        kind = rng.random()
+        if kind < 0.2:
+            sentence += f' See <a href="/docs/concepts/{rng.choice(TERMS).lower()}/">{rng.choice(TERMS)}</a>.'
+        elif kind < 0.3:
+            sentence += f' Read <a href="#{rng.choice(section_ids)}">the section above</a> first.'
+        elif kind < 0.35:
+            sentence += ' Details are on <a href="https://github.com/kubernetes/kubernetes">GitHub</a>.'
+        elif kind < 0.55:
+            sentence = sentence.replace(" the ", f" the <code>{rng.choice(TERMS)}</code> ", 1)
+        parts.append(sentence)
+    return "<p>" + " ".join(parts) + "</p>"
+
+def section(rng: random.Random, index: int, section_ids: list) -> str:
+    """One <h2> section: paragraphs, a list, an optional code sample and an optional <h3>."""
+    parts = [f'<h2 id="{section_ids[index]}">{rng.choice(TERMS)} section {index + 1}</h2>']
+    for _ in range(rng.randint(1, 4)):
+        parts.append(paragraph(rng, section_ids))
+    items = "".join(f"<li>{rng.choice(SENTENCES)}</li>" for _ in range(rng.randint(2, 5)))
+    parts.append(f"<ul>{items}</ul>")
+    if rng.random() < 0.6:
+        parts.append(highlighted_yaml(rng))
+    if rng.random() < 0.3:
+        parts.append(f'<h3 id="{section_ids[index]}-details">Details</h3>' + paragraph(rng, section_ids))
+    if rng.random() < 0.2:
+        parts.append(f'<div class="alert alert-info" role="alert"><h4 class="alert-heading">Note:</h4>'
+                     f"{paragraph(rng, section_ids)}</div>")
+    return "\n".join(parts)
+
+def generate_page(name: str, title: str, sections: int) -> str:
+    """
+    A documentation page with the layout of kubernetes.io (navigation, sidebar, a
+    <div class="td-content"> with the article, footer). The content only depends on 'name'.
+    """
+    rng = random.Random(name)
+    section_ids = [f"section-{i + 1}" for i in range(sections)]
+    nav = "".join(f'<li class="nav-item"><a class="nav-link" href="/docs/{term.lower()}/">{term}</a></li>'
+                  for term in TERMS)
+    sidebar = "".join(f'<li><a href="/docs/concepts/{term.lower()}/">{term}</a></li>' for term in TERMS * 3)
+    body = "\n".join(section(rng, index, section_ids) for index in range(sections))
+    return f"""<!doctype html>
+<html lang="en" class="no-js">
+<head>
+<meta charset="utf-8">
+<title>{title} | Kubernetes</title>
+<link rel="stylesheet" href="/css/style.css">
+</head>
+<body class="td-page">
+<header><nav class="js-navbar-scroll navbar navbar-expand navbar-dark td-navbar"><ul class="navbar-nav">{nav}</ul></nav></header>
+<div class="container-fluid td-outer"><div class="td-main"><div class="row flex-xl-nowrap">
+<aside class="col-12 col-md-3 col-xl-2 td-sidebar d-print-none"><nav class="td-sidebar-nav"><ul>{sidebar}</ul></nav></aside>
+<main class="col-12 col-md-9 col-xl-8 ps-md-5" role="main">
+<div class="td-content">
+<h1>{title}</h1>
+<div class="lead">{paragraph(rng, section_ids)}</div>
+{body}
+</div>
+</main>
+</div></div></div>
+<footer class="d-print-none footer row"><p>&copy; 2024 The Kubernetes Authors | Documentation Distributed under CC BY 4.0</p></footer>
+</body>
+</html>
+"""
+
+def save_page(corpus_dir: str, name: str, html: str, source: str) -> dict:
+    """Writes 'html' to '<name>.html.gz' in 'corpus_dir' and returns its manifest entry."""
+    data = html.encode("utf-8")
+    file_name = f"{name}.html.gz"
+    # mtime=0 keeps the file identical between runs
+    with gzip.GzipFile(os.path.join(corpus_dir, file_name), "wb", mtime=0) as f:
+        f.write(data)
+    return {"name": name, "file": file_name, "source": source, "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest()}
+
+def load_manifest(corpus_dir: str = CORPUS_DIR) -> list:
+    """Returns the manifest entries of the corpus (an empty list if there is no manifest yet)."""
+    path = os.path.join(corpus_dir, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_page(entry: dict, corpus_dir: str = CORPUS_DIR) -> str:
+    """Returns the HTML of a manifest entry."""
+    with gzip.open(os.path.join(corpus_dir, entry["file"]), "rt", encoding="utf-8") as f:
+        return f.read()
+
+def write_manifest(entries: list, corpus_dir: str = CORPUS_DIR):
+    """Writes the manifest, smallest page first."""
+    entries = sorted(entries, key=lambda entry: entry["bytes"])
+    with open(os.path.join(corpus_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+        f.write("\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the saved-page corpus used by run_benchmarks.py.")
+    parser.add_argument("--corpus-dir", type=str, default=CORPUS_DIR, help="Folder of the corpus.")
+    parser.add_argument("--record", type=str, nargs="+", default=[], help="Download these URLs into the corpus.")
+    parser.add_argument("--generate", action="store_true", help="(Re)write the generated pages.")
+    args = parser.parse_args()
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    entries = {entry["name"]: entry for entry in load_manifest(args.corpus_dir)}
+
+    if args.generate:
+        for name, (title, sections) in GENERATED_PAGES.items():
+            entries[name] = save_page(args.corpus_dir, name, generate_page(name, title, sections), "generated")
+            print(f"Generated {name}: {entries[name]['bytes']} bytes")
+
+    for url in args.record:
+        try:
+            name = "recorded_" + url.rstrip("/").split("/")[-1].replace("-", "_")
+            entries[name] = save_page(args.corpus_dir, name, fetch_page(url), url)
+            print(f"Recorded {url} as {name}: {entries[name]['bytes']} bytes")
+        except Exception as e:
+            print(f"Error recording {url}: {e}")
+
+    write_manifest(list(entries.values()), args.corpus_dir)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+# The pipeline stages live in lib/ as standalone scripts; make them importable.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "lib"))
+
+from simple_spider import extract_td_html
+from clean_html_links import annotate_links_in_html
+from extract_h2 import extract_sections_text, extract_sections_text_streaming
+from extract_code_example import process_sections_text
+from clean_all_tags_and_newline import process_all_chunks
+from final_refine import process_text
+from to_csv import build_rows
+from pipeline import normalize_newlines, process_page
+from parser_backend import BACKENDS, set_backend
+from build_corpus import CORPUS_DIR, load_manifest, load_page
+
+CATEGORY = "Kubernetes"
+REFERENCE = "https://kubernetes.io/docs/benchmark/"
+ROOT_URL = "https://kubernetes.io"
+
+# Steps 1-7 in order: each one gets the output of the one before it
+STAGES = [
+    ("simple_spider", extract_td_html),
+    ("clean_html_links", annotate_links_in_html),
+    ("extract_h2", extract_sections_text),
+    ("extract_code_example", process_sections_text),
+    ("clean_all_tags_and_newline", process_all_chunks),
+    ("final_refine", process_text),
+    ("to_csv", lambda text: build_rows(text, CATEGORY, REFERENCE, ROOT_URL)),
+]
+
+# Other implementations of a stage, run on the same input as it: (name, function, stage)
+STAGE_VARIANTS = [
+    ("extract_h2_stream", extract_sections_text_streaming, "extract_h2"),
+]
+
+# The whole workflow on the full page, as Facade.py runs it
+PIPELINES = [
+    ("pipeline", lambda html: process_page(html, CATEGORY, REFERENCE, ROOT_URL)),
+    ("pipeline_single_parse", lambda html: process_page(html, CATEGORY, REFERENCE, ROOT_URL, single_parse=True)),
+    ("pipeline_stream", lambda html: process_page(html, CATEGORY, REFERENCE, ROOT_URL, stream=True)),
+]
+
+def stage_inputs(page_html: str) -> dict:
+    """Runs steps 1-6 once and returns the input of every stage (and pipeline), by name."""
+    inputs = {name: page_html for name, _ in PIPELINES}
+    text = page_html
+    for name, func in STAGES:
+        inputs[name] = text
+        text = func(text)
+        if name == "simple_spider":
+            # run_stages() works on the extracted HTML with normalized newlines
+            text = normalize_newlines(text)
+    for name, _, stage in STAGE_VARIANTS:
+        inputs[name] = inputs[stage]
+    return inputs
+
+def time_call(func, arg, repeat: int) -> float:
+    """The best time of 'repeat' calls of func(arg), in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def peak_memory(func, arg) -> int:
+    """The peak of memory allocated by Python during one call of func(arg), in bytes."""
+    tracemalloc.start()
+    try:
+        func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def git_commit() -> str:
+    """The commit being benchmarked, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(pages: list = None, stages: list = None, repeat: int = 3, corpus_dir: str = CORPUS_DIR,
+                   memory: bool = True) -> dict:
+    """
+    Runs every stage and pipeline (or only 'stages') on every corpus page (or only 'pages')
+    and returns the results: per page and stage, the input size, the best of 'repeat' run
+    times and the peak memory of one more run; per stage, the totals over all pages with
+    the throughput in pages/s and MB/s. Memory is measured with tracemalloc in a separate
+    run, so it does not slow down the timed runs; without 'memory' it is not measured (None).
+    """
+    entries = [entry for entry in load_manifest(corpus_dir) if not pages or entry["name"] in pages]
+    variants = [(name, func) for name, func, _ in STAGE_VARIANTS]
+    benchmarks = [(name, func) for name, func in STAGES + variants + PIPELINES if not stages or name in stages]
+
+    results = {}
+    for entry in entries:
+        page_html = load_page(entry, corpus_dir)
+        inputs = stage_inputs(page_html)
+        results[entry["name"]] = {}
+        for name, func in benchmarks:
+            arg = inputs[name]
+            results[entry["name"]][name] = {
+                "input_bytes": len(arg.encode("utf-8")),
+                "seconds": time_call(func, arg, repeat),
+                "peak_memory_bytes": peak_memory(func, arg) if memory else None,
+            }
+            print(f"{entry['name']:<24} {name:<28} {results[entry['name']][name]['seconds']:.4f}s")
+
+    totals = {}
+    for name, _ in benchmarks:
+        runs = [page_results[name] for page_results in results.values()]
+        seconds = sum(run["seconds"] for run in runs)
+        input_bytes = sum(run["input_bytes"] for run in runs)
+        totals[name] = {
+            "pages": len(runs),
+            "input_bytes": input_bytes,
+            "seconds": seconds,
+            "pages_per_s": len(runs) / seconds if seconds else None,
+            "mb_per_s": input_bytes / (1024 * 1024) / seconds if seconds else None,
+            "peak_memory_bytes": max((run["peak_memory_bytes"] for run in runs), default=0) if memory else None,
+        }
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "corpus": [{"name": entry["name"], "bytes": entry["bytes"], "sha256": entry["sha256"]} for entry in entries],
+        },
+        "stages": totals,
+        "pages": results,
+    }
+
+def compare_results(old: dict, new: dict, threshold: float = 0.1) -> list:
+    """
+    Prints the change of every stage between two result files and returns the stages that
+    got slower (in pages/s) or use more peak memory by more than 'threshold' (0.1 = 10%).
+    Results over different corpora are not comparable, so a warning is printed for those.
+    """
+    if old["meta"]["corpus"] != new["meta"]["corpus"]:
+        print("Warning: the two runs used different corpora")
+
+    regressions = []
+    print(f"{'stage':<28} {'pages/s':>20} {'change':>8} {'peak MB':>16} {'change':>8}")
+    for name, stage in new["stages"].items():
+        if name not in old["stages"]:
+            continue
+        before = old["stages"][name]
+        speed = stage["pages_per_s"] / before["pages_per_s"] - 1
+        line = f"{name:<28} {before['pages_per_s']:>9.2f} -> {stage['pages_per_s']:>7.2f} {speed:>+8.1%}"
+        memory = 0
+        if before["peak_memory_bytes"] and stage["peak_memory_bytes"] is not None:
+            memory = stage["peak_memory_bytes"] / before["peak_memory_bytes"] - 1
+            line += (f" {before['peak_memory_bytes'] / 1e6:>6.1f} -> {stage['peak_memory_bytes'] / 1e6:>6.1f}"
+                     f" {memory:>+8.1%}")
+        print(line)
+        if speed < -threshold or memory > threshold:
+            regressions.append(name)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every stage and the full pipeline on the saved-page corpus.")
+    parser.add_argument("--output", type=str, default="data/benchmark.json", help="Path to the JSON results file.")
+    parser.add_argument("--corpus-dir", type=str, default=CORPUS_DIR, help="Folder of the corpus (see build_corpus.py).")
+    parser.add_argument("--pages", type=str, nargs="+", default=None, help="Only benchmark these corpus pages.")
+    parser.add_argument("--stages", type=str, nargs="+", default=None, help="Only benchmark these stages or pipelines.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per page and stage; the best time is kept.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the (slow) peak memory measurement.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
+    parser.add_argument("--compare", type=str, default=None, help="Compare the results with this earlier results file.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown or memory growth reported as a regression (0.1 = 10%%).")
+    args = parser.parse_args()
+    set_backend(args.parser)
+
+    results = run_benchmarks(args.pages, args.stages, args.repeat, args.corpus_dir, not args.no_memory)
+    results["meta"]["parser"] = args.parser
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare_results(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            raise SystemExit(1)
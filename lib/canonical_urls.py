@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def remove_dot_segments(path: str) -> str:
+    """
+    'path' with its '.' and '..' segments resolved as in RFC 3986 (section 5.2.4); empty
+    segments are kept, so '//docs' stays a path and is never read as a host.
+    Example: '/docs/./concepts/../tasks/' -> '/docs/tasks/'
+    """
+    segments = path.split("/")
+    output = []
+    for segment in segments:
+        if segment == ".":
+            continue
+        if segment == "..":
+            # Never pop the empty segment in front of the leading '/'
+            if len(output) > 1:
+                output.pop()
+            continue
+        output.append(segment)
+    if segments[-1] in (".", ".."):
+        output.append("")
+    return "/".join(output)
+
+def canonical_url(url: str) -> str:
+    """
+    Normalizes 'url' so trivial variants of the same address compare equal: lowercase
+    scheme and host, no default port, no '.'/'..' segments, an empty path as '/', and no
+    #fragment (it never changes the page that is downloaded). A URL that cannot be parsed
+    is returned stripped.
+    Example: 'HTTPS://Kubernetes.io:443/docs/./concepts/#intro' -> 'https://kubernetes.io/docs/concepts/'
+    """
+    url = url.strip()
+    parts = urlsplit(url)
+    try:
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname.lower()
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+    path = remove_dot_segments(parts.path) or "/"
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+def page_key(url: str) -> str:
+    """
+    The key under which variants of one page are the same page: the canonical URL without
+    its scheme (http and https serve the same docs), its trailing slash or a final index.html.
+    Example: 'http://kubernetes.io/docs/concepts/index.html' -> 'kubernetes.io/docs/concepts'
+    """
+    parts = urlsplit(canonical_url(url))
+    path = parts.path
+    if path.endswith("/index.html"):
+        path = path[:-len("index.html")]
+    key = parts.netloc + path.rstrip("/")
+    return f"{key}?{parts.query}" if parts.query else key
+
+def job_key(url: str, topic: str) -> str:
+    """
+    A name for the outputs of 'url' that stays readable and never collides: 'topic' (e.g. the
+    last path segment) followed by a short hash of the page key.
+    Example: ('https://kubernetes.io/docs/concepts/overview/', 'Overview') -> 'Overview_a7d31dd1'
+    """
+    return f"{topic}_{hashlib.sha1(page_key(url).encode('utf-8')).hexdigest()[:8]}"
+
+class RedirectMap:
+    """
+    Where requested URLs were redirected to, so later requests (and later runs, when the
+    map is saved to 'path') go straight to the page instead of downloading it again
+    under another name. Keys and targets are canonical URLs.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.targets = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.targets = json.load(f)
+
+    def record(self, url: str, final_url: str):
+        """Remembers that 'url' was redirected to 'final_url'."""
+        url, final_url = canonical_url(url), canonical_url(final_url)
+        if url != final_url:
+            with self._lock:
+                self.targets[url] = final_url
+
+    def resolve(self, url: str) -> str:
+        """The canonical URL 'url' ends up at, following known redirects (and stopping at a loop)."""
+        url = canonical_url(url)
+        seen = {url}
+        while url in self.targets and self.targets[url] not in seen:
+            url = self.targets[url]
+            seen.add(url)
+        return url
+
+    def save(self, path: str = None):
+        """Writes the map to 'path' (default: the path it was loaded from)."""
+        path = path or self.path
+        with self._lock:
+            targets = dict(sorted(self.targets.items()))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(targets, f, indent=2)
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+# Redirects seen by this process, filled in by fetch_policy.FetchPolicy.get()
+_redirects = RedirectMap()
+
+def set_redirect_map(redirects: RedirectMap):
+    """Makes 'redirects' the map the downloads of this process record their redirects in."""
+    global _redirects
+    _redirects = redirects
+
+def get_redirect_map() -> RedirectMap:
+    """Returns the map the downloads of this process record their redirects in."""
+    return _redirects
+
+def unique_urls(urls: list, redirects: RedirectMap = None):
+    """
+    Canonicalizes 'urls' (following the known 'redirects') and keeps the first URL of each
+    page. Returns (urls, duplicates), where 'duplicates' lists (url, url it repeats).
+    Example: ['http://a.io/x', 'https://a.io/x/#top'] -> (['http://a.io/x'], [('https://a.io/x/#top', 'http://a.io/x')])
+    """
+    kept = []
+    duplicates = []
+    first_of = {}
+    for url in urls:
+        resolved = redirects.resolve(url) if redirects is not None else canonical_url(url)
+        key = page_key(resolved)
+        if key in first_of:
+            duplicates.append((url, first_of[key]))
+            continue
+        first_of[key] = resolved
+        kept.append(resolved)
+    return kept, duplicates
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Canonicalize a URL list and drop the URLs of pages already listed.")
+    parser.add_argument("--input", type=str, required=True, help="File with one URL per line.")
+    parser.add_argument("--output", type=str, required=True, help="File to write the unique canonical URLs to.")
+    parser.add_argument("--redirect-map", type=str, default=None, help="Redirects saved by an earlier run (JSON).")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip()]
+    kept, duplicates = unique_urls(urls, RedirectMap(args.redirect_map) if args.redirect_map else None)
+    for url, first in duplicates:
+        print(f"{url} is the same page as {first}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write("\n".join(kept) + "\n")
+    print(f"{len(kept)} unique URLs saved to {args.output} ({len(duplicates)} duplicates dropped)")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import json
+import hashlib
+import argparse
+
+from compression import open_file, strip_compression_extension
+from dedup import canonical_concept_url, source_of
+from link_graph import expand_links, link_graph_paths, read_url_table
+from output_writers import FIELDNAMES, read_rows
+
+# Columns of the change feed: what happened to the row, its key and content hash, then the
+# row itself (empty for removed rows, which only need their key)
+CHANGE_FIELDNAMES = ["Change", "Key", "Hash"] + FIELDNAMES
+
+# Columns whose content the hash covers. 'ID' is renumbered by every run and 'URL' is the key.
+HASHED_FIELDNAMES = ["Category", "Topic", "Concept", "Content", "Link to", "Tags"]
+
+def change_feed_path(output: str) -> str:
+    """
+    The change feed written next to the output 'output', compressed like it.
+    Example: 'data/multi_final.csv' -> 'data/multi_final_changes.csv'
+    """
+    stripped = strip_compression_extension(output)
+    return f"{os.path.splitext(stripped)[0]}_changes.csv{output[len(stripped):]}"
+
+def row_hash(row: dict) -> str:
+    """SHA-1 of the HASHED_FIELDNAMES values of 'row'; equal rows from CSV, JSONL and Parquet files hash the same."""
+    values = ["" if row.get(name) is None else str(row[name]) for name in HASHED_FIELDNAMES]
+    return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+# HTTP statuses that mean a page is gone for good rather than failing this time
+GONE_STATUSES = (404, 410)
+
+def page_gone(error: Exception) -> bool:
+    """Whether the download 'error' says the page no longer exists (a 404 or 410 response)."""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in GONE_STATUSES
+
+class RowKeys:
+    """
+    Gives every row its key: the canonical concept URL (reference#id, see dedup.py). A concept
+    URL seen again in the same run (e.g. the 'reference#no-id' of sections whose <h2> had no id)
+    gets its occurrence number, 'reference#no-id~2', so every key stays unique.
+    """
+
+    def __init__(self):
+        self.seen = {}
+
+    def key_of(self, row: dict) -> str:
+        key = canonical_concept_url(str(row["URL"]))
+        count = self.seen[key] = self.seen.get(key, 0) + 1
+        return key if count == 1 else f"{key}~{count}"
+
+def read_hashes(path: str, link_graph: bool = False) -> dict:
+    """
+    The {key: hash} of every row of the output 'path' (CSV, JSONL or Parquet, compressed or not).
+    With 'link_graph', its 'Link to' IDs are first expanded from its URL table.
+    """
+    rows = read_rows(path)
+    if link_graph:
+        rows = expand_links(rows, read_url_table(link_graph_paths(path)[0]))
+    keys = RowKeys()
+    return {keys.key_of(row): row_hash(row) for row in rows}
+
+def load_baseline(path: str, link_graph: bool = False, saved_path: str = None) -> dict:
+    """
+    The {key: hash} to compare a run with: read_hashes() of the output 'path', or {} if it does
+    not exist. With 'saved_path' (in the checkpoint folder of the run), the hashes are saved
+    there the first time and read back from there on resume, as the interrupted run may
+    already have overwritten 'path'.
+    """
+    if saved_path and os.path.exists(saved_path):
+        with open(saved_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    hashes = read_hashes(path, link_graph) if os.path.exists(path) else {}
+    if saved_path:
+        temp_path = saved_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(hashes, f)
+        os.replace(temp_path, saved_path)
+    return hashes
+
+class ChangeFeed:
+    """
+    Compares the rows of a run, as they are written, with the {key: hash} of the previous run
+    ('previous', see read_hashes()) and writes the differences to the CSV 'path':
+    - 'added':   a key the previous run did not have;
+    - 'changed': a key whose content hash differs;
+    - 'removed': a key of the previous run this run did not produce, written on close().
+    Unchanged rows are only counted. The concepts of pages that failed in this run (see
+    keep_page()) are not reported as removed, so a page that is down for a night is not
+    deleted downstream; a page that is gone (see page_gone()) has its concepts removed.
+    """
+
+    def __init__(self, previous: dict, path: str):
+        self.previous = previous
+        self.path = path
+        self.keys = RowKeys()
+        self.written = set()
+        self.kept_pages = set()
+        self.counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        self._file = open_file(path, "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=CHANGE_FIELDNAMES)
+        self._writer.writeheader()
+
+    def add_rows(self, rows: list):
+        """Records the rows of one page and writes those that are added or changed."""
+        for row in rows:
+            key = self.keys.key_of(row)
+            self.written.add(key)
+            content_hash = row_hash(row)
+            previous_hash = self.previous.get(key)
+            if previous_hash == content_hash:
+                self.counts["unchanged"] += 1
+                continue
+            change = "added" if previous_hash is None else "changed"
+            self.counts[change] += 1
+            self._writer.writerow({**row, "Change": change, "Key": key, "Hash": content_hash})
+        self._file.flush()
+
+    def keep_page(self, url: str):
+        """Keeps the previous concepts of page 'url' (e.g. it failed this time) out of the removed ones."""
+        self.kept_pages.add(canonical_concept_url(source_of(url)))
+
+    def close(self):
+        for key, content_hash in self.previous.items():
+            if key not in self.written and source_of(key) not in self.kept_pages:
+                self.counts["removed"] += 1
+                self._writer.writerow({"Change": "removed", "Key": key, "Hash": content_hash})
+        self._file.close()
+
+    def summary(self) -> str:
+        return ", ".join(f"{count} {change}" for change, count in self.counts.items())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the added/changed/removed concepts between two output files.")
+    parser.add_argument("--previous", type=str, required=True, help="Output of the previous run (CSV, JSONL or Parquet).")
+    parser.add_argument("--current", type=str, required=True, help="Output of the new run.")
+    parser.add_argument("--output", type=str, required=True, help="Path to the change feed CSV (.gz/.zst allowed).")
+    parser.add_argument("--link-graph", action="store_true", help="Both outputs were written with --link-graph.")
+    args = parser.parse_args()
+
+    with ChangeFeed(read_hashes(args.previous, args.link_graph), args.output) as changes:
+        rows = read_rows(args.current)
+        if args.link_graph:
+            rows = expand_links(rows, read_url_table(link_graph_paths(args.current)[0]))
+        changes.add_rows(rows)
+    print(f"Changes saved to {args.output}: {changes.summary()}")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+from output_writers import read_rows, write_rows
+from compression import with_compression_extension
+
+JOURNAL_FILE = "journal.jsonl"
+ROWS_FOLDER = "rows"
+# The {key: hash} baseline of a --diff-against run (see change_feed.load_baseline()), and its
+# temporary file while it is written
+BASELINE_FILE = "baseline.json"
+BASELINE_FILES = {BASELINE_FILE, BASELINE_FILE + ".tmp"}
+# Names of the files save_rows() writes in ROWS_FOLDER (including the temporary file of a crash)
+ROWS_FILE_PATTERN = re.compile(r"^(tmp_)?[0-9a-f]{40}\.jsonl(\.gz|\.zst)?$")
+
+# Statuses of a URL, in the order they are reached; 'failed' can replace any of them
+STATUSES = ["fetched", "processed", "merged", "failed"]
+DONE_STATUSES = {"processed", "merged"}
+
+def clear_checkpoint_dir(folder: str):
+    """
+    Deletes the journal, saved rows and change feed baseline in 'folder'. Raises ValueError, deleting nothing, if
+    'folder' holds anything else, so pointing --checkpoint-dir at a folder of other files
+    (e.g. data/) cannot delete them.
+    """
+    if not os.path.exists(folder):
+        return
+    others = set(os.listdir(folder)) - {JOURNAL_FILE, ROWS_FOLDER, *BASELINE_FILES}
+    rows_folder = os.path.join(folder, ROWS_FOLDER)
+    if os.path.isdir(rows_folder):
+        others.update(os.path.join(ROWS_FOLDER, name) for name in os.listdir(rows_folder)
+                      if not ROWS_FILE_PATTERN.match(name))
+    elif os.path.exists(rows_folder):
+        others.add(ROWS_FOLDER)
+    if others:
+        raise ValueError(f"{folder} is not a checkpoint folder (it holds {', '.join(sorted(others)[:5])}); "
+                         f"choose a new or empty checkpoint folder")
+    if os.path.isdir(rows_folder):
+        shutil.rmtree(rows_folder)
+    for name in [JOURNAL_FILE, *BASELINE_FILES]:
+        if os.path.exists(os.path.join(folder, name)):
+            os.remove(os.path.join(folder, name))
+
+class CheckpointJournal:
+    """
+    Durable record of a batch run kept in 'folder', so an interrupted run can be resumed.
+
+    journal.jsonl gets one line per status change of a URL ('fetched', 'processed',
+    'merged' or 'failed', with the error), flushed and fsync'ed before the run goes on.
+    The rows of every processed URL are saved to rows/<hash of the URL>.jsonl (.jsonl.gz or
+    .jsonl.zst with compression.set_compression(); written to a temporary file and renamed,
+    so a file is either complete or absent), and that path
+    is the 'output' of its 'processed' entry. A URL is done once it has been processed
+    and its rows file can still be read; anything else is processed again on resume.
+    'baseline_path' is where a run with a change feed keeps the hashes it compares against.
+
+    Without 'resume', an existing folder is cleared first, but only if it holds nothing
+    but a journal (see clear_checkpoint_dir()).
+    """
+
+    def __init__(self, folder: str, resume: bool = False):
+        self.folder = folder
+        self.resumed = resume
+        if not resume:
+            clear_checkpoint_dir(folder)
+        os.makedirs(os.path.join(folder, ROWS_FOLDER), exist_ok=True)
+        self.path = os.path.join(folder, JOURNAL_FILE)
+        self.baseline_path = os.path.join(folder, BASELINE_FILE)
+        self.entries = self._load() if resume else {}
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self) -> dict:
+        """The last journal entry of every URL. A line cut short by a crash is ignored."""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                previous = entries.get(entry["url"], {})
+                # Keep where the rows are when a later entry (e.g. 'merged') does not repeat it
+                entries[entry["url"]] = {**previous, **entry} if entry["status"] != "failed" else entry
+        return entries
+
+    def record(self, url: str, status: str, **fields):
+        """Appends a status change of 'url' to the journal and waits until it is on disk."""
+        entry = {"url": url, "status": status, "time": time.time(), **fields}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        previous = self.entries.get(url, {})
+        self.entries[url] = {**previous, **entry} if status != "failed" else entry
+
+    def rows_path(self, url: str) -> str:
+        """Where the rows of 'url' are saved."""
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jsonl"
+        return with_compression_extension(os.path.join(self.folder, ROWS_FOLDER, name))
+
+    def save_rows(self, url: str, rows: list, index: int = None):
+        """Saves the rows of 'url' and records it as processed."""
+        path = self.rows_path(url)
+        # Same extensions as 'path', so the rows are compressed the same way
+        temp_path = os.path.join(os.path.dirname(path), "tmp_" + os.path.basename(path))
+        write_rows(rows, temp_path, "jsonl")
+        os.replace(temp_path, path)
+        self.record(url, "processed", index=index, rows=len(rows), output=path)
+
+    def is_done(self, url: str) -> bool:
+        """True if 'url' was processed (in this run or the one being resumed)."""
+        entry = self.entries.get(url)
+        return entry is not None and entry["status"] in DONE_STATUSES and os.path.exists(entry.get("output", ""))
+
+    def load_rows(self, url: str) -> list:
+        """
+        The saved rows of 'url', or None if it is not done or its rows file cannot be read
+        (it is then processed again).
+        """
+        if not self.is_done(url):
+            return None
+        try:
+            return read_rows(self.entries[url]["output"], "jsonl")
+        except (OSError, ValueError):
+            return None
+
+    def counts(self) -> dict:
+        """The number of URLs in each status."""
+        counts = {status: 0 for status in STATUSES}
+        for entry in self.entries.values():
+            counts[entry["status"]] += 1
+        return counts
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the status of the URLs in a checkpoint journal.")
+    parser.add_argument("--checkpoint-dir", type=str, required=True, help="Checkpoint folder of a Multi_facade.py run.")
+    parser.add_argument("--status", type=str, default=None, choices=STATUSES, help="Only list the URLs in this status.")
+    args = parser.parse_args()
+
+    with CheckpointJournal(args.checkpoint_dir, resume=True) as journal:
+        print(", ".join(f"{count} {status}" for status, count in journal.counts().items()))
+        if args.status:
+            for url, entry in journal.entries.items():
+                if entry["status"] == args.status:
+                    print(f"{url}" + (f"  {entry['error']}" if entry.get("error") else ""))
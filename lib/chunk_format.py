@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from compression import open_file
+
+# The intermediate text written between stages 3 and 6 looks like:
+#
+#   [TOPIC: <topic>]
+#
+#   ===== CONCEPT CHUNK #1 =====        <- from step 4 on
+#
+#   [1] Concept: <title> [id: <id>]
+#   Content:
+#   <content>
+#
+#   ==================================================
+#
+# Step 5 keeps the first 40 '=' of the separator at the end of each chunk's content
+# (CONTENT_TRAILER, which has always ended the Content column of the CSV) and leaves the
+# other 10 on a line of their own, which final_refine.py then removes.
+SEPARATOR = "=" * 50
+CONTENT_TRAILER = SEPARATOR[:40]
+CHUNK_MARKER = "===== CONCEPT CHUNK #"
+CODE_BLOCK_START = "[CODE_BLOCK_START]"
+CODE_BLOCK_END = "[CODE_BLOCK_END]"
+LINK_START = "[LINK:"
+
+def _find_bracketed(text: str, opener: str, start: int = 0):
+    """
+    Finds the next 'opener' ... ']' on a single line from 'start' and returns
+    (start, end) of the whole match, or None. Mirrors the regex r"\\[OPENER(.*?)\\]".
+    """
+    while True:
+        begin = text.find(opener, start)
+        if begin == -1:
+            return None
+        close = text.find("]", begin + len(opener))
+        if close == -1:
+            return None
+        newline = text.find("\n", begin + len(opener), close)
+        if newline == -1:
+            return begin, close + 1
+        start = begin + 1
+
+def parse_topic(text: str) -> str:
+    """Returns the topic of the first [TOPIC: ...] line, or 'Unknown Topic'."""
+    span = _find_bracketed(text, "[TOPIC:")
+    if span is None:
+        return "Unknown Topic"
+    return text[span[0] + len("[TOPIC:"):span[1] - 1].strip()
+
+def find_code_block_spans(text: str) -> list:
+    """Returns the (start, end) of every [CODE_BLOCK_START] ... [CODE_BLOCK_END] block in 'text'."""
+    spans = []
+    pos = 0
+    while True:
+        begin = text.find(CODE_BLOCK_START, pos)
+        if begin == -1:
+            break
+        end = text.find(CODE_BLOCK_END, begin + len(CODE_BLOCK_START))
+        if end == -1:
+            break
+        pos = end + len(CODE_BLOCK_END)
+        spans.append((begin, pos))
+    return spans
+
+def find_link_spans(text: str) -> list:
+    """Returns the (start, end, href) of every [LINK:href] annotation in 'text'."""
+    spans = []
+    pos = 0
+    while True:
+        span = _find_bracketed(text, LINK_START, pos)
+        if span is None:
+            break
+        begin, pos = span
+        spans.append((begin, pos, text[begin + len(LINK_START):pos - 1]))
+    return spans
+
+def _is_concept_line(text: str, pos: int) -> bool:
+    """True if the line at 'pos' starts with '[<number>] Concept:'."""
+    if not text.startswith("[", pos):
+        return False
+    line_end = text.find("\n", pos)
+    close = text.find("]", pos + 1, line_end if line_end != -1 else len(text))
+    if close == -1 or not text[pos + 1:close].isdigit():
+        return False
+    return text[close + 1:close + 32].lstrip(" \t").startswith("Concept:")
+
+def _find_line(text: str, prefix: str, pos: int) -> int:
+    """Returns the start of the first line at or after 'pos' that begins with 'prefix', or -1."""
+    if pos == 0 and text.startswith(prefix):
+        return 0
+    found = text.find("\n" + prefix, max(pos - 1, 0))
+    return found + 1 if found != -1 else -1
+
+def _skip_blank(text: str, pos: int) -> int:
+    """Returns the first position at or after 'pos' that is not whitespace."""
+    length = len(text)
+    while pos < length and text[pos].isspace():
+        pos += 1
+    return pos
+
+def _chunk_starts(text: str) -> list:
+    """The start of every chunk in 'text' (see iter_chunks())."""
+    starts = []
+    pos = _find_line(text, CHUNK_MARKER, 0)
+    if pos != -1:
+        while pos != -1:
+            starts.append(pos)
+            pos = _find_line(text, CHUNK_MARKER, pos + 1)
+        return starts
+
+    # No markers: a chunk is a '[n] Concept:' line at the start of the text
+    # (after the topic line) or right after a separator line
+    pos = _skip_blank(text, 0)
+    if text.startswith("[TOPIC:", pos):
+        line_end = text.find("\n", pos)
+        pos = _skip_blank(text, line_end) if line_end != -1 else len(text)
+    if _is_concept_line(text, pos):
+        starts.append(pos)
+
+    separator = _find_line(text, SEPARATOR, 0)
+    while separator != -1:
+        line_end = separator + len(SEPARATOR)
+        if line_end == len(text) or text[line_end] == "\n":
+            pos = _skip_blank(text, line_end)
+            if _is_concept_line(text, pos):
+                starts.append(pos)
+        separator = _find_line(text, SEPARATOR, separator + 1)
+    return starts
+
+def count_chunks(text: str) -> int:
+    """The number of chunks iter_chunks() would yield for 'text', without reading them."""
+    return len(_chunk_starts(text))
+
+class ConceptChunk:
+    """
+    One concept of the intermediate text, as positions in 'text':
+    - start:           the CONCEPT CHUNK marker line, or the '[n] Concept:' line without one;
+    - content_start:   just after 'Content:' (content_end if there is no 'Content:');
+    - content_end:     the end of the content, before the separator line if there is one;
+    - separator_start: the start of the separator line after the content, or None;
+    - end:             where the next chunk (or the text) starts.
+    'concept' and 'id' are None if the '[n] Concept: ... [id: ...]' line could not be read,
+    and 'has_content' tells whether the chunk has a 'Content:' marker.
+    """
+
+    def __init__(self, text: str, start: int, topic: str):
+        self.text = text
+        self.start = start
+        self.topic = topic
+        self.concept = None
+        self.id = None
+        self.has_content = False
+        self.content_start = None
+        self.content_end = None
+        self.separator_start = None
+        self.end = None
+        self._code_spans = None
+        self._link_spans = None
+
+    def read_header(self, end: int):
+        """Reads the '[n] Concept: <title> [id: <id>]' and 'Content:' lines of the chunk ending at 'end'."""
+        text = self.text
+        concept_pos = text.find("Concept:", self.start, end)
+        header_pos = concept_pos + len("Concept:") if concept_pos != -1 else self.start
+        content_pos = text.find("Content:", header_pos, end)
+        header_end = content_pos if content_pos != -1 else end
+
+        if concept_pos != -1:
+            id_pos = text.find("[id:", header_pos, header_end)
+            close = text.find("]", id_pos, header_end) if id_pos != -1 else -1
+            if close != -1:
+                self.concept = text[header_pos:id_pos].strip()
+                self.id = text[id_pos + len("[id:"):close].strip()
+
+        if content_pos != -1:
+            self.has_content = True
+            self.content_start = content_pos + len("Content:")
+
+    def finish(self, end: int):
+        """Closes the chunk at 'end' and splits off a trailing separator line."""
+        text = self.text
+        self.end = end
+        content_end = end
+        stripped_end = len(text[self.start:end].rstrip()) + self.start
+        line_start = text.rfind("\n", self.start, stripped_end) + 1
+        content_start = self.content_start if self.content_start is not None else self.start + 1
+        if line_start >= content_start and text[line_start:stripped_end] in (SEPARATOR, SEPARATOR[len(CONTENT_TRAILER):]):
+            self.separator_start = line_start
+            content_end = line_start
+
+        if self.content_start is None or self.content_start > content_end:
+            self.content_start = content_end
+        self.content_end = content_end
+        return self
+
+    @property
+    def header(self) -> str:
+        """The chunk text up to and including 'Content:'."""
+        return self.text[self.start:self.content_start]
+
+    @property
+    def content(self) -> str:
+        """The raw content, without the separator line."""
+        return self.text[self.content_start:self.content_end]
+
+    @property
+    def trailer_end(self) -> int:
+        """Where the content ends once the CONTENT_TRAILER part of the separator is added to it."""
+        if self.separator_start is None:
+            return self.content_end
+        return self.separator_start + len(CONTENT_TRAILER)
+
+    @property
+    def code_spans(self) -> list:
+        """(start, end) of the code blocks in 'content'."""
+        if self._code_spans is None:
+            self._code_spans = find_code_block_spans(self.content)
+        return self._code_spans
+
+    @property
+    def link_spans(self) -> list:
+        """(start, end, href) of the [LINK:href] annotations in 'content'."""
+        if self._link_spans is None:
+            self._link_spans = find_link_spans(self.content)
+        return self._link_spans
+
+def section_chunk(topic: str, index: int, title: str, section_id: str, content: str) -> ConceptChunk:
+    """
+    The ConceptChunk iter_chunks() reads for a single section of the final text, built from
+    its parts instead of found in the text of the whole page (see to_csv.build_section_rows()).
+    """
+    text = f"[{index}] Concept: {title} [id: {section_id}]\nContent:\n\n{content}\n\n"
+    chunk = ConceptChunk(text, 0, topic)
+    chunk.read_header(len(text))
+    return chunk.finish(len(text))
+
+def iter_chunks(text: str):
+    """
+    Walks the intermediate text once and yields a ConceptChunk per concept. Chunks start
+    at a CONCEPT CHUNK marker line or, in text without markers (the output of extract_h2.py),
+    at a '[n] Concept:' line that opens the text or follows a separator line.
+    Text before the first chunk is not part of any chunk.
+    """
+    topic = parse_topic(text)
+    starts = _chunk_starts(text)
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(text)
+        chunk = ConceptChunk(text, start, topic)
+        chunk.read_header(end)
+        yield chunk.finish(end)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the concept chunks of an intermediate step file.")
+    parser.add_argument("--input", type=str, required=True, help="Path to a step 3-6 output file.")
+    args = parser.parse_args()
+
+    with open_file(args.input, "r") as f:
+        step_text = f.read()
+
+    for chunk in iter_chunks(step_text):
+        print(f"[{chunk.id}] {chunk.concept}: {len(chunk.content)} characters, "
+              f"{len(chunk.code_spans)} code blocks, {len(chunk.link_spans)} links")
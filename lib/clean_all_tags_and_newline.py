@@ -3,25 +3,24 @@
 import re
 import argparse
 from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
 
-CHUNK_PATTERN = re.compile(
-    r"(===== CONCEPT CHUNK #\d+ =====.*?========================================)",
-    re.DOTALL
-)
+from dom_text import split_text_around_code_blocks
+from extract_code_example import CodeBlockString
+from compression import open_file
+from chunk_format import CODE_BLOCK_END, CODE_BLOCK_START, CONTENT_TRAILER, find_code_block_spans, iter_chunks
 
 def preserve_code_blocks_and_clean_text(text: str) -> str:
     """
     Processes the text, preserving the content within code blocks as-is, 
     while cleaning and formatting the text outside the code blocks.
     """
-    code_block_pattern = r"\[CODE_BLOCK_START\](.*?)\[CODE_BLOCK_END\]"
     cleaned_parts = []
     last_end = 0
 
-    # Iterate through all code block matches
-    for match in re.finditer(code_block_pattern, text, flags=re.DOTALL):
-        start, end = match.span()
-        code_block_content = match.group(0)  # Preserve the entire block as-is
+    # Iterate through all code blocks
+    for start, end in find_code_block_spans(text):
+        code_block_content = text[start:end]  # Preserve the entire block as-is
 
         # Process the text outside the code block
         outside_text = text[last_end:start]
@@ -46,9 +45,17 @@ def clean_text_outside_code(text: str) -> str:
     - Splits sentences to ensure each ends on a new line
     """
     # 1. Remove remaining HTML tags using BeautifulSoup
+    # The text between code blocks is a fragment with unbalanced tags, so it is always read
+    # with html.parser: lxml would drop stray end tags and merge the strings around them.
     soup = BeautifulSoup(text, "html.parser")
     clean_text = soup.get_text(separator=" ")  # Separate tags with single spaces
 
+    return normalize_sentences(clean_text)
+
+def normalize_sentences(clean_text: str) -> str:
+    """
+    Normalizes whitespace in plain text and puts each sentence on its own line.
+    """
     # 2. Collapse multiple whitespaces into a single space
     clean_text = re.sub(r"\s+", " ", clean_text).strip()
 
@@ -59,57 +66,104 @@ def clean_text_outside_code(text: str) -> str:
     lines = [line.strip() for line in clean_text.splitlines()]
     return "\n".join(line for line in lines if line)
 
-def process_concept_chunk(full_chunk: str) -> str:
+def process_concept_chunk(chunk) -> str:
     """
-    Processes a CONCEPT CHUNK, preserving code blocks as-is and cleaning the rest of the content.
+    Processes a CONCEPT CHUNK (a chunk_format.ConceptChunk), preserving code blocks as-is
+    and cleaning the rest of the content. The content keeps the CONTENT_TRAILER part of the
+    separator at its end.
     """
-    # Extract the content after "Content:"
-    content_marker = "Content:"
-    content_start = full_chunk.find(content_marker)
-    if content_start == -1:
-        return full_chunk  # No content found, return as-is
+    if not chunk.has_content:
+        return chunk.text[chunk.start:chunk.trailer_end]  # No content found, return as-is
 
-    content_to_clean = full_chunk[content_start + len(content_marker):].strip()
+    content_to_clean = chunk.text[chunk.content_start:chunk.trailer_end].strip()
 
     # Preserve code blocks and clean text outside them
-    cleaned_content = preserve_code_blocks_and_clean_text(content_to_clean)
-
-    # Add newlines around [CODE_BLOCK_START] and [CODE_BLOCK_END]
-    cleaned_content = re.sub(r"\[CODE_BLOCK_START\]", r"\n[CODE_BLOCK_START]", cleaned_content)
-    cleaned_content = re.sub(r"\[CODE_BLOCK_END\]", r"[CODE_BLOCK_END]\n", cleaned_content)
+    cleaned_content = add_code_block_newlines(preserve_code_blocks_and_clean_text(content_to_clean))
 
     # Reassemble the chunk with cleaned content
-    header = full_chunk[:content_start + len(content_marker)].strip()
+    header = chunk.header.strip()
     return f"{header}\n\n{cleaned_content}\n"
 
-def process_file(input_file: str, output_file: str) -> None:
+def add_code_block_newlines(cleaned_content: str) -> str:
     """
-    Reads the file, processes each CONCEPT CHUNK, and writes the output to a file.
+    Add newlines around [CODE_BLOCK_START] and [CODE_BLOCK_END].
     """
-    with open(input_file, "r", encoding="utf-8") as infile:
-        all_text = infile.read()
+    cleaned_content = cleaned_content.replace(CODE_BLOCK_START, "\n" + CODE_BLOCK_START)
+    return cleaned_content.replace(CODE_BLOCK_END, CODE_BLOCK_END + "\n")
 
-    chunks = CHUNK_PATTERN.findall(all_text)
-    processed_output = []
+def clean_section_content(content_html: str) -> str:
+    """
+    The cleaned content of one section (HTML with its code blocks embedded) as
+    process_concept_chunk() writes it, ending with the CONTENT_TRAILER.
+    """
+    content_to_clean = f"{content_html}\n\n{CONTENT_TRAILER}".strip()
+    return add_code_block_newlines(preserve_code_blocks_and_clean_text(content_to_clean))
+
+def clean_sections(sections):
+    """
+    Generator version of process_all_chunks(): yields every section record coming from
+    extract_code_example.mark_code_in_sections() with its cleaned text as 'content'.
+    """
+    for section in sections:
+        record = {key: value for key, value in section.items() if key != "content_html"}
+        record["content"] = clean_section_content(section["content_html"])
+        yield record
+
+def clean_section_nodes(nodes, trailer: str = "") -> str:
+    """
+    Produces the same cleaned content as process_concept_chunk() for an already-parsed
+    section, without serializing and re-parsing its HTML. 'trailer' is extra text
+    appended to the end of the section before cleaning.
+    """
+    cleaned_parts = []
+    parts = split_text_around_code_blocks(nodes)
+    parts[-1].append(trailer)
+
+    for part in parts:
+        if isinstance(part, CodeBlockString):
+            # Preserve the code block exactly as it would appear in serialized HTML
+            code_text = "\n".join(part.code_text.splitlines())
+            code_text = EntitySubstitution.substitute_xml(code_text)
+            cleaned_parts.append(f"[CODE_BLOCK_START]\n{code_text}\n[CODE_BLOCK_END]")
+        else:
+            cleaned_parts.append(normalize_sentences(" ".join(part)))
+
+    return add_code_block_newlines("".join(cleaned_parts))
+
+def process_all_chunks(all_text: str) -> str:
+    """
+    Processes each CONCEPT CHUNK in 'all_text', leaving the text between chunks
+    (including the rest of each separator) untouched.
+    """
+    return "".join(iter_processed_chunks(all_text))
+
+def iter_processed_chunks(all_text: str):
+    """
+    Yields the text of process_all_chunks() piece by piece, each chunk as soon as it is cleaned.
+    """
     last_pos = 0
 
-    for match in CHUNK_PATTERN.finditer(all_text):
-        outside_text = all_text[last_pos:match.start()]
+    for chunk in iter_chunks(all_text):
+        outside_text = all_text[last_pos:chunk.start]
         if outside_text:
-            processed_output.append(outside_text)
+            yield outside_text
 
-        chunk_text = match.group(1)
-        processed_chunk = process_concept_chunk(chunk_text)
-        processed_output.append(processed_chunk)
-        last_pos = match.end()
+        yield process_concept_chunk(chunk)
+        last_pos = chunk.trailer_end
 
     if last_pos < len(all_text):
-        processed_output.append(all_text[last_pos:])
+        yield all_text[last_pos:]
 
-    final_text = "".join(processed_output)
+def process_file(input_file: str, output_file: str) -> None:
+    """
+    Reads the file, processes each CONCEPT CHUNK, and writes the output to a file.
+    """
+    with open_file(input_file, "r") as infile:
+        all_text = infile.read()
 
-    with open(output_file, "w", encoding="utf-8") as outfile:
-        outfile.write(final_text)
+    with open_file(output_file, "w") as outfile:
+        for text in iter_processed_chunks(all_text):
+            outfile.write(text)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Clean HTML tags and normalize sentences in a text file.")
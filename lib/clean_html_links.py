@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 import argparse
-from bs4 import BeautifulSoup
+
+from compression import open_file
+from parser_backend import BACKENDS, lexbor_inner_html, make_lexbor_tree, make_soup, set_backend, use_selectolax
 
 def annotate_links_in_html(html_content: str) -> str:
     """
@@ -10,15 +12,36 @@ def annotate_links_in_html(html_content: str) -> str:
         Input: <a href="https://example.com">Example</a>
         Output: Example [LINK:https://example.com]
     """
-    soup = BeautifulSoup(html_content, "html.parser")
-    for link in soup.find_all("a"):
+    if use_selectolax():
+        return annotate_links_lexbor(html_content)
+
+    soup = make_soup(html_content)
+    annotate_links(soup)
+    return str(soup)
+
+def annotate_links_lexbor(html_content: str) -> str:
+    """
+    Same as annotate_links_in_html(), using selectolax/lexbor.
+    """
+    tree = make_lexbor_tree(html_content)
+    for link in tree.css("a"):
+        inner_text = link.text()
+        href = link.attributes.get("href") or ""
+        annotated_text = f"{inner_text} [LINK:{href}]" if href else inner_text
+        link.replace_with(annotated_text)
+    return lexbor_inner_html(tree)
+
+def annotate_links(root) -> None:
+    """
+    Replace every <a> tag under the parsed 'root' in place, as annotate_links_in_html() does.
+    """
+    for link in root.find_all("a"):
         # Extract the inner text and href
         inner_text = link.get_text()
         href = link.get("href", "")
         # Replace <a> tag with 'inner_text [LINK:href]'
         annotated_text = f"{inner_text} [LINK:{href}]" if href else inner_text
         link.replace_with(annotated_text)
-    return str(soup)
 
 def main(input_file: str, output_file: str):
     """
@@ -26,14 +49,14 @@ def main(input_file: str, output_file: str):
     and writes the annotated content to 'output_file'.
     """
     # Read the input text (HTML content) from file
-    with open(input_file, "r", encoding="utf-8") as f:
+    with open_file(input_file, "r") as f:
         html_content = f.read()
 
     # Annotate links in the HTML content
     annotated_content = annotate_links_in_html(html_content)
 
     # Write the annotated result to the output file
-    with open(output_file, "w", encoding="utf-8") as f:
+    with open_file(output_file, "w") as f:
         f.write(annotated_content)
 
 if __name__ == "__main__":
@@ -41,7 +64,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Annotate <a> tags in HTML with [LINK:href].")
     parser.add_argument("--input", type=str, required=True, help="Path to the input HTML file.")
     parser.add_argument("--output", type=str, required=True, help="Path to the output annotated HTML file.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
     args = parser.parse_args()
+    set_backend(args.parser)
 
     # Run the link annotation process
     main(args.input, args.output)
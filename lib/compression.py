@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import os
+import gzip
+import shutil
+import argparse
+
+# Supported compressions, by file extension:
+#   gzip - Python's built-in gzip module (always available)
+#   zstd - the zstandard package; faster and smaller than gzip at its default level
+# Files are (de)compressed as a stream while they are read or written, so nothing is
+# held in memory beyond what an uncompressed read or write would.
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+EXTENSIONS = {compression: extension for extension, compression in COMPRESSIONS.items()}
+
+# gzip level 6 (as the gzip command uses) is several times faster than the module's default
+# of 9 and barely larger; zstd level 3 is the zstandard default
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Compression of the files written under default names (step files, outputs, saved rows)
+_compression = None
+
+def set_compression(compression: str) -> None:
+    """
+    Compress the files this process names itself with 'compression' ("gzip", "zstd" or None).
+    Raises ValueError for unknown compressions and ImportError if zstandard is not installed.
+    """
+    global _compression
+    if compression is not None and compression not in EXTENSIONS:
+        raise ValueError(f"Unknown compression '{compression}', expected one of {', '.join(EXTENSIONS)}")
+    check_available(compression)
+    _compression = compression
+
+def get_compression() -> str:
+    """The compression of the files this process names itself (None for plain files)."""
+    return _compression
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compression needs zstandard (pip install zstandard)") from e
+    return zstandard
+
+def check_available(compression: str) -> None:
+    """
+    Raises ImportError if 'compression' needs a package that is not installed (zstandard for
+    zstd), so scripts can report it with their other argument errors before doing any work.
+    """
+    if compression == "zstd":
+        _import_zstandard()
+
+def compression_of(path: str) -> str:
+    """
+    The compression of 'path', taken from its extension (None for a plain file).
+    Example: 'data/multi_final.csv.zst' -> 'zstd'
+    """
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+def strip_compression_extension(path: str) -> str:
+    """
+    'path' without its compression extension, if it has one.
+    Example: 'data/step3_extract_h2_output.txt.gz' -> 'data/step3_extract_h2_output.txt'
+    """
+    return os.path.splitext(path)[0] if compression_of(path) else path
+
+def with_compression_extension(path: str, compression: str = None) -> str:
+    """
+    'path' with the extension of 'compression' (default: the one set with set_compression()).
+    Example: ('data/multi_final.csv', 'gzip') -> 'data/multi_final.csv.gz'
+    """
+    compression = compression or _compression
+    if compression is None or compression_of(path) == compression:
+        return path
+    return strip_compression_extension(path) + EXTENSIONS[compression]
+
+def open_file(path: str, mode: str = "r", encoding: str = "utf-8", newline: str = None):
+    """
+    Opens 'path' in mode 'mode' ("r", "w" or "a", text unless it contains "b") like open(),
+    compressing or decompressing it on the fly if its extension is one of COMPRESSIONS.
+    """
+    if "b" in mode:
+        encoding = None
+    else:
+        mode = mode.rstrip("t") + "t"
+    compression = compression_of(path)
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=GZIP_LEVEL, encoding=encoding, newline=newline)
+    if compression == "zstd":
+        zstandard = _import_zstandard()
+        return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=ZSTD_LEVEL),
+                              encoding=encoding, newline=newline)
+    return open(path, mode, encoding=encoding, newline=newline)
+
+def read_text(path: str) -> str:
+    """The text of 'path', decompressed if needed."""
+    with open_file(path, "r") as f:
+        return f.read()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress or decompress a step file or output file.")
+    parser.add_argument("--input", type=str, required=True, help="Path to the input file (.gz/.zst files are decompressed).")
+    parser.add_argument("--output", type=str, required=True, help="Path to the output file (.gz/.zst files are compressed).")
+    args = parser.parse_args()
+    try:
+        check_available(compression_of(args.input))
+        check_available(compression_of(args.output))
+    except ImportError as e:
+        parser.error(str(e))
+
+    with open_file(args.input, "r", newline="") as infile, open_file(args.output, "w", newline="") as outfile:
+        shutil.copyfileobj(infile, outfile)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from simple_spider import create_session, fetch_page
+from fetch_policy import get_fetch_policy
+from canonical_urls import canonical_url, get_redirect_map, page_key
+
+USER_AGENT = "CS450-reptile"
+
+class DisallowedByRobotsError(requests.exceptions.RequestException):
+    """Raised for a URL that the site's robots.txt does not allow us to fetch."""
+
+def scope_prefixes(seeds: list, scope: str = None) -> list:
+    """
+    The URL prefixes a crawl may follow links under.
+    - No 'scope': each seed's own folder (everything up to the last '/' of its path).
+    - A path such as '/docs/concepts/': that path on the host of every seed.
+    - A full URL: that URL as the only prefix.
+    Example: (['https://kubernetes.io/docs/concepts/overview/'], '/docs/concepts/')
+             -> ['https://kubernetes.io/docs/concepts/']
+    """
+    if scope and not scope.startswith("/"):
+        return [canonical_url(scope)]
+
+    prefixes = []
+    for seed in seeds:
+        parsed = urlparse(canonical_url(seed))
+        if scope:
+            prefix = f"{parsed.scheme}://{parsed.netloc}{scope}"
+        else:
+            prefix = f"{parsed.scheme}://{parsed.netloc}{parsed.path[:parsed.path.rfind('/') + 1] or '/'}"
+        if prefix not in prefixes:
+            prefixes.append(prefix)
+    return prefixes
+
+def page_url(link: str, base_url: str) -> str:
+    """Resolves 'link' against the page it was found on and drops the #fragment."""
+    return urldefrag(urljoin(base_url, link)).url
+
+def links_from_rows(rows: list) -> list:
+    """All the resolved links of a page's CSV rows (their 'Link to' column)."""
+    links = []
+    for row in rows:
+        links.extend(link for link in row["Link to"].split("\n") if link)
+    return links
+
+class RobotsRules:
+    """
+    Fetches and caches each host's robots.txt. Following RFC 9309, a missing robots.txt
+    (4xx) allows everything, while a server error or an unreachable robots.txt disallows
+    the whole host.
+    """
+
+    def __init__(self, session: requests.Session, user_agent: str = USER_AGENT, policy=None):
+        self.session = session
+        self.user_agent = user_agent
+        self.policy = policy or get_fetch_policy()
+        self._lock = threading.Lock()
+        self._parsers = {}
+
+    def _load(self, robots_url: str) -> RobotFileParser:
+        parser = RobotFileParser(robots_url)
+        try:
+            response = self.policy.get(self.session, robots_url)
+        except requests.exceptions.RequestException:
+            parser.disallow_all = True
+            return parser
+
+        if response.status_code >= 500:
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+    def allowed(self, url: str) -> bool:
+        """True if robots.txt allows fetching 'url'."""
+        parsed = urlparse(url)
+        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+        with self._lock:
+            parser = self._parsers.get(robots_url)
+            if parser is None:
+                parser = self._parsers[robots_url] = self._load(robots_url)
+        return parser.can_fetch(self.user_agent, url)
+
+class Frontier:
+    """
+    The queue of pages still to crawl. Every page is queued at most once, under its
+    canonical URL (see canonical_urls.py; known redirects are followed, and variants such
+    as http/https, a trailing slash or a #fragment are the same page), only if it starts with one of 'prefixes', is at most 'max_depth' links
+    away from a seed, and fewer than 'max_pages' pages have been queued so far.
+    Each queued URL gets the next index, so pages are numbered in discovery order.
+    """
+
+    def __init__(self, prefixes: list, max_depth: int = 2, max_pages: int = 500):
+        self.prefixes = prefixes
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self._seen = set()
+        self._queue = deque()
+
+    def in_scope(self, url: str) -> bool:
+        """True if 'url' is under one of the crawl prefixes."""
+        return any(url.startswith(prefix) for prefix in self.prefixes)
+
+    def add(self, url: str, depth: int, seed: bool = False) -> bool:
+        """Queues 'url' found at 'depth'; seeds skip the scope check. Returns True if it was queued."""
+        url = get_redirect_map().resolve(url)
+        key = page_key(url)
+        if key in self._seen or depth > self.max_depth or len(self._seen) >= self.max_pages:
+            return False
+        if not seed and not self.in_scope(url):
+            return False
+        self._seen.add(key)
+        self._queue.append((len(self._seen) - 1, url, depth))
+        return True
+
+    def pop(self):
+        """Returns the next (index, url, depth) to crawl, or None if the queue is empty."""
+        return self._queue.popleft() if self._queue else None
+
+def crawl(seeds: list, process, frontier: Frontier, *, workers: int = 4, per_host: int = 4,
+          cache=None, respect_robots: bool = True, pool=None, report=None, completed=None):
+    """
+    Crawls from 'seeds' with a fixed pool of 'workers' download threads (at most
+    'per_host' at a time per host, fewer while the host is slow or failing; see FetchPolicy)
+    and yields (index, url, rows, error, metrics) for every page.
+
+    'process(index, url, page_html)' runs the pipeline on a downloaded page and returns
+    (index, rows, metrics); it runs in this process, or in 'pool' (an Executor) when one is given,
+    with at most 2 * 'workers' pages downloading or waiting for it.
+    The links in each page's rows are resolved against the page and queued in 'frontier'
+    one level deeper. 'error' is the exception raised for that page, or None, and 'metrics'
+    what 'process' returned with the rows (None for a failed page).
+    With a 'report' (a RunReport), every download is recorded as the 'fetch' stage of its URL.
+    'completed(url)' returns the rows of a page finished by an earlier run (or None); such
+    pages are yielded (with None metrics) and their links followed without fetching them again.
+    """
+    session = create_session(pool_size=max(workers, per_host))
+    policy = get_fetch_policy().copy(per_host=per_host)
+    robots = RobotsRules(session, policy=policy) if respect_robots else None
+
+    def fetch(url):
+        if robots is not None and not robots.allowed(url):
+            raise DisallowedByRobotsError(f"{url} is disallowed by robots.txt")
+        if report is not None:
+            return report.measure(url, "fetch", fetch_page, url, session, cache, policy)
+        return fetch_page(url, session, cache, policy)
+
+    for seed in seeds:
+        frontier.add(seed, 0, seed=True)
+
+    downloads = {}
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Keep every download thread busy while there are queued pages, but stop downloading
+            # while the pool is behind, so at most 2 * 'workers' pages are held at a time
+            while len(downloads) < workers and len(downloads) + len(jobs) < 2 * workers:
+                entry = frontier.pop()
+                if entry is None:
+                    break
+                rows = completed(entry[1]) if completed is not None else None
+                if rows is not None:
+                    index, url, depth = entry
+                    for link in links_from_rows(rows):
+                        frontier.add(page_url(link, url), depth + 1)
+                    yield index, url, rows, None, None
+                    continue
+                downloads[executor.submit(fetch, entry[1])] = entry
+
+            if not downloads and not jobs:
+                break
+
+            done, _ = wait([*downloads, *jobs], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in downloads:
+                    index, url, depth = downloads.pop(future)
+                    try:
+                        page_html = future.result()
+                        if pool is not None:
+                            jobs[pool.submit(process, index, url, page_html)] = (index, url, depth)
+                            continue
+                        _, rows, metrics = process(index, url, page_html)
+                    except Exception as e:
+                        yield index, url, [], e, None
+                        continue
+                else:
+                    index, url, depth = jobs.pop(future)
+                    try:
+                        _, rows, metrics = future.result()
+                    except Exception as e:
+                        yield index, url, [], e, None
+                        continue
+
+                for link in links_from_rows(rows):
+                    frontier.add(page_url(link, url), depth + 1)
+                yield index, url, rows, None, metrics
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import re
+import csv
+import zlib
+import random
+import hashlib
+import argparse
+from urllib.parse import urlsplit, urlunsplit
+
+from compression import open_file
+
+REPORT_FIELDNAMES = ["Kind", "Similarity", "URL", "Source", "Duplicate of", "Duplicate of source"]
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def canonical_concept_url(url: str) -> str:
+    """
+    Normalize a concept URL (reference#id) so trivial variants compare equal:
+    lowercase scheme and host, no trailing slash on the path, fragment kept.
+    Example: 'HTTPS://Kubernetes.io/docs/ingress/#tls' -> 'https://kubernetes.io/docs/ingress#tls'
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, parts.fragment))
+
+def content_words(content: str) -> list:
+    """Lowercase words of 'content', ignoring punctuation, separators and whitespace."""
+    return WORD_PATTERN.findall(content.lower())
+
+class DuplicateIndex:
+    """
+    Detects duplicate concept rows across a batch in roughly linear time.
+
+    Each added row is checked, in order, against:
+    - 'url':     a row with the same canonical concept URL;
+    - 'content': a row with the same normalized content (SHA-1 of its words);
+    - 'near':    a row whose content is nearly the same, found through MinHash signatures
+                 of word shingles and LSH banding, then confirmed by the estimated Jaccard
+                 similarity reaching 'threshold'.
+    Rows with fewer than 'min_words' words only take part in the URL check, since
+    empty or one-line sections would otherwise all match each other. Sections whose <h2>
+    had no id all share the URL 'reference#no-id', so those skip the URL check.
+    """
+
+    def __init__(self, threshold: float = 0.8, shingle_size: int = 5, num_perm: int = 32,
+                 bands: int = 8, min_words: int = 8):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.min_words = min_words
+
+        # Fixed seed so signatures are comparable between runs
+        rng = random.Random(42)
+        self._masks = [rng.getrandbits(32) for _ in range(num_perm)]
+
+        self._by_url = {}
+        self._by_hash = {}
+        self._buckets = {}
+        self._signatures = {}
+        self._entries = []
+        self.duplicates = []
+
+    def signature(self, words: list) -> tuple:
+        """MinHash signature of the word shingles of a row."""
+        size = self.shingle_size
+        if len(words) <= size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        return tuple(min(h ^ mask for h in hashes) for mask in self._masks)
+
+    def _band_keys(self, signature: tuple):
+        step = self.rows_per_band
+        for band in range(self.bands):
+            yield band, signature[band * step:(band + 1) * step]
+
+    def add(self, url: str, content: str, source: str):
+        """
+        Index one row and return a duplicate record (a dict with REPORT_FIELDNAMES keys)
+        if it duplicates an earlier row, or None if it is new.
+        """
+        entry_id = len(self._entries)
+        canonical_url = canonical_concept_url(url)
+        self._entries.append((url, source))
+
+        duplicate = None
+        if canonical_url.endswith("#no-id"):
+            pass
+        elif canonical_url in self._by_url:
+            duplicate = ("url", 1.0, self._by_url[canonical_url])
+        else:
+            self._by_url[canonical_url] = entry_id
+
+        words = content_words(content)
+        if len(words) >= self.min_words:
+            content_hash = hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+            if duplicate is None and content_hash in self._by_hash:
+                duplicate = ("content", 1.0, self._by_hash[content_hash])
+            self._by_hash.setdefault(content_hash, entry_id)
+
+            signature = self.signature(words)
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                bucket = self._buckets.setdefault(band_key, [])
+                candidates.update(bucket)
+                bucket.append(entry_id)
+
+            if duplicate is None:
+                best = None
+                for candidate in candidates:
+                    other = self._signatures[candidate]
+                    similarity = sum(a == b for a, b in zip(signature, other)) / self.num_perm
+                    if similarity >= self.threshold and (best is None or similarity > best[1]):
+                        best = ("near", similarity, candidate)
+                duplicate = best
+            self._signatures[entry_id] = signature
+
+        if duplicate is None:
+            return None
+
+        kind, similarity, original_id = duplicate
+        original_url, original_source = self._entries[original_id]
+        record = {
+            "Kind": kind,
+            "Similarity": f"{similarity:.2f}",
+            "URL": url,
+            "Source": source,
+            "Duplicate of": original_url,
+            "Duplicate of source": original_source,
+        }
+        self.duplicates.append(record)
+        return record
+
+    def write_report(self, report_file: str):
+        """Write every duplicate found so far to a CSV report."""
+        with open_file(report_file, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(self.duplicates)
+
+def source_of(row_url: str) -> str:
+    """The page a concept row came from: its URL without the #id fragment."""
+    return row_url.split("#", 1)[0]
+
+def dedup_csv(input_file: str, output_file: str, report_file: str, drop: bool, threshold: float):
+    """
+    Reads a combined CSV, reports duplicate concepts to 'report_file' and, if 'drop'
+    is set, writes the CSV without them to 'output_file' (IDs are renumbered).
+    """
+    index = DuplicateIndex(threshold=threshold)
+    with open_file(input_file, "r", newline="") as infile:
+        reader = csv.DictReader(infile)
+        fieldnames = reader.fieldnames
+        kept = []
+        for row in reader:
+            duplicate = index.add(row["URL"], row["Content"], source_of(row["URL"]))
+            if duplicate is None or not drop:
+                kept.append(row)
+
+    index.write_report(report_file)
+    print(f"{len(index.duplicates)} duplicate concepts reported in {report_file}")
+
+    if output_file:
+        with open_file(output_file, "w", newline="") as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+            writer.writeheader()
+            for idx, row in enumerate(kept, start=1):
+                writer.writerow({**row, "ID": idx})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report (and optionally drop) duplicate concepts in a combined CSV.")
+    parser.add_argument("--input", type=str, required=True, help="Path to the combined CSV.")
+    parser.add_argument("--report", type=str, required=True, help="Path to the duplicate report CSV.")
+    parser.add_argument("--output", type=str, default=None, help="Path to the CSV written without duplicates.")
+    parser.add_argument("--drop", action="store_true", help="Leave duplicates out of --output.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Similarity above which rows are near-duplicates.")
+    args = parser.parse_args()
+
+    dedup_csv(args.input, args.output, args.report, args.drop, args.threshold)
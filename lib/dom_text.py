@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+from bs4 import NavigableString, CData
+
+from extract_code_example import CodeBlockString
+
+def iter_text_runs(nodes):
+    """
+    Walk parsed nodes in document order and yield their text the way get_text() would
+    see it after the nodes were serialized and parsed again:
+    - adjacent strings with no tag in between are yielded as a single run (str);
+    - CodeBlockString objects left by mark_code_blocks() are yielded as-is.
+    Comments, script text and other non-content strings are skipped.
+    """
+    run = None
+    prev = None
+
+    for node in nodes:
+        elements = [node] if isinstance(node, NavigableString) else node.descendants
+        for element in elements:
+            if not isinstance(element, NavigableString):
+                continue
+
+            if isinstance(element, CodeBlockString):
+                if run is not None:
+                    yield run
+                yield element
+                run = None
+            elif type(element) is NavigableString:
+                # Adjacent strings with no tag in between serialize as one string
+                if run is not None and prev.next_sibling is element:
+                    run += element
+                else:
+                    if run is not None:
+                        yield run
+                    run = str(element)
+            else:
+                # Comments, CDATA, script text, etc. always sit between tag boundaries
+                if run is not None:
+                    yield run
+                if type(element) is CData:
+                    yield str(element)
+                run = None
+            prev = element
+
+    if run is not None:
+        yield run
+
+def split_text_around_code_blocks(nodes) -> list:
+    """
+    Returns a list alternating between text parts (lists of runs from iter_text_runs())
+    and the CodeBlockString objects that separate them.
+    """
+    parts = [[]]
+    for run in iter_text_runs(nodes):
+        if isinstance(run, CodeBlockString):
+            parts.append(run)
+            parts.append([])
+        else:
+            parts[-1].append(run)
+    return parts
+
+def get_stripped_text(node) -> str:
+    """
+    Same as node.get_text(strip=True) on a serialized and re-parsed copy of 'node'.
+    """
+    stripped_runs = (run.strip() for run in iter_text_runs([node]) if not isinstance(run, CodeBlockString))
+    return "".join(run for run in stripped_runs if run)
+
+def needs_reparse(node) -> bool:
+    """
+    True if 'node' is a top-level string of a section whose text would be read back as HTML.
+    extract_h2 writes such strings with str(), which neither escapes '<' and '&' nor keeps
+    comment delimiters, so their text cannot be taken from the tree as-is.
+    """
+    if not isinstance(node, NavigableString):
+        return False
+    return type(node) is not NavigableString or "<" in node or "&" in node
@@ -1,20 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
 
-SEPARATOR = "=================================================="
-
-def split_into_chunks(full_text: str):
-    """Split the text into chunks by SEPARATOR."""
-    chunks = full_text.split(SEPARATOR)
-    return [ch.strip() for ch in chunks if ch.strip()]
-
-def get_html_portion(chunk: str):
-    """Extract the HTML portion after 'Content:' in the chunk."""
-    marker = "Content:"
-    idx = chunk.find(marker)
-    return chunk[idx + len(marker):].lstrip() if idx != -1 else ""
+from compression import open_file
+from parser_backend import BACKENDS, set_backend
+from chunk_format import CHUNK_MARKER, SEPARATOR, iter_chunks
 
 def should_treat_as_code_block(code_text: str) -> bool:
     """
@@ -29,80 +20,115 @@ def should_treat_as_code_block(code_text: str) -> bool:
         return True
     return False
 
-def embed_code_blocks(html: str):
+class CodeBlockString(NavigableString):
+    """A string that replaced a complex <code> element and carries the code block markers."""
+
+    def __new__(cls, value, code_text=""):
+        obj = NavigableString.__new__(cls, value)
+        obj.code_text = code_text
+        return obj
+
+def mark_code_blocks(root) -> None:
     """
-    Parse the HTML using BeautifulSoup and embed code blocks in the content.
-    - Simple code blocks (e.g., single words) are added as plain text.
-    - Complex code blocks are wrapped with [CODE_BLOCK_START] and [CODE_BLOCK_END].
+    Replace every <code> element under the parsed 'root' in place:
+    - Simple code blocks (e.g., single words) become plain text.
+    - Complex code blocks become a CodeBlockString wrapped with [CODE_BLOCK_START] and [CODE_BLOCK_END].
     """
-    soup = BeautifulSoup(html, "html.parser")
-    all_code_elements = soup.find_all("code")
-
-    for code_elt in all_code_elements:
+    for code_elt in root.find_all("code"):
         # Extract the code text
         code_text = code_elt.get_text().strip()
 
         if should_treat_as_code_block(code_text):
             # Treat as a full code block
             wrapped_code = f"\n[CODE_BLOCK_START]\n{code_text}\n[CODE_BLOCK_END]\n"
-            code_elt.replace_with(wrapped_code)
+            code_elt.replace_with(CodeBlockString(wrapped_code, code_text))
         else:
             # Treat as simple text
             code_elt.replace_with(code_text)
 
+def embed_code_blocks(html: str):
+    """
+    Parse the HTML using BeautifulSoup and embed code blocks in the content.
+    - Simple code blocks (e.g., single words) are added as plain text.
+    - Complex code blocks are wrapped with [CODE_BLOCK_START] and [CODE_BLOCK_END].
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    mark_code_blocks(soup)
+
     # Return the modified HTML as a string
     return str(soup)
 
-def main(input_file: str, output_file: str):
+def embed_section_code(content_html: str) -> str:
     """
-    Main function to process input and output files.
+    The content of one extract_h2 section as process_sections_text() writes it:
+    code blocks embedded and surrounding whitespace stripped.
     """
-    with open(input_file, "r", encoding="utf-8") as f:
-        full_text = f.read()
+    html_part = "\n".join(content_html.splitlines()).strip()
+    if not html_part:
+        return ""
+    return embed_code_blocks(html_part).strip()
+
+def mark_code_in_sections(sections):
+    """
+    Generator version of process_sections_text(): yields every section record
+    (see extract_h2.iter_h1_and_h2_sections()) with its code blocks embedded.
+    """
+    for section in sections:
+        yield {**section, "content_html": embed_section_code(section["content_html"])}
+
+def process_sections_text(full_text: str) -> str:
+    """
+    Embed code blocks in every section of the extract_h2 output and
+    return the text re-labelled as CONCEPT CHUNKs.
+    """
+    return "".join(iter_processed_sections(full_text))
 
+def iter_processed_sections(full_text: str):
+    """
+    Yields the text of process_sections_text() piece by piece: the TOPIC line,
+    then every CONCEPT CHUNK as soon as its code blocks are embedded.
+    """
     # Separate the TOPIC line from the rest of the text
     lines = full_text.splitlines()
     topic_line = lines[0] if lines[0].startswith("[TOPIC:") else "Unknown Topic"
     rest_of_text = "\n".join(lines[1:])
 
-    chunks = split_into_chunks(rest_of_text)
-    results = []
+    # Write the TOPIC at the top, followed by the processed chunks
+    yield f"{topic_line}\n\n"
 
-    for i, chunk in enumerate(chunks, start=1):
-        html_part = get_html_portion(chunk)
+    for i, chunk in enumerate(iter_chunks(rest_of_text), start=1):
+        html_part = chunk.content.strip()
         if not html_part:
             # If there's no HTML part, keep the chunk as-is
-            results.append(chunk)
-            continue
-
-        # Embed code blocks in the HTML content
-        modified_html = embed_code_blocks(html_part)
-
-        # Combine the prefix and modified HTML
-        marker = "Content:"
-        idx = chunk.find(marker)
-        if idx != -1:
-            prefix = chunk[:idx + len(marker)].rstrip()
-            modified_chunk = prefix + "\n" + modified_html.strip()
+            modified_chunk = chunk.header.strip()
         else:
-            modified_chunk = chunk
+            # Embed code blocks in the HTML content
+            modified_html = embed_code_blocks(html_part)
+
+            # Combine the prefix and modified HTML
+            modified_chunk = chunk.header.rstrip() + "\n" + modified_html.strip()
 
-        # Append the processed chunk
-        results.append(modified_chunk)
+        yield f"{CHUNK_MARKER}{i} =====\n\n{modified_chunk}\n\n{SEPARATOR}\n\n"
+
+def main(input_file: str, output_file: str):
+    """
+    Main function to process input and output files.
+    Each chunk is written as soon as it is processed.
+    """
+    with open_file(input_file, "r") as f:
+        full_text = f.read()
 
     # Write the processed chunks to the output file
-    with open(output_file, "w", encoding="utf-8") as out:
-        # Write the TOPIC at the top of the file
-        out.write(f"{topic_line}\n\n")
-        for i, modified_chunk in enumerate(results, start=1):
-            out.write(f"===== CONCEPT CHUNK #{i} =====\n\n")
-            out.write(modified_chunk)
-            out.write("\n\n" + SEPARATOR + "\n\n")
+    with open_file(output_file, "w") as out:
+        for text in iter_processed_sections(full_text):
+            out.write(text)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Embed code blocks in content and refine output.")
     parser.add_argument("--input", type=str, required=True, help="Path to the input file.")
     parser.add_argument("--output", type=str, required=True, help="Path to the output file.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
     args = parser.parse_args()
+    set_backend(args.parser)
 
     main(args.input, args.output)
@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 
 import argparse
+from html.parser import HTMLParser
+
 from bs4 import BeautifulSoup
+from bs4.builder import HTMLParserTreeBuilder
+
+from chunk_format import SEPARATOR
+from compression import open_file
+from parser_backend import BACKENDS, make_lexbor_tree, make_soup, set_backend, use_selectolax
 
 def extract_h1_and_h2_sections(html_content: str):
     """
@@ -17,15 +24,13 @@ def extract_h1_and_h2_sections(html_content: str):
                                 until the next <h2>.
             }
     """
-    soup = BeautifulSoup(html_content, "html.parser")
+    if use_selectolax():
+        return extract_h1_and_h2_sections_lexbor(html_content)
 
-    # Extract <h1> tag
-    h1_tag = soup.find("h1")
+    soup = make_soup(html_content)
+    h1_tag, h2_tags = find_h1_and_h2_tags([soup])
     topic = h1_tag.get_text(strip=True) if h1_tag else "Unknown Topic"
 
-    # Find all <h2> tags
-    h2_tags = soup.find_all("h2")
-
     sections = []
 
     # Loop through each <h2>
@@ -33,22 +38,8 @@ def extract_h1_and_h2_sections(html_content: str):
         section_title = h2.get_text(strip=True)  # The text content of the <h2>
         section_id = h2.get("id", "no-id")  # Get the 'id' attribute or default to 'no-id'
 
-        # Collect the content that follows this <h2>
-        content_parts = []
-
-        # Use next_sibling to iterate siblings until we find another <h2>
-        node = h2.next_sibling
-
-        while node:
-            # If we encounter another <h2>, that means our current block ends
-            if node.name == "h2":
-                break
-            # Otherwise, we collect it
-            content_parts.append(str(node))
-            node = node.next_sibling
-
-        # Join everything into a single string
-        section_content_html = "".join(content_parts).strip()
+        # Join everything that follows this <h2> into a single string
+        section_content_html = "".join(str(node) for node in iter_section_nodes(h2)).strip()
 
         # Add to sections
         sections.append({
@@ -59,34 +50,365 @@ def extract_h1_and_h2_sections(html_content: str):
 
     return topic, sections
 
-def main(input_file, output_file):
+def extract_h1_and_h2_sections_lexbor(html_content: str):
     """
-    Read HTML from input_file, extract <h1> and <h2> sections, and write them to output_file.
+    Same as extract_h1_and_h2_sections(), using selectolax/lexbor.
+    Top-level text and comments are written raw, as str() does for BeautifulSoup strings.
     """
-    with open(input_file, "r", encoding="utf-8") as f:
-        html_content = f.read()
+    tree = make_lexbor_tree(html_content)
+
+    h1_tag = tree.css_first("h1")
+    topic = h1_tag.text(strip=True) if h1_tag else "Unknown Topic"
+
+    sections = []
+    for h2 in tree.css("h2"):
+        section_id = h2.attributes.get("id", "no-id")
+        content_parts = []
+        node = h2.next
+        while node is not None and node.tag != "h2":
+            if node.tag == "-text":
+                content_parts.append(node.text(deep=False))
+            elif node.tag == "-comment":
+                content_parts.append(node.html[len("<!--"):-len("-->")])
+            else:
+                content_parts.append(node.html or "")
+            node = node.next
+
+        sections.append({
+            "title": h2.text(strip=True),
+            "id": section_id if section_id is not None else "",
+            "content_html": "".join(content_parts).strip()
+        })
+
+    return topic, sections
+
+def find_h1_and_h2_tags(roots: list):
+    """
+    Find the first <h1> tag (or None) and every <h2> tag under the given parsed roots,
+    in document order.
+    """
+    h1_tag = None
+    for root in roots:
+        # Extract <h1> tag
+        h1_tag = root.find("h1")
+        if h1_tag:
+            break
+
+    # Find all <h2> tags
+    h2_tags = []
+    for root in roots:
+        h2_tags.extend(root.find_all("h2"))
+
+    return h1_tag, h2_tags
+
+def iter_section_nodes(h2):
+    """
+    Yield the sibling nodes that follow 'h2', stopping at the next <h2>.
+    """
+    # Use next_sibling to iterate siblings until we find another <h2>
+    node = h2.next_sibling
+
+    while node is not None:
+        # If we encounter another <h2>, that means our current block ends
+        if node.name == "h2":
+            break
+        # Otherwise, we collect it
+        yield node
+        node = node.next_sibling
+
+# Tags html.parser's BeautifulSoup builder closes as soon as they open (<br>, <img>, ...)
+EMPTY_ELEMENT_TAGS = HTMLParserTreeBuilder().empty_element_tags
+
+# Characters of input fed to the streaming splitter at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def parse_fragment(html_fragment: str) -> BeautifulSoup:
+    """Parse a piece of a page cut out by SectionSplitter (always with html.parser, as it splits)."""
+    return BeautifulSoup(html_fragment, "html.parser")
+
+class SectionSplitter(HTMLParser):
+    """
+    Incremental version of extract_h1_and_h2_sections(). The HTML is fed in pieces and
+    every <h2> section is returned as soon as the markup after it has been read, so only
+    the text of the sections still open is kept in memory, not the whole page.
+
+    The splitter keeps the stack of open tags the way html.parser's BeautifulSoup builder
+    builds its tree (an end tag closes the most recent open tag of that name and everything
+    opened after it; unmatched end tags are ignored), so it cuts the page exactly where the
+    tree-based version starts and stops iterating the siblings of an <h2>: a section ends
+    at the next <h2> at the same depth or where the parent of its <h2> is closed.
+    The source text of each heading and section is then parsed on its own, which builds
+    the same nodes as in the whole-page tree.
+
+    Sections are not held back for a late <h1>: the topic is the first <h1> if it has started
+    where the first section ends, as in every page that starts with its title, and
+    'Unknown Topic' otherwise.
+    """
+
+    def __init__(self):
+        # Only tags matter here; letting HTMLParser resolve character references in bulk
+        # leaves far fewer text events to handle
+        super().__init__(convert_charrefs=True)
+        self.topic = None
+        self._open_tags = []
+        self._already_closed = []
+        self._sections = []
+        # Sections whose heading just closed, so their content starts at the next event
+        self._awaiting_content = []
+        self._h1_start = None
+        self._h1_depth = None
+        # Source text kept since offset '_text_start', and where the current event starts
+        self._text = []
+        self._text_start = 0
+        self._rawdata_start = 0
+        self._event_start = 0
+
+    def feed(self, data: str) -> list:
+        """Reads the next piece of HTML and returns the sections completed by it (see close())."""
+        self._text.append(data)
+        return self._advance(lambda: super(SectionSplitter, self).feed(data), len(data))
+
+    def close(self) -> list:
+        """
+        Ends the input and returns the remaining sections. Sections are returned in document
+        order, and 'topic' is set before any is returned.
+        """
+        sections = self._advance(super().close, 0)
+        # Close whatever is still open at the end of the page
+        self._pop_to_depth(0, self._position())
+        self._end_sections(self._position(), -1)
+        if self.topic is None:
+            self.topic = "Unknown Topic"
+        return sections + self._ready_sections()
+
+    def _advance(self, parse, fed: int) -> list:
+        # HTMLParser drops the text it has handled from 'rawdata'; keep track of its offset
+        unparsed = len(self.rawdata) + fed
+        self._event_start = 0
+        parse()
+        self._rawdata_start += unparsed - len(self.rawdata)
+        self._event_start = 0
+        self._trim_text()
+        return self._ready_sections()
 
-    # Extract the topic and sections
+    def updatepos(self, i: int, j: int) -> int:
+        # goahead() calls this with the start of every event ('j' is where the next one starts)
+        self._event_start = j
+        if self._awaiting_content:
+            for section in self._awaiting_content:
+                section["content_start"] = self._rawdata_start + j
+            self._awaiting_content = []
+        return super().updatepos(i, j)
+
+    def _position(self) -> int:
+        return self._rawdata_start + self._event_start
+
+    def _source(self, start: int, end: int) -> str:
+        text = "".join(self._text)
+        self._text = [text]
+        return text[start - self._text_start:end - self._text_start]
+
+    def _trim_text(self):
+        # Keep the text from the start of the earliest heading or section still needed
+        starts = [self._position()]
+        if self._h1_start is not None:
+            starts.append(self._h1_start)
+        for section in self._sections:
+            if section["end"] is None:
+                starts.append(section["start"])
+        keep_from = min(starts)
+        if keep_from > self._text_start:
+            text = "".join(self._text)
+            self._text = [text[keep_from - self._text_start:]]
+            self._text_start = keep_from
+
+    def handle_starttag(self, tag: str, attrs: list, self_closing: bool = False):
+        position = self._position()
+        depth = len(self._open_tags)
+        if tag == "h2":
+            self._end_sections(position, depth, siblings=True)
+            self._sections.append({"start": position, "depth": depth, "heading": None,
+                                   "content_start": None, "end": None})
+        elif tag == "h1" and self.topic is None and self._h1_start is None:
+            self._h1_start, self._h1_depth = position, depth
+        self._open_tags.append(tag)
+
+        if tag in EMPTY_ELEMENT_TAGS and not self_closing:
+            self._pop_to(tag)
+            self._already_closed.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: list):
+        self.handle_starttag(tag, attrs, self_closing=True)
+        self._pop_to(tag)
+
+    def handle_endtag(self, tag: str):
+        if tag in self._already_closed:
+            # The redundant end tag of an empty element, e.g. </br>
+            self._already_closed.remove(tag)
+        else:
+            self._pop_to(tag)
+
+    def _pop_to(self, tag: str):
+        if tag in self._open_tags:
+            self._pop_to_depth(len(self._open_tags) - 1 - self._open_tags[::-1].index(tag), self._position())
+
+    def _pop_to_depth(self, depth: int, position: int):
+        """Closes the open tags from 'depth' on, at 'position' in the page."""
+        del self._open_tags[depth:]
+
+        if self._h1_start is not None and depth <= self._h1_depth:
+            h1 = parse_fragment(self._source(self._h1_start, position)).find("h1")
+            self.topic = h1.get_text(strip=True)
+            self._h1_start = None
+        for section in self._sections:
+            if section["heading"] is None and depth <= section["depth"]:
+                section["heading"] = self._source(section["start"], position)
+                self._awaiting_content.append(section)
+        self._end_sections(position, depth)
+
+    def _end_sections(self, position: int, depth: int, siblings: bool = False):
+        """Ends the sections whose parent was closed at 'depth' (or, with 'siblings', of an <h2> at 'depth')."""
+        for section in self._sections:
+            if section["end"] is not None:
+                continue
+            if depth < section["depth"] or (siblings and depth == section["depth"]):
+                section["end"] = position
+                if self.topic is None and self._h1_start is None:
+                    # No <h1> so far: the topic is not waited for past the first section
+                    self.topic = "Unknown Topic"
+                if section["heading"] is None:
+                    section["heading"] = self._source(section["start"], position)
+                content_start = section["content_start"]
+                section["content_html"] = "" if content_start is None else self._source(content_start, position)
+
+    def _ready_sections(self) -> list:
+        ready = []
+        while self.topic is not None and self._sections and self._sections[0]["end"] is not None:
+            section = self._sections.pop(0)
+            h2 = parse_fragment(section["heading"]).find("h2")
+            content = parse_fragment(section["content_html"])
+            ready.append({
+                "title": h2.get_text(strip=True),
+                "id": h2.get("id", "no-id"),
+                "content_html": "".join(str(node) for node in content.contents).strip()
+            })
+        return ready
+
+def read_in_chunks(source, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield the text of 'source' (a string or an open text file) 'chunk_size' characters at a time."""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def iter_h1_and_h2_sections(chunks):
+    """
+    Stream version of extract_h1_and_h2_sections(): feeds the pieces of HTML in 'chunks'
+    to a SectionSplitter and yields every section as soon as it is complete, as a record
+    with the page topic and the section number (from 1) added:
+        {"topic": ..., "index": ..., "title": ..., "id": ..., "content_html": ...}
+    """
+    splitter = SectionSplitter()
+    index = 0
+    for chunk in chunks:
+        for section in splitter.feed(chunk):
+            index += 1
+            yield {"topic": splitter.topic, "index": index, **section}
+    for section in splitter.close():
+        index += 1
+        yield {"topic": splitter.topic, "index": index, **section}
+
+def iter_sections_text(chunks):
+    """
+    Stream version of extract_sections_text(): yields the topic line and then every
+    section in the same text format, one at a time, as the pieces of HTML are read.
+    """
+    splitter = SectionSplitter()
+    idx = 0
+    header = True
+
+    def render(sections):
+        nonlocal idx, header
+        if header:
+            yield format_sections(splitter.topic, [])
+            header = False
+        for section in sections:
+            idx += 1
+            yield format_section(idx, section)
+
+    for chunk in chunks:
+        sections = splitter.feed(chunk)
+        if sections:
+            yield from render(sections)
+    yield from render(splitter.close())
+
+def extract_sections_text_streaming(html_content: str) -> str:
+    """
+    Same result as extract_sections_text() (with the html.parser backend), computed
+    with the streaming splitter instead of a tree of the whole page; only a page whose
+    <h1> comes after its first section gets 'Unknown Topic' (see SectionSplitter).
+    """
+    return "".join(iter_sections_text(read_in_chunks(html_content)))
+
+def format_section(idx: int, sec: dict) -> str:
+    """
+    Render <h2> section number 'idx' (1-based) in the Concept text format.
+    """
+    return f"[{idx}] Concept: {sec['title']} [id: {sec['id']}]\nContent:\n{sec['content_html']}\n\n{SEPARATOR}\n\n"
+
+def format_sections(topic: str, sections: list) -> str:
+    """
+    Render the topic and <h2> sections in the [TOPIC: ...] / Concept text format.
+    """
+    # Write the topic at the top
+    parts = [f"[TOPIC: {topic}]\n\n"]
+
+    # Write each <h2> section
+    for idx, sec in enumerate(sections, start=1):
+        parts.append(format_section(idx, sec))
+
+    return "".join(parts)
+
+def extract_sections_text(html_content: str) -> str:
+    """
+    Extract the <h1> and <h2> sections of 'html_content' and render them as text.
+    """
     topic, sections = extract_h1_and_h2_sections(html_content)
+    return format_sections(topic, sections)
 
-    # Write the results as text to the output file
-    with open(output_file, "w", encoding="utf-8") as f:
-        # Write the topic at the top
-        f.write(f"[TOPIC: {topic}]\n\n")
+def main(input_file, output_file, stream: bool = False):
+    """
+    Read HTML from input_file, extract <h1> and <h2> sections, and write them to output_file.
+    With 'stream', the input is read in pieces and each section is written as soon as it is
+    complete, so memory is bounded by the largest section instead of the whole page.
+    """
+    if stream:
+        with open_file(input_file, "r") as f, open_file(output_file, "w") as out:
+            for text in iter_sections_text(read_in_chunks(f)):
+                out.write(text)
+        return
+
+    with open_file(input_file, "r") as f:
+        html_content = f.read()
 
-        # Write each <h2> section
-        for idx, sec in enumerate(sections, start=1):
-            f.write(f"[{idx}] Concept: {sec['title']} [id: {sec['id']}]\n")
-            f.write("Content:\n")
-            f.write(sec["content_html"])
-            f.write("\n\n" + "=" * 50 + "\n\n")
+    # Write the topic and sections as text to the output file
+    with open_file(output_file, "w") as f:
+        f.write(extract_sections_text(html_content))
 
 if __name__ == "__main__":
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Extract <h1> and <h2> sections and their content from HTML.")
     parser.add_argument("--input", type=str, required=True, help="Path to the input HTML file.")
     parser.add_argument("--output", type=str, required=True, help="Path to the output text file.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
+    parser.add_argument("--stream", action="store_true", help="Split the file while reading it (html.parser rules) instead of parsing it whole.")
     args = parser.parse_args()
+    set_backend(args.parser)
 
     # Run the main function
-    main(args.input, args.output)
+    main(args.input, args.output, args.stream)
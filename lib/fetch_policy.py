@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+
+from canonical_urls import get_redirect_map
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Exceptions worth retrying: the request never got a complete answer
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+def parse_retry_after(value: str) -> float:
+    """
+    The delay in seconds asked for by a Retry-After header, given either as seconds
+    or as an HTTP date, or None if the header is missing or invalid.
+    Example: '120' -> 120.0, 'Wed, 21 Oct 2015 07:28:00 GMT' -> seconds until then (at least 0)
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+class TokenBucket:
+    """
+    Lets requests through at 'rate' per second on average, with bursts of up to 'burst'.
+    Without a 'rate', requests are only held back while the bucket is paused.
+    """
+
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate or 1.0, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """Lets nothing through for 'seconds' (e.g. the Retry-After of a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rate is None:
+                        return
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class AimdLimiter:
+    """
+    Caps the requests in flight to one host with an additive-increase/multiplicative-decrease
+    limit. The limit starts at 'max_limit' and grows by about one per round of successful
+    requests, up to 'max_limit'. It is multiplied by 'decrease' (at most once per
+    'cooldown' seconds, down to 'min_limit') when a request fails with a retryable error or
+    takes longer than 'latency_target'. Without a 'latency_target', the target is four times
+    the fastest response seen so far, but at least one second.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease: float = 0.5, latency_target: float = None,
+                 cooldown: float = 1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        self._fastest = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Blocks until fewer requests than the current limit are in flight."""
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, ok: bool, latency: float):
+        """Ends a request that succeeded ('ok') or failed after 'latency' seconds, and adapts the limit."""
+        with self._condition:
+            self._in_flight -= 1
+            if ok:
+                self._fastest = latency if self._fastest is None else min(self._fastest, latency)
+            target = self.latency_target or max(4 * (self._fastest or latency), 1.0)
+
+            now = time.monotonic()
+            if not ok or latency > target:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class FetchPolicy:
+    """
+    How pages are requested: every request has a 'timeout', and requests to the same host
+    go through that host's TokenBucket ('rate' requests per second, None for no limit) and
+    AimdLimiter (at most 'per_host' in flight). A request that times out, cannot connect,
+    or gets a 429 or 5xx response is retried up to 'retries' times after an exponential
+    backoff with full jitter (a random delay of up to backoff * 2^attempt, capped at
+    'max_backoff'). A Retry-After header replaces that delay, and a 429 with one pauses
+    the whole host; a Retry-After longer than 'max_backoff' is not waited for, and the
+    response is returned as it is. Redirects are recorded in the process's RedirectMap.
+    """
+
+    def __init__(self, timeout: float = 30.0, retries: int = 3, backoff: float = 1.0, max_backoff: float = 60.0,
+                 rate: float = None, burst: float = None, per_host: int = 4, latency_target: float = None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate = rate
+        self.burst = burst
+        self.per_host = per_host
+        self.latency_target = latency_target
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def copy(self, **changes) -> "FetchPolicy":
+        """A policy with the same settings (except 'changes') and fresh per-host state."""
+        settings = {name: getattr(self, name) for name in ("timeout", "retries", "backoff", "max_backoff", "rate",
+                                                           "burst", "per_host", "latency_target")}
+        settings.update(changes)
+        return FetchPolicy(**settings)
+
+    def host(self, url: str):
+        """The (TokenBucket, AimdLimiter) of the host of 'url'."""
+        netloc = urlparse(url).netloc
+        with self._lock:
+            if netloc not in self._hosts:
+                self._hosts[netloc] = (TokenBucket(self.rate, self.burst),
+                                       AimdLimiter(self.per_host, latency_target=self.latency_target))
+            return self._hosts[netloc]
+
+    def backoff_delay(self, attempt: int) -> float:
+        """The random delay before retry number 'attempt' (0-based)."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, session: requests.Session, url: str, headers: dict = None) -> requests.Response:
+        """
+        GETs 'url' through 'session' following the policy and returns the last response.
+        Raises the last requests.exceptions.RequestException if every attempt failed without one.
+        """
+        bucket, limiter = self.host(url)
+        for attempt in range(self.retries + 1):
+            bucket.acquire()
+            limiter.acquire()
+            start = time.monotonic()
+            response = None
+            try:
+                response = session.get(url, headers=headers, timeout=self.timeout)
+            except RETRY_EXCEPTIONS as e:
+                error = e
+            finally:
+                ok = response is not None and response.status_code not in RETRY_STATUSES
+                limiter.release(ok, time.monotonic() - start)
+
+            if ok or attempt == self.retries:
+                break
+
+            delay = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+            if delay is None:
+                delay = self.backoff_delay(attempt)
+            elif delay > self.max_backoff:
+                break
+            elif response.status_code == 429:
+                bucket.pause(delay)
+            time.sleep(delay)
+
+        if response is None:
+            raise error
+        if response.history:
+            get_redirect_map().record(url, response.url)
+        return response
+
+# Policy used by fetches that are not given one, set from the command line
+_default_policy = FetchPolicy()
+
+def set_fetch_policy(policy: FetchPolicy):
+    """Makes 'policy' the one used by fetches that are not given one."""
+    global _default_policy
+    _default_policy = policy
+
+def get_fetch_policy() -> FetchPolicy:
+    """Returns the policy used by fetches that are not given one."""
+    return _default_policy
+
+def add_policy_arguments(parser):
+    """Adds the command-line options of the fetch policy to an argparse parser."""
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for a server response.")
+    parser.add_argument("--retries", type=int, default=3, help="Retries of a request that times out or gets a 429/5xx.")
+    parser.add_argument("--backoff", type=float, default=1.0, help="Base delay in seconds of the exponential retry backoff.")
+    parser.add_argument("--max-backoff", type=float, default=60.0, help="Longest retry delay in seconds (also caps Retry-After).")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum requests per second to one host (default: no limit).")
+
+def policy_from_args(args, per_host: int = 4) -> FetchPolicy:
+    """Builds the FetchPolicy described by the options of add_policy_arguments()."""
+    return FetchPolicy(timeout=args.timeout, retries=args.retries, backoff=args.backoff, max_backoff=args.max_backoff,
+                       rate=args.rate, per_host=per_host)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from simple_spider import create_session, fetch_page
+from fetch_policy import get_fetch_policy
+
+def fetch_pages(urls: list, workers: int = 4, per_host: int = 4, cache=None, report=None):
+    """
+    Fetches 'urls' concurrently over one pooled session and yields
+    (index, url, page_html, error) tuples as soon as each download finishes,
+    so the caller can process a page while the others are still downloading.
+    'error' is the RequestException raised for that URL, or None.
+    Pages go through 'cache' (an HttpCache) when one is given.
+    Requests follow the default FetchPolicy (timeouts, retries, rate limit), and at most
+    'per_host' of them are in flight per host, fewer while the host is slow or failing.
+    At most two downloads per worker are started ahead of the caller, so when processing is
+    slower than downloading, the pages wait on the server rather than in memory.
+    With a 'report' (a RunReport), every download is recorded as the 'fetch' stage of its URL.
+    """
+    session = create_session(pool_size=max(workers, per_host))
+    policy = get_fetch_policy().copy(per_host=per_host)
+
+    def fetch(url):
+        if report is not None:
+            return report.measure(url, "fetch", fetch_page, url, session, cache, policy)
+        return fetch_page(url, session, cache, policy)
+
+    queue = list(enumerate(urls))
+    queue.reverse()
+    futures = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while queue or futures:
+            while queue and len(futures) < 2 * workers:
+                index, url = queue.pop()
+                futures[executor.submit(fetch, url)] = (index, url)
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, url = futures.pop(future)
+                try:
+                    yield index, url, future.result(), None
+                except requests.exceptions.RequestException as e:
+                    yield index, url, None, e
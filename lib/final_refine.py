@@ -2,12 +2,28 @@
 
 import argparse
 
+from compression import open_file
+
 def process_text(text: str) -> str:
     """
     1. Removes lines that exactly match "==========".
     2. Replaces [CODE_BLOCK_START] and [CODE_BLOCK_END] with a blank line,
        keeping the content of the code block intact.
     """
+    return refine_lines(text).strip()
+
+def refine_sections(sections):
+    """
+    Generator version of process_text(): yields every section record coming from
+    clean_all_tags_and_newline.clean_sections() with its 'content' refined.
+    """
+    for section in sections:
+        yield {**section, "content": refine_lines(section["content"])}
+
+def refine_lines(text: str) -> str:
+    """
+    The line by line part of process_text(), without stripping the result.
+    """
     # Split text into lines
     lines = text.splitlines()
     processed_lines = []
@@ -25,21 +41,21 @@ def process_text(text: str) -> str:
             processed_lines.append(line)  # Keep the line as-is
 
     # Join the processed lines back into a single string
-    return "\n".join(processed_lines).strip()
+    return "\n".join(processed_lines)
 
 def main(input_file: str, output_file: str) -> None:
     """
     Reads 'input_file', applies the above text transformations,
     then writes the result to 'output_file'.
     """
-    with open(input_file, "r", encoding="utf-8") as f:
+    with open_file(input_file, "r") as f:
         original_text = f.read()
 
     # Process the text to remove "=========="
     transformed_text = process_text(original_text)
 
     # Write the cleaned result to the output file
-    with open(output_file, "w", encoding="utf-8") as f:
+    with open_file(output_file, "w") as f:
         f.write(transformed_text)
 
 if __name__ == "__main__":
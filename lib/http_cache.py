@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import hashlib
+import threading
+
+import requests
+
+from fetch_policy import get_fetch_policy
+from canonical_urls import get_redirect_map
+
+# Share of 'max_bytes' an eviction brings the cache down to, so a full cache is not walked
+# again on the very next store()
+EVICT_TO = 0.9
+
+class CacheMissError(requests.exceptions.RequestException):
+    """Raised in offline mode when a URL has never been cached."""
+
+class HttpCache:
+    """
+    Persistent cache of page bodies keyed by URL.
+
+    Each entry is two files named after the SHA-256 of the URL:
+        <key>.html - the response body
+        <key>.json - {"url", "final_url", "etag", "last_modified"}
+    The body file's modification time records when the entry was last used, and the
+    least recently used entries are evicted (down to EVICT_TO of 'max_bytes') once the cache
+    grows past 'max_bytes'. The size of the folder is counted by the first evict() and then
+    kept up to date by store(), so the folder is only walked again when it is full.
+    'final_url' is where the request for 'url' was redirected to (or 'url' itself); a page
+    served from the cache records that redirect in the redirect map like a download does.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, offline: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        # Bytes in the cache folder, or None until evict() has counted them
+        self._total = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.html"), os.path.join(self.cache_dir, f"{key}.json")
+
+    def lookup(self, url: str):
+        """Returns (body, metadata) for 'url', or None if it is not cached."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            with open(body_path, "r", encoding="utf-8", newline="") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return body, metadata
+
+    def touch(self, url: str):
+        """Marks the entry for 'url' as just used."""
+        body_path, _ = self._paths(url)
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+
+    def _entry_size(self, body_path: str, meta_path: str) -> int:
+        """The bytes of the entry files 'body_path' and 'meta_path' (0 for a file that does not exist)."""
+        size = 0
+        for path in (body_path, meta_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def store(self, url: str, body: str, etag: str = None, last_modified: str = None, final_url: str = None):
+        """Saves 'body', its validators and the URL it was served from for 'url', then evicts old entries if needed."""
+        body_path, meta_path = self._paths(url)
+        metadata = {"url": url, "final_url": final_url or url, "etag": etag, "last_modified": last_modified}
+
+        # Write to temporary files first so a crash never leaves a half-written entry
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(body_path + suffix, "w", encoding="utf-8", newline="") as f:
+            f.write(body)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+        added = self._entry_size(body_path + suffix, meta_path + suffix)
+        replaced = self._entry_size(body_path, meta_path)
+        os.replace(body_path + suffix, body_path)
+        os.replace(meta_path + suffix, meta_path)
+
+        with self._lock:
+            if self._total is not None:
+                self._total += added - replaced
+            full = self._total is None or self._total > self.max_bytes
+        if full:
+            self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in EVICT_TO of 'max_bytes'."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".html"):
+                    continue
+                body_path = os.path.join(self.cache_dir, name)
+                meta_path = body_path[:-len(".html")] + ".json"
+                try:
+                    size = os.path.getsize(body_path) + os.path.getsize(meta_path)
+                    last_used = os.path.getmtime(body_path)
+                except OSError:
+                    continue
+                entries.append((last_used, size, body_path, meta_path))
+                total += size
+
+            if total <= self.max_bytes:
+                self._total = total
+                return
+            entries.sort()
+            for last_used, size, body_path, meta_path in entries:
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                for path in (body_path, meta_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+            self._total = total
+
+    def _serve(self, url: str, cached) -> str:
+        """Returns the cached body of 'url', marking it as used and recording its redirect."""
+        body, metadata = cached
+        self.touch(url)
+        if metadata.get("final_url"):
+            get_redirect_map().record(url, metadata["final_url"])
+        return body
+
+    def fetch(self, url: str, session: requests.Session, policy=None) -> str:
+        """
+        Returns the body of 'url', revalidating a cached copy with If-None-Match /
+        If-Modified-Since and serving it from disk on a 304. In offline mode only the
+        cache is read, and CacheMissError is raised for unknown URLs.
+        Requests follow 'policy' (a FetchPolicy, the default one if not given).
+        """
+        cached = self.lookup(url)
+
+        if self.offline:
+            if cached is None:
+                raise CacheMissError(f"{url} is not in the cache at {self.cache_dir}")
+            return self._serve(url, cached)
+
+        headers = {}
+        if cached is not None:
+            body, metadata = cached
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        response = (policy or get_fetch_policy()).get(session, url, headers)
+        if response.status_code == 304 and cached is not None:
+            return self._serve(url, cached)
+        response.raise_for_status()  # Raises an HTTPError if the status is 4xx or 5xx
+
+        self.store(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"), response.url)
+        return response.text
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import argparse
+
+from compression import open_file, strip_compression_extension
+from output_writers import read_rows, write_rows
+
+# Columns of the URL table and of the link graph edge list
+URL_FIELDNAMES = ["URL ID", "URL"]
+EDGE_FIELDNAMES = ["ID", "URL ID"]
+
+def link_graph_paths(output: str) -> tuple:
+    """
+    The URL table and edge list written next to the output 'output', compressed like it.
+    Example: 'data/multi_final.csv' -> ('data/multi_final_urls.csv', 'data/multi_final_links.csv')
+    """
+    stripped = strip_compression_extension(output)
+    base, compression_ext = os.path.splitext(stripped)[0], output[len(stripped):]
+    return f"{base}_urls.csv{compression_ext}", f"{base}_links.csv{compression_ext}"
+
+class UrlTable:
+    """Gives every distinct URL a small integer ID (from 1), in the order they are first seen."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def id_of(self, url: str) -> int:
+        """The ID of 'url', added to the table if it is new."""
+        url_id = self.ids.get(url)
+        if url_id is None:
+            url_id = self.ids[url] = len(self.ids) + 1
+        return url_id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def write(self, path: str):
+        """Writes the table to a CSV file with the URL_FIELDNAMES columns."""
+        with open_file(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(URL_FIELDNAMES)
+            writer.writerows((url_id, url) for url, url_id in self.ids.items())
+
+def read_url_table(path: str) -> dict:
+    """Reads a table written by UrlTable.write() as {URL ID: URL}."""
+    with open_file(path, "r", newline="") as f:
+        return {int(row["URL ID"]): row["URL"] for row in csv.DictReader(f)}
+
+class LinkGraphWriter:
+    """
+    Replaces the newline-separated URLs of the 'Link to' column of every row by their IDs
+    in a UrlTable, and writes one (row ID, URL ID) edge per link to the CSV 'edges_path' as
+    rows go by. The URL table is written to 'urls_path' on close().
+    """
+
+    def __init__(self, urls_path: str, edges_path: str):
+        self.urls_path = urls_path
+        self.edges_path = edges_path
+        self.table = UrlTable()
+        self._file = open_file(edges_path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EDGE_FIELDNAMES)
+
+    def add_rows(self, rows: list) -> list:
+        """Returns 'rows' with their links as URL IDs, and records their edges."""
+        linked = []
+        for row in rows:
+            url_ids = [self.table.id_of(url) for url in row["Link to"].split("\n") if url]
+            self._writer.writerows((row["ID"], url_id) for url_id in url_ids)
+            linked.append({**row, "Link to": "\n".join(str(url_id) for url_id in url_ids)})
+        return linked
+
+    def close(self):
+        self._file.close()
+        self.table.write(self.urls_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def expand_links(rows: list, urls: dict) -> list:
+    """The reverse of LinkGraphWriter.add_rows(): 'Link to' IDs replaced by the URLs of 'urls' (see read_url_table())."""
+    return [{**row, "Link to": "\n".join(urls[int(url_id)] for url_id in str(row["Link to"]).split("\n") if url_id)}
+            for row in rows]
+
+def read_linked_rows(path: str) -> list:
+    """
+    The rows of the output 'path' with URLs in 'Link to': if it was written with --link-graph
+    (its links are IDs), they are expanded from its URL table. Raises ValueError if the links
+    are IDs but the URL table is missing.
+    """
+    rows = read_rows(path)
+    url_ids = [url_id for row in rows for url_id in str(row["Link to"]).split("\n") if url_id]
+    if not url_ids or not all(url_id.isdigit() for url_id in url_ids):
+        return rows
+    urls_path = link_graph_paths(path)[0]
+    if not os.path.exists(urls_path):
+        raise ValueError(f"the links of {path} are URL IDs, but its URL table {urls_path} is missing")
+    return expand_links(rows, read_url_table(urls_path))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the links of an output file into a URL table and a link graph.")
+    parser.add_argument("--input", type=str, required=True, help="Path to a CSV, JSONL or Parquet output file.")
+    parser.add_argument("--output", type=str, required=True, help="Path to the rewritten output file.")
+    parser.add_argument("--expand", action="store_true", help="Do the reverse: put the URLs of the input's URL table back into 'Link to'.")
+    args = parser.parse_args()
+
+    rows = read_rows(args.input)
+    if args.expand:
+        write_rows(expand_links(rows, read_url_table(link_graph_paths(args.input)[0])), args.output)
+    else:
+        urls_path, edges_path = link_graph_paths(args.output)
+        with LinkGraphWriter(urls_path, edges_path) as links:
+            write_rows(links.add_rows(rows), args.output)
+        print(f"{len(links.table)} distinct URLs saved to {urls_path}, links to {edges_path}")
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import gzip
+import zlib
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from compression import open_file, read_text, strip_compression_extension
+from canonical_urls import canonical_url
+
+# Extensions of the saved pages of a mirror (optionally compressed, see compression.py)
+PAGE_EXTENSIONS = (".html", ".htm")
+
+def mirror_url(path: str, folder: str, base_url: str) -> str:
+    """
+    The canonical URL of the page saved at 'path' in the mirror 'folder' of the site 'base_url',
+    as a static site generator writes it: an index.html stands for its folder.
+    Example: ('site/docs/concepts/index.html', 'site', 'https://kubernetes.io') -> 'https://kubernetes.io/docs/concepts/'
+    """
+    relative = os.path.relpath(strip_compression_extension(path), folder).replace(os.sep, "/")
+    if relative == "index.html":
+        relative = ""
+    elif relative.endswith("/index.html"):
+        relative = relative[:-len("index.html")]
+    return base_url.rstrip("/") + "/" + relative
+
+def iter_mirror_files(folder: str, base_url: str):
+    """Yields (url, path) for every saved page under 'folder', in path order."""
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if strip_compression_extension(name).lower().endswith(PAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                yield mirror_url(path, folder, base_url), path
+
+# Bytes read from the start of a 'response' record to find its HTTP status and headers
+HTTP_HEAD_BYTES = 64 * 1024
+
+def read_record_headers(f, path: str):
+    """
+    Reads the headers of the next record of the open WARC file 'f' (names lowercased),
+    leaving 'f' at the start of its block, or returns None at the end of the file.
+    Raises ValueError if 'path' is not a WARC file.
+    """
+    while True:
+        line = f.readline()
+        if not line:
+            return None
+        if line.strip():
+            break
+    if not line.startswith(b"WARC/"):
+        raise ValueError(f"Not a WARC record in {path}: {line[:40]!r}")
+    headers = {}
+    for line in iter(f.readline, b""):
+        if not line.strip():
+            break
+        name, _, value = line.decode("utf-8", "replace").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+def iter_warc_records(path: str):
+    """
+    Yields (headers, block) for every record of the WARC file 'path' (.warc, or .warc.gz
+    with one gzip member per record); header names are lowercased. Raises ValueError if
+    the file is not a WARC file.
+    """
+    with open_file(path, "rb") as f:
+        while True:
+            headers = read_record_headers(f, path)
+            if headers is None:
+                return
+            yield headers, f.read(int(headers.get("content-length", 0)))
+
+def dechunk(body: bytes) -> bytes:
+    """Decodes an HTTP body sent with 'Transfer-Encoding: chunked'."""
+    chunks = []
+    position = 0
+    while True:
+        line_end = body.find(b"\r\n", position)
+        if line_end < 0:
+            break
+        size = int(body[position:line_end].split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        chunks.append(body[line_end + 2:line_end + 2 + size])
+        position = line_end + 4 + size
+    return b"".join(chunks)
+
+def parse_http_head(head: bytes):
+    """The (status, headers) of the status line and headers 'head' of an HTTP response; names are lowercased."""
+    lines = head.decode("iso-8859-1").split("\r\n")
+    status = int(lines[0].split()[1]) if len(lines[0].split()) > 1 else 0
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+def decode_http_response(block: bytes):
+    """
+    The (status, content_type, body bytes) of an HTTP response as captured in a WARC
+    'response' record, with chunked transfer and gzip/deflate encodings undone.
+    """
+    head, _, body = block.partition(b"\r\n\r\n")
+    status, headers = parse_http_head(head)
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = dechunk(body)
+    encoding = headers.get("content-encoding", "").lower()
+    if encoding in ("gzip", "x-gzip"):
+        body = gzip.decompress(body)
+    elif encoding == "deflate":
+        body = zlib.decompress(body, -zlib.MAX_WBITS if body[:1] != b"\x78" else zlib.MAX_WBITS)
+    return status, headers.get("content-type", ""), body
+
+def decode_html(body: bytes, content_type: str) -> str:
+    """The text of an HTML body in the charset of its Content-Type (UTF-8 by default)."""
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type, re.IGNORECASE)
+    try:
+        return body.decode(match.group(1) if match else "utf-8", "replace")
+    except LookupError:
+        return body.decode("utf-8", "replace")
+
+def record_url(headers: dict) -> str:
+    """The URL of a WARC record: its WARC-Target-URI."""
+    return headers.get("warc-target-uri", "").strip("<>")
+
+def record_page(headers: dict, block: bytes):
+    """
+    The page_html of a WARC record if it holds an HTML page, otherwise None: a 'response'
+    record with a 200 status, or a 'resource' record (a page saved without the HTTP response).
+    """
+    if headers.get("warc-type") == "response":
+        status, content_type, body = decode_http_response(block)
+        if status != 200:
+            return None
+    elif headers.get("warc-type") == "resource":
+        content_type, body = headers.get("content-type", ""), block
+    else:
+        return None
+    return decode_html(body, content_type) if "html" in content_type.lower() else None
+
+def iter_warc_pages(path: str):
+    """Yields (url, page_html) for every HTML page of the WARC file 'path' (see record_page())."""
+    for headers, block in iter_warc_records(path):
+        url = record_url(headers)
+        page_html = record_page(headers, block) if url else None
+        if page_html is not None:
+            yield url, page_html
+
+def index_warc_pages(path: str):
+    """
+    Yields (url, offset) for every HTML page of the WARC file 'path' (the pages of
+    iter_warc_pages()), where 'offset' is where its record starts in the decompressed file
+    (see read_warc_page()). Only the record headers and HTTP heads are read; bodies are skipped.
+    """
+    with open_file(path, "rb") as f:
+        while True:
+            offset = f.tell()
+            headers = read_record_headers(f, path)
+            if headers is None:
+                return
+            length = int(headers.get("content-length", 0))
+            end = f.tell() + length
+            if headers.get("warc-type") == "response":
+                status, http_headers = parse_http_head(f.read(min(length, HTTP_HEAD_BYTES)).partition(b"\r\n\r\n")[0])
+                content_type = http_headers.get("content-type", "") if status == 200 else ""
+            elif headers.get("warc-type") == "resource":
+                content_type = headers.get("content-type", "")
+            else:
+                content_type = ""
+            if record_url(headers) and "html" in content_type.lower():
+                yield record_url(headers), offset
+            f.seek(end)
+
+def read_warc_page(f, offset: int, path: str) -> str:
+    """The page_html of the record at 'offset' (see index_warc_pages()) of the open WARC file 'f'."""
+    f.seek(offset)
+    headers = read_record_headers(f, path)
+    if headers is None:
+        raise ValueError(f"No WARC record at offset {offset} of {path}")
+    page_html = record_page(headers, f.read(int(headers.get("content-length", 0))))
+    if page_html is None:
+        raise ValueError(f"The record at offset {offset} of {path} is not an HTML page")
+    return page_html
+
+class LocalPages:
+    """
+    Pages read from local storage instead of downloaded: the files of a mirror 'folder' of
+    the site 'base_url' (e.g. the public/ folder built from kubernetes/website) and the
+    HTML records of the WARC files 'warcs'. Pages are keyed by their canonical URL (see
+    canonical_urls.canonical_url()), so they are found under the URLs Multi_facade.py
+    canonicalizes. 'urls' lists every page once, the mirror first, then each WARC in record
+    order (when a URL was captured more than once, the first capture is used).
+    WARC files are only indexed here (see index_warc_pages()); their pages are read by read_pages().
+    """
+
+    def __init__(self, folder: str = None, base_url: str = "https://kubernetes.io", warcs: list = ()):
+        self.paths = {}
+        # {url: (WARC file, offset of its record)}
+        self.warc_of = {}
+        if folder:
+            for url, path in iter_mirror_files(folder, base_url):
+                self.paths.setdefault(canonical_url(url), path)
+        for warc in warcs:
+            for url, offset in index_warc_pages(warc):
+                url = canonical_url(url)
+                if url not in self.paths:
+                    self.warc_of.setdefault(url, (warc, offset))
+        self.urls = list(self.paths) + list(self.warc_of)
+
+    def read_pages(self, urls: list, workers: int = 4, report=None):
+        """
+        Reads the pages of 'urls' and yields (index, url, page_html, error) like
+        fetcher.fetch_pages(), as each page is read. Mirror files are read by 'workers'
+        threads, at most two per thread ahead of the caller, and the records of each WARC file
+        are read in file order (skipping the others), one page per step of the caller; memory stays bounded as long as the caller
+        does not buffer pages itself (Multi_facade.run_jobs() caps the pages waiting in its pool).
+        'error' is the OSError or ValueError raised for that page (a URL that is not in the
+        storage gives a KeyError), or None.
+        With a 'report' (a RunReport), every mirror file read is recorded as the 'fetch' stage
+        of its URL (WARC records are read as one stream, so they have no 'fetch' stage).
+        """
+        def read(url):
+            if report is not None:
+                return report.measure(url, "fetch", read_text, self.paths[canonical_url(url)])
+            return read_text(self.paths[canonical_url(url)])
+
+        # The indexes of each page in 'urls', under its canonical URL
+        positions = {}
+        for index, url in enumerate(urls):
+            positions.setdefault(canonical_url(url), []).append(index)
+
+        queue = [(index, url) for index, url in enumerate(urls) if canonical_url(url) in self.paths]
+        queue.reverse()
+        futures = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while queue or futures:
+                while queue and len(futures) < 2 * workers:
+                    index, url = queue.pop()
+                    futures[executor.submit(read, url)] = (index, url)
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, url = futures.pop(future)
+                    try:
+                        yield index, url, future.result(), None
+                    except (OSError, ValueError) as e:
+                        yield index, url, None, e
+
+        wanted = {url for url in positions if url not in self.paths}
+        records = {}
+        for url in wanted:
+            if url in self.warc_of:
+                warc, offset = self.warc_of[url]
+                records.setdefault(warc, []).append((offset, url))
+        for warc in sorted(records):
+            try:
+                f = open_file(warc, "rb")
+            except OSError as e:
+                print(f"Error reading WARC file {warc}: {e}")
+                continue
+            with f:
+                for offset, url in sorted(records[warc]):
+                    wanted.discard(url)
+                    try:
+                        page_html, error = read_warc_page(f, offset, warc), None
+                    except (OSError, ValueError) as e:
+                        page_html, error = None, e
+                    for index in positions[url]:
+                        yield index, urls[index], page_html, error
+        for url in wanted:
+            for index in positions[url]:
+                yield index, urls[index], None, KeyError(f"{urls[index]} is not in the local pages")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the canonical URLs of a local HTML mirror and/or WARC files.")
+    parser.add_argument("--mirror", type=str, default=None, help="Folder of saved HTML pages (e.g. the built site).")
+    parser.add_argument("--base-url", type=str, default="https://kubernetes.io", help="URL of the site the mirror folder holds.")
+    parser.add_argument("--warc", type=str, nargs="+", default=[], help="WARC files (.warc or .warc.gz).")
+    parser.add_argument("--output", type=str, default=None, help="Write the URLs to this file instead of printing them.")
+    args = parser.parse_args()
+
+    pages = LocalPages(args.mirror, args.base_url, args.warc)
+    if args.output:
+        with open_file(args.output, "w") as f:
+            f.write("\n".join(pages.urls) + "\n")
+        print(f"{len(pages.urls)} URLs saved to {args.output}")
+    else:
+        print("\n".join(pages.urls))
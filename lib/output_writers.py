@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import json
+import argparse
+
+from compression import compression_of, get_compression, open_file, strip_compression_extension, with_compression_extension
+
+# Columns of every output row, in order
+FIELDNAMES = ["ID", "Category", "Topic", "Concept", "Content", "URL", "Link to", "Tags"]
+
+# Output formats, by file extension
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+
+def format_of(path: str, output_format: str = None) -> str:
+    """
+    The output format for 'path': 'output_format' if given, else guessed from the extension (CSV by default).
+    A compression extension is skipped: 'multi_final.jsonl.gz' is JSONL.
+    """
+    if output_format:
+        return output_format
+    return FORMATS.get(os.path.splitext(strip_compression_extension(path))[1].lower(), "csv")
+
+def with_format_extension(path: str, output_format: str) -> str:
+    """
+    Gives 'path' the extension of 'output_format', keeping its compression extension.
+    Example: ('data/multi_final.csv.gz', 'jsonl') -> 'data/multi_final.jsonl.gz'
+    """
+    base = strip_compression_extension(path)
+    return os.path.splitext(base)[0] + "." + output_format + path[len(base):]
+
+def with_output_compression(path: str, output_format: str = None) -> str:
+    """
+    Gives 'path' the extension of the compression set with compression.set_compression().
+    Parquet files are compressed internally with that codec instead, so they keep their name.
+    Example: 'data/multi_final.csv' -> 'data/multi_final.csv.gz' (with gzip)
+    """
+    if format_of(path, output_format) == "parquet":
+        return path
+    return with_compression_extension(path)
+
+class CsvRowWriter:
+    """Writes rows to a CSV file with the FIELDNAMES header (compressed for a .gz/.zst 'path')."""
+
+    def __init__(self, path: str):
+        self._file = open_file(path, "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDNAMES)
+        self._writer.writeheader()
+        self._file.flush()
+
+    def write_rows(self, rows: list):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class JsonlRowWriter:
+    """Writes rows as newline-delimited JSON objects with the FIELDNAMES keys (ID as an integer)."""
+
+    def __init__(self, path: str):
+        self._file = open_file(path, "w")
+
+    def write_rows(self, rows: list):
+        for row in rows:
+            record = {name: row[name] for name in FIELDNAMES}
+            record["ID"] = int(record["ID"])
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ParquetRowWriter:
+    """
+    Writes rows to a Parquet file with the FIELDNAMES columns. 'Category' and 'Topic' are
+    dictionary-encoded, since they repeat on every row of a page. Rows are buffered and
+    written in row groups of 'row_group_size', so the file is only complete after close().
+    Columns are compressed with the codec of the extension of 'path' or of
+    compression.set_compression() (gzip or zstd), and snappy otherwise.
+    Needs pyarrow (pip install pyarrow).
+    """
+
+    def __init__(self, path: str, row_group_size: int = 10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from e
+
+        self._pa = pa
+        self.schema = pa.schema(
+            [("ID", pa.int64())]
+            + [(name, pa.dictionary(pa.int32(), pa.string())) for name in ("Category", "Topic")]
+            + [(name, pa.string()) for name in FIELDNAMES[3:]]
+        )
+        self.row_group_size = row_group_size
+        codec = compression_of(path) or get_compression() or "snappy"
+        self._writer = pq.ParquetWriter(path, self.schema, compression=codec)
+        self._pending = []
+
+    def _flush(self):
+        if not self._pending:
+            return
+        columns = {name: [row[name] for row in self._pending] for name in FIELDNAMES}
+        columns["ID"] = [int(value) for value in columns["ID"]]
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self.schema))
+        self._pending = []
+
+    def write_rows(self, rows: list):
+        for row in rows:
+            self._pending.append(row)
+            if len(self._pending) >= self.row_group_size:
+                self._flush()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+WRITERS = {"csv": CsvRowWriter, "jsonl": JsonlRowWriter, "parquet": ParquetRowWriter}
+
+def open_row_writer(path: str, output_format: str = None):
+    """Opens the writer for 'path' in 'output_format' (see format_of())."""
+    return WRITERS[format_of(path, output_format)](path)
+
+def write_rows(rows: list, path: str, output_format: str = None):
+    """
+    Writes rows produced by to_csv.build_rows() to 'path' in 'output_format'.
+    'rows' can also be a generator (see pipeline.iter_page_rows()); rows are then written as they come.
+    """
+    writer = open_row_writer(path, output_format)
+    try:
+        writer.write_rows(rows)
+    finally:
+        writer.close()
+
+def read_rows(path: str, output_format: str = None) -> list:
+    """Reads the rows of a file written by one of the writers above, compressed or not."""
+    output_format = format_of(path, output_format)
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pylist()
+    with open_file(path, "r", newline="") as f:
+        if output_format == "jsonl":
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an output file between CSV, JSONL and Parquet.")
+    parser.add_argument("--input", type=str, required=True, help="Path to the CSV, JSONL or Parquet file (.gz/.zst allowed).")
+    parser.add_argument("--output", type=str, required=True, help="Path to the converted file (compressed if it ends in .gz/.zst).")
+    parser.add_argument("--format", type=str, default=None, choices=list(WRITERS), help="Output format (default: from the --output extension, else CSV).")
+    args = parser.parse_args()
+
+    write_rows(read_rows(args.input), args.output, args.format)
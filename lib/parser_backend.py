@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import csv
+import argparse
+import importlib.util
+
+from bs4 import BeautifulSoup
+
+from compression import open_file
+
+# Supported HTML parser backends:
+#   html.parser - Python's built-in parser (the default, always available)
+#   lxml        - the lxml C parser behind BeautifulSoup
+#   selectolax  - selectolax/lexbor for finding div.td-content, rewriting <a> and splitting
+#                 on <h2>; the single-parse tree uses lxml (or html.parser without lxml)
+# The code block and tag-cleaning stages parse HTML fragments with unbalanced tags and
+# always use html.parser, whatever the backend.
+BACKENDS = ["html.parser", "lxml", "selectolax"]
+
+_backend = "html.parser"
+
+def is_available(backend: str) -> bool:
+    """True if the packages needed by 'backend' are installed."""
+    if backend == "html.parser":
+        return True
+    module = "selectolax" if backend == "selectolax" else backend
+    return importlib.util.find_spec(module) is not None
+
+def available_backends() -> list:
+    """The backends that can be used in this environment."""
+    return [backend for backend in BACKENDS if is_available(backend)]
+
+def set_backend(backend: str) -> None:
+    """
+    Select the parser backend used by every stage in this process.
+    Raises ValueError for unknown backends and ImportError if the backend is not installed.
+    """
+    global _backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if not is_available(backend):
+        raise ImportError(f"Parser backend '{backend}' is not installed (pip install {backend})")
+    _backend = backend
+
+def get_backend() -> str:
+    """The parser backend currently in use."""
+    return _backend
+
+def use_selectolax() -> bool:
+    """True if the selectolax fast paths should be taken."""
+    return _backend == "selectolax"
+
+def bs4_features() -> str:
+    """The BeautifulSoup parser name matching the current backend."""
+    if _backend == "html.parser" or not is_available("lxml"):
+        return "html.parser"
+    return "lxml"
+
+def make_soup(html: str) -> BeautifulSoup:
+    """Parse 'html' with BeautifulSoup using the current backend."""
+    return BeautifulSoup(html, bs4_features())
+
+def make_lexbor_tree(html: str):
+    """Parse 'html' with selectolax's lexbor parser."""
+    from selectolax.lexbor import LexborHTMLParser
+    return LexborHTMLParser(html)
+
+def lexbor_inner_html(tree) -> str:
+    """Serialize the content of a lexbor document's <body>, without the <body> tag itself."""
+    if tree.body is None:
+        return ""
+    return "".join(node.html or "" for node in tree.body.iter(include_text=True))
+
+def compare_backends(page_html: str, reference: str, root_url: str, backends: list = None) -> dict:
+    """
+    Run the pipeline on 'page_html' once per backend and return {backend: rows}.
+    The backend that was selected before the call is restored afterwards.
+    """
+    from pipeline import process_page
+
+    previous = get_backend()
+    results = {}
+    try:
+        for backend in backends or available_backends():
+            set_backend(backend)
+            results[backend] = process_page(page_html, "Kubernetes", reference, root_url)
+    finally:
+        set_backend(previous)
+    return results
+
+def main(input_files: list, reference: str, root_url: str, report_file: str = None) -> bool:
+    """
+    Check that every available backend produces the same rows as html.parser for each saved page.
+    Returns True if all backends agree.
+    """
+    all_equal = True
+    report_rows = []
+    for input_file in input_files:
+        with open_file(input_file, "r") as f:
+            page_html = f.read()
+
+        results = compare_backends(page_html, reference, root_url)
+        expected = results["html.parser"]
+        for backend, rows in results.items():
+            same = rows == expected
+            all_equal = all_equal and same
+            report_rows.append({"File": input_file, "Backend": backend, "Rows": len(rows), "Identical": same})
+            print(f"{input_file}: {backend:<12} {len(rows):>4} rows {'identical' if same else 'DIFFERENT'}")
+
+    if report_file:
+        with open_file(report_file, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["File", "Backend", "Rows", "Identical"])
+            writer.writeheader()
+            writer.writerows(report_rows)
+    return all_equal
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every parser backend gives the same CSV rows.")
+    parser.add_argument("inputs", nargs="+", help="Saved HTML pages to run through the pipeline.")
+    parser.add_argument("--reference", type=str, default="https://kubernetes.io/docs/", help="Reference URL for the rows.")
+    parser.add_argument("--root-url", type=str, default="https://kubernetes.io", help="Root URL for relative links.")
+    parser.add_argument("--report", type=str, default=None, help="Optional CSV report of the comparison.")
+    args = parser.parse_args()
+
+    raise SystemExit(0 if main(args.inputs, args.reference, args.root_url, args.report) else 1)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+
+from simple_spider import extract_td_html, fetch_page, find_td_content_divs
+from clean_html_links import annotate_links, annotate_links_in_html
+from extract_h2 import (
+    extract_sections_text, extract_sections_text_streaming, find_h1_and_h2_tags, iter_h1_and_h2_sections,
+    iter_section_nodes, read_in_chunks
+)
+from extract_code_example import embed_code_blocks, mark_code_blocks, mark_code_in_sections, process_sections_text
+from clean_all_tags_and_newline import (
+    add_code_block_newlines, clean_section_nodes, clean_sections, preserve_code_blocks_and_clean_text,
+    process_all_chunks
+)
+from dom_text import get_stripped_text, needs_reparse
+from chunk_format import CHUNK_MARKER, CONTENT_TRAILER, SEPARATOR
+from final_refine import process_text, refine_sections
+from to_csv import build_rows, build_section_rows
+from output_writers import WRITERS, write_rows
+from compression import EXTENSIONS, check_available, compression_of, open_file, set_compression, with_compression_extension
+from stage_cache import StageCache, run_stage
+from run_report import record_stage
+from parser_backend import BACKENDS, make_soup, set_backend
+
+# Intermediate file names written to the debug folder, in stage order
+STEP_FILES = [
+    "step1_spider_output.txt",
+    "step2_clean_links_output.txt",
+    "step3_extract_h2_output.txt",
+    "step4_extract_code_output.txt",
+    "step5_clean_tags_output.txt",
+    "step6_final_refine_output.txt",
+]
+
+def normalize_newlines(text: str) -> str:
+    """Convert '\\r\\n' and '\\r' to '\\n', as reading a step file in text mode would."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+def write_text_file(text: str, path: str):
+    """Write 'text' to 'path' (compressed if it ends in .gz/.zst)."""
+    with open_file(path, "w") as f:
+        f.write(text)
+
+def step_file_path(debug_dir: str, step: int) -> str:
+    """
+    The intermediate file of stage 'step' (1-based) in 'debug_dir', with the extension
+    of the compression set with compression.set_compression().
+    Example: ('data', 3) -> 'data/step3_extract_h2_output.txt.gz' (with gzip)
+    """
+    return with_compression_extension(os.path.join(debug_dir, STEP_FILES[step - 1]))
+
+def write_debug_file(debug_dir: str, step: int, text: str):
+    """Write the output of stage 'step' (1-based) to its intermediate file in 'debug_dir'."""
+    record_stage("debug_files", write_text_file, text, step_file_path(debug_dir, step))
+
+def run_stages(td_html: str, category: str, reference: str, root_url: str, debug_dir: str = None,
+               stage_cache: StageCache = None, stream_sections: bool = False) -> list:
+    """
+    Runs steps 2-7 of the workflow in memory on the extracted <div class="td-content"> HTML
+    and returns the CSV rows. If 'debug_dir' is given, every intermediate result is also
+    written there under the same names Facade.py has always used. With a 'stage_cache',
+    a stage whose input and code are unchanged since an earlier run is not run again.
+    With 'stream_sections', step 3 splits the page with the streaming SectionSplitter
+    instead of building a tree of the whole page.
+    """
+    text = normalize_newlines(td_html)
+    if debug_dir:
+        write_debug_file(debug_dir, 1, text)
+
+    # Step 2: Replace <a> tags with [LINK:href] annotations
+    text = run_stage(stage_cache, "clean_html_links", annotate_links_in_html, text)
+    if debug_dir:
+        write_debug_file(debug_dir, 2, text)
+
+    # Step 3: Split the page into <h2> sections
+    text = run_stage(stage_cache, "extract_h2",
+                     extract_sections_text_streaming if stream_sections else extract_sections_text, text,
+                     modules=["extract_h2", "chunk_format"])
+    if debug_dir:
+        write_debug_file(debug_dir, 3, text)
+
+    # Step 4: Mark code blocks
+    text = run_stage(stage_cache, "extract_code_example", process_sections_text, text,
+                     modules=["extract_code_example", "chunk_format"])
+    if debug_dir:
+        write_debug_file(debug_dir, 4, text)
+
+    # Step 5: Strip remaining tags and split sentences
+    text = run_stage(stage_cache, "clean_all_tags_and_newline", process_all_chunks, text,
+                     modules=["clean_all_tags_and_newline", "chunk_format"])
+    if debug_dir:
+        write_debug_file(debug_dir, 5, text)
+
+    # Step 6: Remove separators and code block markers
+    text = run_stage(stage_cache, "final_refine", process_text, text)
+    if debug_dir:
+        write_debug_file(debug_dir, 6, text)
+
+    # Step 7: Build the CSV rows
+    return run_stage(stage_cache, "to_csv", build_rows, text, category, reference, root_url,
+                     modules=["to_csv", "chunk_format"])
+
+def iter_section_rows(text: str, category: str, reference: str, root_url: str):
+    """
+    Steps 3-7 as a chain of generators over section records: the link-annotated HTML is
+    split by the streaming SectionSplitter, and every section goes through code block
+    marking, tag cleanup, refining and row building on its own as soon as it has been read.
+    Yields the same rows as run_stages() with the html.parser backend (but for the topic of
+    a page whose <h1> comes after its first section, see extract_h2.SectionSplitter).
+    """
+    sections = iter_h1_and_h2_sections(read_in_chunks(text))
+    sections = mark_code_in_sections(sections)
+    sections = clean_sections(sections)
+    sections = refine_sections(sections)
+    return build_section_rows(sections, category, reference, root_url)
+
+def iter_page_rows(page_html: str, category: str, reference: str, root_url: str, debug_dir: str = None,
+                   stage_cache: StageCache = None):
+    """
+    Runs steps 1-2 on the page and returns a generator of its rows (see iter_section_rows()),
+    so the rows can go to the writer one section at a time. Only the step 1 and step 2 files
+    exist in this mode, so only those are written to 'debug_dir'.
+    """
+    td_html = run_stage(stage_cache, "simple_spider", extract_td_html, page_html)
+    text = normalize_newlines(td_html)
+    if debug_dir:
+        write_debug_file(debug_dir, 1, text)
+
+    # Step 2: Replace <a> tags with [LINK:href] annotations
+    text = run_stage(stage_cache, "clean_html_links", annotate_links_in_html, text)
+    if debug_dir:
+        write_debug_file(debug_dir, 2, text)
+
+    return iter_section_rows(text, category, reference, root_url)
+
+def clean_page_single_parse(page_html: str) -> str:
+    """
+    Runs steps 1-5 as passes over a single parse of the whole page and serializes once,
+    returning the same text clean_all_tags_and_newline.py would have written.
+    """
+    soup = make_soup(normalize_newlines(page_html))
+    td_content_divs = find_td_content_divs(soup)
+
+    # Step 2: Replace <a> tags with [LINK:href] annotations
+    for div in td_content_divs:
+        annotate_links(div)
+
+    # Step 3: Find the topic and the <h2> headings; titles are taken before code is marked
+    h1_tag, h2_tags = find_h1_and_h2_tags(td_content_divs)
+    topic = get_stripped_text(h1_tag) if h1_tag else "Unknown Topic"
+
+    headings = []
+    for h2 in h2_tags:
+        # Sections with top-level text that extract_h2 would write unescaped are
+        # kept as HTML and cleaned the file-based way, which re-reads that text as HTML.
+        section_html = None
+        if any(needs_reparse(node) for node in iter_section_nodes(h2)):
+            section_html = "".join(str(node) for node in iter_section_nodes(h2)).strip()
+        headings.append((h2, get_stripped_text(h2), h2.get("id", "no-id"), section_html))
+
+    # Step 4: Mark code blocks
+    for div in td_content_divs:
+        mark_code_blocks(div)
+
+    # Step 5: Extract the cleaned text of every section
+    # The content keeps the first part of the separator and the rest is left
+    # between chunks, as in the file-based workflow (see chunk_format.py).
+    trailer = CONTENT_TRAILER
+    topic_line = f"[TOPIC: {topic}]".splitlines()[0]
+    parts = [f"{topic_line}\n\n"]
+    for idx, (h2, title, section_id, section_html) in enumerate(headings, start=1):
+        if section_html is None:
+            cleaned_content = clean_section_nodes(iter_section_nodes(h2), trailer)
+        else:
+            modified_html = embed_code_blocks("\n".join(section_html.splitlines())).strip()
+            cleaned_content = preserve_code_blocks_and_clean_text(f"{modified_html}\n\n{trailer}".strip())
+            cleaned_content = add_code_block_newlines(cleaned_content)
+        parts.append(f"{CHUNK_MARKER}{idx} =====\n\n")
+        parts.append(f"[{idx}] Concept: {title} [id: {section_id}]\nContent:")
+        parts.append(f"\n\n{cleaned_content}\n")
+        parts.append(SEPARATOR[len(CONTENT_TRAILER):] + "\n\n")
+
+    return "".join(parts)
+
+# Modules whose code determines the output of clean_page_single_parse()
+SINGLE_PARSE_MODULES = [
+    __name__, "simple_spider", "clean_html_links", "extract_h2", "extract_code_example",
+    "clean_all_tags_and_newline", "dom_text", "chunk_format",
+]
+
+def run_single_parse(page_html: str, category: str, reference: str, root_url: str, debug_dir: str = None,
+                     stage_cache: StageCache = None) -> list:
+    """
+    Same as run_stages(), but starts from the full page HTML and parses it only once.
+    Only the step 5 and step 6 files exist in this mode, so only those are written to 'debug_dir'.
+    """
+    text = run_stage(stage_cache, "single_parse", clean_page_single_parse, page_html,
+                     modules=SINGLE_PARSE_MODULES)
+    if debug_dir:
+        write_debug_file(debug_dir, 5, text)
+
+    # Step 6: Remove separators and code block markers
+    text = run_stage(stage_cache, "final_refine", process_text, text)
+    if debug_dir:
+        write_debug_file(debug_dir, 6, text)
+
+    # Step 7: Build the CSV rows
+    return run_stage(stage_cache, "to_csv", build_rows, text, category, reference, root_url,
+                     modules=["to_csv", "chunk_format"])
+
+def process_page(page_html: str, category: str, reference: str, root_url: str, debug_dir: str = None,
+                 single_parse: bool = False, stage_cache: StageCache = None, stream_sections: bool = False,
+                 stream: bool = False) -> list:
+    """
+    Runs the whole workflow on an already-downloaded page and returns the CSV rows.
+    With 'single_parse', the page is parsed once instead of once per stage.
+    With a 'stage_cache', stages are memoized on their input and code (see StageCache).
+    With 'stream_sections', the <h2> sections are split without a tree of the whole page.
+    With 'stream', steps 3-7 run section by section (see iter_section_rows()) and are
+    recorded together as the 'sections' stage.
+    """
+    if stream:
+        rows = iter_page_rows(page_html, category, reference, root_url, debug_dir, stage_cache)
+        return record_stage("sections", list, rows)
+    if single_parse:
+        return run_single_parse(page_html, category, reference, root_url, debug_dir, stage_cache)
+
+    td_html = run_stage(stage_cache, "simple_spider", extract_td_html, page_html)
+    return run_stages(td_html, category, reference, root_url, debug_dir, stage_cache, stream_sections)
+
+def run_pipeline(url: str, category: str, reference: str, root_url: str, debug_dir: str = None,
+                 single_parse: bool = False, stage_cache: StageCache = None, stream_sections: bool = False,
+                 stream: bool = False) -> list:
+    """
+    Fetches 'url' and runs the whole workflow in-process, returning the CSV rows.
+    Raises requests.exceptions.RequestException if the page cannot be retrieved.
+    """
+    return process_page(fetch_page(url), category, reference, root_url, debug_dir, single_parse, stage_cache,
+                        stream_sections, stream)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every processing stage in-process for one URL.")
+    parser.add_argument("--url", type=str, required=True, help="The URL of the webpage to scrape.")
+    parser.add_argument("--output", type=str, required=True, help="Path to the output CSV, JSONL or Parquet file.")
+    parser.add_argument("--category", type=str, default="Kubernetes", help="Category name to assign to each document.")
+    parser.add_argument("--root-url", type=str, required=True, help="Root URL to prepend to relative links.")
+    parser.add_argument("--debug-dir", type=str, default=None, help="Folder to write the intermediate step files to.")
+    parser.add_argument("--single-parse", action="store_true", help="Parse the page once instead of once per stage.")
+    parser.add_argument("--stage-cache", type=str, default=None, help="Folder to memoize stage results in.")
+    parser.add_argument("--stream-sections", action="store_true", help="Split the <h2> sections with the streaming splitter.")
+    parser.add_argument("--stream", action="store_true", help="Run steps 3-7 section by section and stream the rows to the output.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
+    parser.add_argument("--format", type=str, default=None, choices=list(WRITERS), help="Output format (default: from the --output extension, else CSV).")
+    parser.add_argument("--compress", type=str, default=None, choices=list(EXTENSIONS), help="Compress the step files in --debug-dir (the output is compressed if it ends in .gz/.zst).")
+    args = parser.parse_args()
+    set_backend(args.parser)
+    try:
+        set_compression(args.compress)
+        check_available(compression_of(args.output))
+    except ImportError as e:
+        parser.error(str(e))
+
+    stage_cache = StageCache(args.stage_cache) if args.stage_cache else None
+    if args.stream:
+        rows = iter_page_rows(fetch_page(args.url), args.category, args.url, args.root_url, args.debug_dir, stage_cache)
+    else:
+        rows = run_pipeline(args.url, args.category, args.url, args.root_url, args.debug_dir, args.single_parse,
+                            stage_cache, args.stream_sections)
+    write_rows(rows, args.output, args.format)
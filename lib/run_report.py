@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import math
+import time
+import cProfile
+import threading
+import tracemalloc
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from chunk_format import count_chunks
+
+# The PageMetrics being recorded by the current thread (see recording())
+_local = threading.local()
+
+def peak_rss_bytes(who: int = None) -> int:
+    """
+    The peak resident set size of this process (or of its finished children with
+    'who' = resource.RUSAGE_CHILDREN) in bytes, or None where it cannot be read.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+def size_in_bytes(value) -> int:
+    """The UTF-8 size of a stage input or output: text, or the values of a list of rows."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sum(size_in_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(size_in_bytes(item) for item in value.values())
+    return 0
+
+def chunk_count(value) -> int:
+    """The number of concept chunks in a stage output (the rows of to_csv)."""
+    if isinstance(value, str):
+        return count_chunks(value)
+    if isinstance(value, list):
+        return len(value)
+    return 0
+
+def percentile(values: list, q: float) -> float:
+    """The 'q'-th percentile (0-100) of 'values' by the nearest-rank method, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+def distribution(values: list) -> dict:
+    """Sum, percentiles and maximum of 'values'."""
+    return {
+        "sum": sum(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values, default=None),
+    }
+
+class PageMetrics:
+    """
+    The stages measured for one URL, in the order they ran. Each stage records:
+    - wall_s / cpu_s:      elapsed and CPU time of the calling thread;
+    - bytes_in/bytes_out:  UTF-8 size of the stage's input text and of its output;
+    - chunks:              concept chunks in the output (rows for to_csv);
+    - peak_rss_bytes:      peak RSS of the process once the stage finished;
+    - traced_peak_bytes:   peak memory allocated by Python during the stage (only when profiling).
+    """
+
+    def __init__(self, url: str, index: int = 0):
+        self.url = url
+        self.index = index
+        self.stages = []
+        self.error = None
+        self.profile = None
+
+    def measure(self, name: str, func, *args, **kwargs):
+        """Runs func(*args, **kwargs), records it as stage 'name' and returns its result."""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        result = func(*args, **kwargs)
+        stage = {
+            "stage": name,
+            "wall_s": time.perf_counter() - wall_start,
+            "cpu_s": time.thread_time() - cpu_start,
+            "bytes_in": size_in_bytes(args[0]) if args else 0,
+            "bytes_out": size_in_bytes(result),
+            "chunks": chunk_count(result),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+        if tracing:
+            stage["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        self.stages.append(stage)
+        return result
+
+    @property
+    def wall_s(self) -> float:
+        return sum(stage["wall_s"] for stage in self.stages)
+
+    def to_dict(self) -> dict:
+        return {"url": self.url, "index": self.index, "wall_s": self.wall_s, "error": self.error,
+                "profile": self.profile, "stages": self.stages}
+
+def record_stage(name: str, func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) and, if the current thread is recording a page
+    (see recording()), adds it to that page's metrics as stage 'name'.
+    """
+    metrics = getattr(_local, "metrics", None)
+    if metrics is None:
+        return func(*args, **kwargs)
+    return metrics.measure(name, func, *args, **kwargs)
+
+@contextmanager
+def recording(url: str, index: int = 0, profile_dir: str = None):
+    """
+    Records every stage run by this thread inside the block in a PageMetrics for 'url'.
+    With 'profile_dir', the block also runs under cProfile and tracemalloc, and the
+    profile is saved to '<profile_dir>/page_<index>.prof' (see pstats) with the
+    tracemalloc peak of every stage in the stage metrics.
+    """
+    metrics = PageMetrics(url, index)
+    previous = getattr(_local, "metrics", None)
+    _local.metrics = metrics
+    profiler = None
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield metrics
+    except Exception as e:
+        metrics.error = str(e)
+        raise
+    finally:
+        _local.metrics = previous
+        if profiler is not None:
+            profiler.disable()
+            tracemalloc.stop()
+            metrics.profile = os.path.join(profile_dir, f"page_{index:05d}.prof")
+            profiler.dump_stats(metrics.profile)
+
+class RunReport:
+    """
+    Collects the PageMetrics of every URL of a run, from this process, worker processes
+    (which send theirs back with the rows) and download threads, and writes them with
+    per-stage aggregates as a JSON report.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.pages = {}
+        self._lock = threading.Lock()
+
+    def page(self, url: str, index: int = 0) -> PageMetrics:
+        """The metrics of 'url', created on first use."""
+        with self._lock:
+            if url not in self.pages:
+                self.pages[url] = PageMetrics(url, index)
+            return self.pages[url]
+
+    def measure(self, url: str, name: str, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) and records it as stage 'name' of 'url' (e.g. a download thread's fetch)."""
+        page = self.page(url)
+        try:
+            return page.measure(name, func, *args, **kwargs)
+        except Exception as e:
+            page.error = str(e)
+            raise
+
+    def add(self, url: str, metrics: PageMetrics = None, index: int = 0, error: Exception = None):
+        """Adds the stages recorded for 'url' (after any already recorded, such as its fetch)."""
+        page = self.page(url, index)
+        with self._lock:
+            page.index = index
+            if metrics is not None:
+                page.stages.extend(metrics.stages)
+                page.error = page.error or metrics.error
+                page.profile = metrics.profile
+            if error is not None:
+                page.error = str(error)
+
+    def slowest(self, count: int = 10) -> list:
+        """The 'count' pages that took the longest, slowest first."""
+        return sorted(self.pages.values(), key=lambda page: page.wall_s, reverse=True)[:count]
+
+    def keep_slowest_profiles(self, count: int = 10):
+        """Deletes the saved profiles of every page but the 'count' slowest."""
+        keep = {id(page) for page in self.slowest(count)}
+        for page in self.pages.values():
+            if page.profile and id(page) not in keep:
+                if os.path.exists(page.profile):
+                    os.remove(page.profile)
+                page.profile = None
+
+    def summary(self) -> dict:
+        """Per-stage aggregates over all pages, with wall/CPU time percentiles."""
+        stages = {}
+        for page in self.pages.values():
+            for stage in page.stages:
+                stages.setdefault(stage["stage"], []).append(stage)
+
+        summary = {}
+        for name, runs in stages.items():
+            rss = [run["peak_rss_bytes"] for run in runs if run["peak_rss_bytes"] is not None]
+            summary[name] = {
+                "count": len(runs),
+                "wall_s": distribution([run["wall_s"] for run in runs]),
+                "cpu_s": distribution([run["cpu_s"] for run in runs]),
+                "bytes_in": sum(run["bytes_in"] for run in runs),
+                "bytes_out": sum(run["bytes_out"] for run in runs),
+                "chunks": sum(run["chunks"] for run in runs),
+                "peak_rss_bytes": max(rss, default=None),
+            }
+        return summary
+
+    def to_dict(self, slowest: int = 10) -> dict:
+        pages = list(self.pages.values())
+        return {
+            "meta": {
+                "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+                "wall_s": time.time() - self.started,
+                "urls": len(pages),
+                "failed": sum(1 for page in pages if page.error),
+                "peak_rss_bytes": peak_rss_bytes(),
+                "children_peak_rss_bytes": peak_rss_bytes(resource.RUSAGE_CHILDREN) if resource else None,
+            },
+            "page_wall_s": distribution([page.wall_s for page in pages]),
+            "stages": self.summary(),
+            "slowest": [{"url": page.url, "wall_s": page.wall_s, "profile": page.profile}
+                        for page in self.slowest(slowest)],
+            "pages": [page.to_dict() for page in sorted(pages, key=lambda page: page.index)],
+        }
+
+    def write(self, path: str, slowest: int = 10):
+        """Writes the report to 'path' as JSON."""
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(slowest), f, indent=2)
+            f.write("\n")
+
+def print_summary(report: dict):
+    """Prints the per-stage table of a report written by RunReport.write()."""
+    meta = report["meta"]
+    print(f"{meta['urls']} URLs ({meta['failed']} failed) in {meta['wall_s']:.1f}s")
+    print(f"{'stage':<28} {'count':>6} {'total s':>9} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8} {'cpu s':>9} {'MB in':>8}")
+    for name, stage in report["stages"].items():
+        wall = stage["wall_s"]
+        print(f"{name:<28} {stage['count']:>6} {wall['sum']:>9.2f} {wall['p50']:>8.3f} {wall['p90']:>8.3f} "
+              f"{wall['p99']:>8.3f} {stage['cpu_s']['sum']:>9.2f} {stage['bytes_in'] / 1e6:>8.2f}")
+    print("Slowest pages:")
+    for page in report["slowest"]:
+        print(f"  {page['wall_s']:8.3f}s  {page['url']}" + (f"  ({page['profile']})" if page["profile"] else ""))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the per-stage summary of a run report.")
+    parser.add_argument("--input", type=str, required=True, help="Path to the JSON run report.")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        print_summary(json.load(f))
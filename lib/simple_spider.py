@@ -1,47 +1,110 @@
+import os
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import argparse
 
-def extract_td_content(url: str, output_file: str) -> None:
+from parser_backend import BACKENDS, make_lexbor_tree, make_soup, set_backend, use_selectolax
+from compression import open_file
+from fetch_policy import add_policy_arguments, get_fetch_policy, policy_from_args, set_fetch_policy
+
+# Session shared by every fetch that does not bring its own, so keep-alive
+# connections to the same host are reused across pages.
+_default_session = None
+
+def create_session(pool_size: int = 10) -> requests.Session:
     """
-    Fetches the HTML from 'url', parses it, and extracts all <div class="td-content"> sections.
-    Writes the extracted HTML to 'output_file'.
+    Creates a requests.Session whose connection pool keeps up to 'pool_size'
+    keep-alive connections per host.
     """
-    try:
-        # 1. Retrieve the webpage
-        response = requests.get(url)
-        response.raise_for_status()  # Raises an HTTPError if the status is 4xx or 5xx
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_default_session() -> requests.Session:
+    """Returns the module-wide session, creating it on first use."""
+    global _default_session
+    if _default_session is None:
+        _default_session = create_session()
+    return _default_session
 
-        # 2. Parse the HTML content
-        soup = BeautifulSoup(response.text, "html.parser")
+def extract_td_html(html: str) -> str:
+    """
+    Parses 'html' and returns all <div class="td-content"> sections joined by blank lines.
+    """
+    if use_selectolax():
+        # Fast path: lexbor finds the divs and serializes them without building a soup
+        tree = make_lexbor_tree(html)
+        extracted_content_list = [div.html for div in tree.css("div.td-content")]
+    else:
+        soup = make_soup(html)
+
+        # Find all <div class="td-content"> and keep their HTML content
+        extracted_content_list = [str(div) for div in find_td_content_divs(soup)]
 
-        # 3. Find all <div class="td-content">
-        td_content_divs = soup.find_all("div", class_="td-content")
+    # Combine everything (in case there are multiple .td-content divs)
+    return "\n\n".join(extracted_content_list)
 
-        # 4. Extract the inner HTML or text from those divs
-        extracted_content_list = []
-        for div in td_content_divs:
-            extracted_html = str(div)  # Keep the HTML content
-            extracted_content_list.append(extracted_html)
+def find_td_content_divs(soup) -> list:
+    """
+    Returns all <div class="td-content"> tags in the parsed page.
+    """
+    return soup.find_all("div", class_="td-content")
 
-        # Combine everything (in case there are multiple .td-content divs)
-        final_output = "\n\n".join(extracted_content_list)
+def fetch_page(url: str, session: requests.Session = None, cache=None, policy=None) -> str:
+    """
+    Fetches the raw HTML of 'url' through 'session' (the shared default session if not given).
+    If an HttpCache is given, the page is revalidated against / served from it.
+    Timeouts, retries and throttling follow 'policy' (a FetchPolicy, the default one if not given).
+    Raises requests.exceptions.RequestException if the page cannot be retrieved.
+    """
+    session = session or get_default_session()
+    policy = policy or get_fetch_policy()
+    if cache is not None:
+        return cache.fetch(url, session, policy)
+
+    response = policy.get(session, url)
+    response.raise_for_status()  # Raises an HTTPError if the status is 4xx or 5xx
+    return response.text
+
+def fetch_td_content(url: str) -> str:
+    """
+    Fetches the HTML from 'url' and returns its <div class="td-content"> sections.
+    Raises requests.exceptions.RequestException if the page cannot be retrieved.
+    """
+    return extract_td_html(fetch_page(url))
+
+def extract_td_content(url: str, output_file: str) -> None:
+    """
+    Fetches the HTML from 'url', parses it, and extracts all <div class="td-content"> sections.
+    Writes the extracted HTML to 'output_file'. If the page cannot be retrieved, an
+    'output_file' left by an earlier run is removed so later steps do not read stale content.
+    """
+    try:
+        final_output = fetch_td_content(url)
 
-        # 5. Write the result to a file
-        with open(output_file, "w", encoding="utf-8") as f:
+        # Write the result to a file
+        with open_file(output_file, "w") as f:
             f.write(final_output)
         print(f"Extracted <div class='td-content'> sections saved to {output_file}")
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
 
 if __name__ == "__main__":
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Extract <div class='td-content'> sections from a webpage.")
     parser.add_argument("--url", type=str, required=True, help="The URL of the webpage to scrape.")
     parser.add_argument("--output", type=str, required=True, help="The output file to save the extracted content.")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=BACKENDS, help="HTML parser backend.")
+    add_policy_arguments(parser)
 
     args = parser.parse_args()
+    set_backend(args.parser)
+    set_fetch_policy(policy_from_args(args))
 
     # Run the extraction
     extract_td_content(args.url, args.output)
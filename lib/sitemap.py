@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import hashlib
+import argparse
+import xml.etree.ElementTree as ET
+from fnmatch import fnmatchcase
+from urllib.parse import urlparse
+
+from simple_spider import fetch_page
+from compression import open_file
+from canonical_urls import page_key
+
+def parse_sitemap(xml_text: str):
+    """
+    Parses a sitemap.xml and returns (page_urls, sitemap_urls): the <loc> of every <url>
+    of a <urlset>, and the <loc> of every <sitemap> of a <sitemapindex>.
+    """
+    root = ET.fromstring(xml_text)
+    page_urls = []
+    sitemap_urls = []
+    for entry in root:
+        # Tags carry the sitemap namespace, e.g. '{http://www.sitemaps.org/schemas/sitemap/0.9}url'
+        kind = entry.tag.rsplit("}", 1)[-1]
+        loc = next((child.text for child in entry if child.tag.rsplit("}", 1)[-1] == "loc"), None)
+        if not loc:
+            continue
+        if kind == "url":
+            page_urls.append(loc.strip())
+        elif kind == "sitemap":
+            sitemap_urls.append(loc.strip())
+    return page_urls, sitemap_urls
+
+def read_sitemap(source: str, cache=None) -> str:
+    """
+    Returns the XML of 'source', a local file (optionally .gz or .zst) or an http(s) URL.
+    URLs are fetched through 'cache' (an HttpCache) when one is given.
+    """
+    if source.startswith(("http://", "https://")):
+        return fetch_page(source, cache=cache)
+    with open_file(source, "r") as f:
+        return f.read()
+
+def load_sitemap(source: str, cache=None) -> list:
+    """
+    Returns every page URL listed in the sitemap 'source', following sitemap indexes
+    (each child sitemap is read once). Duplicates, including variants of the same page
+    (see canonical_urls.page_key()), are dropped; the first occurrence is kept.
+    """
+    urls = []
+    seen = set()
+    pending = [source]
+    visited = set()
+    while pending:
+        sitemap = pending.pop(0)
+        if sitemap in visited:
+            continue
+        visited.add(sitemap)
+
+        page_urls, sitemap_urls = parse_sitemap(read_sitemap(sitemap, cache))
+        for url in page_urls:
+            if page_key(url) not in seen:
+                seen.add(page_key(url))
+                urls.append(url)
+        pending.extend(sitemap_urls)
+    return urls
+
+def path_matches(path: str, pattern: str) -> bool:
+    """True if 'path' starts with 'pattern' or matches it as a glob (e.g. '/docs/*/ingress/')."""
+    return path.startswith(pattern) or fnmatchcase(path, pattern)
+
+def filter_urls(urls: list, include: list = None, exclude: list = None) -> list:
+    """
+    Keeps the URLs whose path matches one of 'include' (all URLs if it is empty)
+    and none of 'exclude'. Example: include=['/docs/'], exclude=['/docs/reference/']
+    """
+    kept = []
+    for url in urls:
+        path = urlparse(url).path
+        if include and not any(path_matches(path, pattern) for pattern in include):
+            continue
+        if exclude and any(path_matches(path, pattern) for pattern in exclude):
+            continue
+        kept.append(url)
+    return kept
+
+def shard_of(url: str, shards: int) -> int:
+    """
+    The shard (0 to shards - 1) that 'url' belongs to. It only depends on the URL itself,
+    so every machine agrees on it and adding URLs to the list never moves the others.
+    """
+    return int(hashlib.sha1(url.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+def check_shard(shard: int, shards: int):
+    """Raises ValueError unless 'shard' is one of 'shards' shards (0 to shards - 1)."""
+    if shards < 1:
+        raise ValueError(f"--shards must be at least 1, not {shards}")
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} does not exist, expected 0 to {shards - 1}")
+
+def select_shard(urls: list, shard: int, shards: int) -> list:
+    """Keeps the URLs of shard number 'shard' out of 'shards', in their original order."""
+    check_shard(shard, shards)
+    return [url for url in urls if shard_of(url, shards) == shard]
+
+def sitemap_urls(source: str, include: list = None, exclude: list = None, shard: int = 0, shards: int = 1,
+                 cache=None) -> list:
+    """The page URLs of the sitemap 'source', filtered and restricted to one shard."""
+    return select_shard(filter_urls(load_sitemap(source, cache), include, exclude), shard, shards)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the URLs of a sitemap.xml to a URL list file.")
+    parser.add_argument("--sitemap", type=str, required=True, help="Path or URL of the sitemap.xml.")
+    parser.add_argument("--output", type=str, required=True, help="Path to the output URL list.")
+    parser.add_argument("--include", type=str, action="append", default=[], help="Only keep URLs under this path (repeatable).")
+    parser.add_argument("--exclude", type=str, action="append", default=[], help="Drop URLs under this path (repeatable).")
+    parser.add_argument("--shard", type=int, default=0, help="Shard to keep, from 0 to --shards - 1.")
+    parser.add_argument("--shards", type=int, default=1, help="Number of shards to split the URLs into.")
+    args = parser.parse_args()
+    try:
+        check_shard(args.shard, args.shards)
+    except ValueError as e:
+        parser.error(str(e))
+
+    urls = sitemap_urls(args.sitemap, args.include, args.exclude, args.shard, args.shards)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write("\n".join(urls))
+    print(f"{len(urls)} URLs written to {args.output}")
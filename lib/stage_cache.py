@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import hashlib
+from functools import partial
+
+from parser_backend import get_backend
+from run_report import record_stage
+
+class StageCache:
+    """
+    Memoizes pipeline stages on disk.
+
+    A stage result is stored under the hash of (stage name, stage code version, stage input),
+    where the code version is the hash of the source files of the modules the stage lives in
+    (and of parser_backend.py) together with the selected parser backend.
+    Editing a stage script therefore only invalidates that stage and the ones after it.
+    Results must be JSON-serializable (the stages return text or lists of row dicts).
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._versions = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def code_version(self, module_name: str) -> str:
+        """Returns the hash of the source file of 'module_name'."""
+        if module_name not in self._versions:
+            with open(sys.modules[module_name].__file__, "rb") as f:
+                self._versions[module_name] = hashlib.sha256(f.read()).hexdigest()
+        return self._versions[module_name]
+
+    def key(self, name: str, modules: list, args: tuple) -> str:
+        """Builds the cache key of one stage call."""
+        digest = hashlib.sha256()
+        digest.update(name.encode("utf-8"))
+        digest.update(get_backend().encode("utf-8"))
+        for module_name in ["parser_backend", *modules]:
+            digest.update(self.code_version(module_name).encode("utf-8"))
+        digest.update(json.dumps(args).encode("utf-8"))
+        return digest.hexdigest()
+
+    def run(self, name: str, func, *args, modules: list = None):
+        """
+        Returns func(*args), reusing the stored result if this stage already ran on the same input.
+        'modules' lists the modules whose code the result depends on (defaults to func's module).
+        """
+        modules = modules or [func.__module__]
+        path = os.path.join(self.cache_dir, f"{self.key(name, modules, args)}.json")
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["result"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        result = func(*args)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"stage": name, "result": result}, f)
+        os.replace(temp_path, path)
+        return result
+
+def run_stage(stage_cache, name: str, func, *args, modules: list = None):
+    """
+    Runs one stage through 'stage_cache', or directly if there is no cache.
+    The stage is measured when a page is being recorded (see run_report.recording()).
+    """
+    if stage_cache is None:
+        return record_stage(name, func, *args)
+    return record_stage(name, partial(stage_cache.run, name, func, modules=modules), *args)
@@ -1,49 +1,65 @@
-import re
 import csv
 import argparse
+from functools import lru_cache
+from urllib.parse import urljoin
 
-CHUNK_PATTERN = re.compile(
-    r"(===== CONCEPT CHUNK #\d+ =====.*?========================================)",
-    re.DOTALL
-)
+from chunk_format import iter_chunks, parse_topic, section_chunk
+from compression import open_file
+from output_writers import FIELDNAMES, WRITERS, write_rows
 
 def extract_topic(full_text: str) -> str:
     """
     Extract the topic from the text's first line in the format [TOPIC: ...].
     """
-    topic_match = re.search(r"\[TOPIC:\s*(.*?)\]", full_text)
-    return topic_match.group(1).strip() if topic_match else "Unknown Topic"
+    return parse_topic(full_text)
 
-def parse_chunk(chunk_text: str, category: str, reference: str, root_url: str):
+@lru_cache(maxsize=65536)
+def resolve_link(link: str, reference: str, root_url: str) -> str:
     """
-    Parse CONCEPT CHUNK text to extract Concept, Content, and Links.
+    Makes a [LINK:...] target absolute. Fragment and relative links ('#tls', 'ingress/',
+    '../services/') are resolved against the page URL 'reference', and root-relative
+    links ('/docs/...') against 'root_url'; absolute URLs and empty targets are kept as is.
+    Results are memoized.
+    Example: ('../service/', 'https://kubernetes.io/docs/concepts/ingress/', 'https://kubernetes.io')
+             -> 'https://kubernetes.io/docs/concepts/service/'
     """
-    # Extract Concept and ID
-    concept_match = re.search(r"\[\d+\]\s*Concept:\s*(.*?)\s*\[id:\s*(.*?)\]", chunk_text, re.DOTALL)
-    concept_str = concept_match.group(1).strip() if concept_match else "Unknown Concept"
-    concept_id = concept_match.group(2).strip() if concept_match and concept_match.group(2) else None
+    if not link:
+        return link
+    if link.startswith("/") and not link.startswith("//"):
+        return urljoin(root_url, link)
+    return urljoin(reference, link)
+
+def parse_chunk(chunk, category: str, reference: str, root_url: str):
+    """
+    Extract Concept, Content, and Links from a CONCEPT CHUNK (a chunk_format.ConceptChunk).
+    """
+    # Concept and ID
+    concept_str = chunk.concept if chunk.concept is not None else "Unknown Concept"
+    concept_id = chunk.id or None
 
     # Extract Content
-    content_match = re.search(r"Content:\s*(.*)", chunk_text, re.DOTALL)
-    content_str = content_match.group(1).strip() if content_match else "Unknown Content"
+    raw_content = chunk.content
+    content_str = raw_content.strip() if chunk.has_content else "Unknown Content"
+    offset = len(raw_content) - len(raw_content.lstrip())
 
     # Construct full URL for the concept
     concept_url = f"{reference}#{concept_id}" if concept_id else reference
 
     # Extract links and make them clickable
-    link_pattern = r"\[LINK:(.*?)\]"
-    links = re.findall(link_pattern, content_str)
-    clickable_links = []
-    for link in links:
-        if link.startswith("#"):  # Fragment link
-            clickable_links.append(f"{reference}{link}")
-        elif link.startswith("/"):  # Relative link
-            clickable_links.append(f"{root_url}{link}")
-        else:
-            clickable_links.append(link)  # Unhandled cases (kept as is)
+    content_parts = []
+    links = []
+    last_end = 0
+    for start, end, link in chunk.link_spans:
+        start, end = start - offset, end - offset
+        content_parts.append(content_str[last_end:start])
+        links.append(link)
+        last_end = end
+    content_parts.append(content_str[last_end:])
+
+    clickable_links = [resolve_link(link, reference, root_url) for link in links]
 
     # Remove [LINK:...] annotations from the content
-    cleaned_content = re.sub(link_pattern, "", content_str).strip()
+    cleaned_content = "".join(content_parts).strip()
 
     # Return parsed data
     return {
@@ -55,51 +71,79 @@ def parse_chunk(chunk_text: str, category: str, reference: str, root_url: str):
         "Category": category
     }
 
-def process_file_to_csv(input_file: str, output_file: str, category: str, reference: str, root_url: str):
+def build_rows(all_text: str, category: str, reference: str, root_url: str) -> list:
     """
-    Reads a text file containing CONCEPT CHUNK sections, extracts rows, 
-    and writes them to a CSV file.
+    Extracts every CONCEPT CHUNK in 'all_text' and returns the CSV rows,
+    each with its ID and the page Topic filled in.
     """
-    with open(input_file, "r", encoding="utf-8") as infile:
-        all_text = infile.read()
+    return list(iter_rows(all_text, category, reference, root_url))
 
-    # Extract the topic from the file
+def iter_rows(all_text: str, category: str, reference: str, root_url: str):
+    """
+    Yields the rows of build_rows() one CONCEPT CHUNK at a time.
+    """
+    # Extract the topic from the text
     topic = extract_topic(all_text)
 
-    # Extract all chunks
-    chunks = CHUNK_PATTERN.findall(all_text)
+    # Parse each chunk into a row with a unique ID for each document
+    for idx, chunk in enumerate(iter_chunks(all_text), start=1):
+        yield make_row(idx, topic, parse_chunk(chunk, category, reference, root_url))
 
-    # Parse each chunk into a row
-    all_rows = [parse_chunk(chunk, category, reference, root_url) for chunk in chunks]
+def make_row(idx: int, topic: str, row: dict) -> dict:
+    """
+    The output row of a chunk parsed by parse_chunk(), with its ID and the page Topic.
+    """
+    return {
+        "ID": idx,
+        "Category": row["Category"],
+        "Topic": topic,
+        "Concept": row["Concept"],
+        "Content": row["Content"],
+        "URL": row["URL"],
+        "Link to": row["Link to"],
+        "Tags": row["Tags"]
+    }
 
-    # Write the CSV file
-    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(
-            csvfile,
-            fieldnames=["ID", "Category", "Topic", "Concept", "Content", "URL", "Link to", "Tags"]
-        )
+def build_section_rows(sections, category: str, reference: str, root_url: str):
+    """
+    Generator version of build_rows(): yields the row of every section record coming from
+    final_refine.refine_sections() as soon as it arrives, with the same IDs and values.
+    """
+    for idx, section in enumerate(sections, start=1):
+        # The topic as it is read back from the [TOPIC: ...] line of the text
+        topic = parse_topic(f"[TOPIC: {section['topic']}]".splitlines()[0])
+        chunk = section_chunk(topic, section["index"], section["title"], section["id"], section["content"])
+        yield make_row(idx, topic, parse_chunk(chunk, category, reference, root_url))
+
+def write_rows_to_csv(rows: list, output_file: str):
+    """
+    Writes rows produced by build_rows() to a CSV file.
+    """
+    with open_file(output_file, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
         writer.writeheader()
+        writer.writerows(rows)
+
+def process_file_to_csv(input_file: str, output_file: str, category: str, reference: str, root_url: str,
+                        output_format: str = None):
+    """
+    Reads a text file containing CONCEPT CHUNK sections, extracts rows, 
+    and writes them to a CSV file (or a JSONL/Parquet file, see output_writers.py)
+    as each chunk is parsed.
+    """
+    with open_file(input_file, "r") as infile:
+        all_text = infile.read()
 
-        # Write rows with a unique ID for each document
-        for idx, row in enumerate(all_rows, start=1):
-            writer.writerow({
-                "ID": idx,
-                "Category": row["Category"],
-                "Topic": topic,
-                "Concept": row["Concept"],
-                "Content": row["Content"],
-                "URL": row["URL"],
-                "Link to": row["Link to"],
-                "Tags": row["Tags"]
-            })
+    write_rows(iter_rows(all_text, category, reference, root_url), output_file, output_format)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert processed CONCEPT CHUNK text to a CSV format.")
     parser.add_argument("--input", type=str, required=True, help="Path to the input text file.")
-    parser.add_argument("--output", type=str, required=True, help="Path to the output CSV file.")
+    parser.add_argument("--output", type=str, required=True, help="Path to the output CSV, JSONL or Parquet file.")
     parser.add_argument("--category", type=str, required=True, help="Category name to assign to each document.")
     parser.add_argument("--reference", type=str, required=True, help="Base URL to construct concept-specific links.")
     parser.add_argument("--root-url", type=str, required=True, help="Root URL to prepend to relative links.")
+    parser.add_argument("--format", type=str, default=None, choices=list(WRITERS), help="Output format (default: from the --output extension, else CSV).")
     args = parser.parse_args()
 
-    process_file_to_csv(args.input, args.output, args.category, args.reference, args.root_url)
+    process_file_to_csv(args.input, args.output, args.category, args.reference, args.root_url, args.format)